@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+'''Measures the throughput of chef.batch.parse_files for a corpus of
+machine-generated recipes with an increasing number of worker processes.
+
+Usage: bench_batch.py [number-of-recipes [statements-per-recipe]]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+try:
+    from multiprocessing import cpu_count
+except ImportError:
+    def cpu_count():
+        return 1
+
+from chef.batch import parse_files
+
+from bench_parser import generate_recipe
+
+
+def bench(filenames, processes):
+    start = time.time()
+    for result in parse_files(filenames, processes, keep_recipes=False):
+        assert result.error is None, result
+    return time.time() - start
+
+
+def main(argv):
+    num_of_recipes = int(argv[0]) if argv else 400
+    num_of_statements = int(argv[1]) if len(argv) > 1 else 500
+    directory = tempfile.mkdtemp()
+    try:
+        filenames = []
+        for i in xrange(num_of_recipes):
+            filename = os.path.join(directory, 'recipe%d.chef' % i)
+            with open(filename, 'w') as f:
+                f.write(generate_recipe(num_of_statements, i))
+            filenames.append(filename)
+        processes = 1
+        while processes <= cpu_count():
+            duration = bench(filenames, processes)
+            print '%d processes: %.3f s (%.1f recipes per second)' % (
+                processes, duration, num_of_recipes / duration)
+            processes *= 2
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+'''Measures the memory per element and the time of the bulk operations of
+mixing bowls which hold many ingredients with distinct values, as left by
+arithmetic in a loop.
+
+Usage: bench_bowls.py [number-of-elements]
+
+'''
+import sys
+import time
+
+from chef.datastructures import Ingredient, IngredientProperties,\
+        Ingredients, CompactIngredients
+
+
+def generate_ingredients(num_of_elements):
+    return [
+        Ingredient('sugar', IngredientProperties(value, True, False))
+        for value in xrange(1000, 1000 + num_of_elements)]
+
+
+def memory(container):
+    'Return the number of bytes which the elements of `container` take.'
+    if isinstance(container, CompactIngredients):
+        return sys.getsizeof(container)
+    return sys.getsizeof(container) + sum([
+        sys.getsizeof(ingredient) + sys.getsizeof(ingredient.properties) +
+        sys.getsizeof(ingredient.properties.value)
+        for ingredient in container])
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def bench(container_class, ingredients):
+    mixing_bowl = container_class(ingredients)
+    baking_dish = container_class()
+    return [
+        memory(mixing_bowl) / float(len(ingredients)),
+        timed(baking_dish.extend, mixing_bowl),
+        timed(mixing_bowl.liquefy),
+        timed(mixing_bowl.__delitem__, slice(None))]
+
+
+def main(argv):
+    num_of_elements = int(argv[0]) if argv else 1000000
+    ingredients = generate_ingredients(num_of_elements)
+    print '%d elements' % num_of_elements
+    print '%-20s %12s %10s %10s %10s' % (
+        'container', 'bytes/elem', 'pour', 'liquefy', 'clean')
+    for container_class in [Ingredients, CompactIngredients]:
+        print '%-20s %12.1f %9.4fs %9.4fs %9.4fs' % tuple(
+            [container_class.__name__] + bench(container_class, ingredients))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+'''Compares parsing a large, machine-generated recipe from a file object, from
+a string and from an mmap of the file.
+
+Usage: bench_buffers.py [number-of-statements [repetitions]]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import mmap
+import time
+import tempfile
+
+from chef.parser import parse_recipe, parse_recipe_string, parse_recipe_bytes
+
+from bench_parser import generate_recipe
+
+
+def best_time(func, repetitions):
+    timings = []
+    for i in xrange(repetitions):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(argv):
+    num_of_statements = int(argv[0]) if argv else 200000
+    repetitions = int(argv[1]) if len(argv) > 1 else 3
+    source = generate_recipe(num_of_statements)
+    fd, filename = tempfile.mkstemp(suffix='.chef')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(source)
+
+        def from_file():
+            with open(filename) as f:
+                parse_recipe(f)
+
+        def from_string():
+            parse_recipe_string(source)
+
+        def from_mmap():
+            with open(filename) as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    parse_recipe_bytes(buffer)
+                finally:
+                    buffer.close()
+        for name, func in [('file', from_file), ('string', from_string),
+                ('mmap', from_mmap)]:
+            print '%-6s %.3f s' % (name, best_time(func, repetitions))
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+'''Compares parsing a large, machine-generated recipe with loading it from
+its cache file.
+
+Usage: bench_cache.py [number-of-statements [repetitions]]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from chef.parser import parse_recipe
+from chef.cache import parse_recipe_cached, cache_filename
+
+from bench_parser import generate_recipe
+
+
+def best_time(func, repetitions):
+    timings = []
+    for i in xrange(repetitions):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def bench(num_of_statements, repetitions):
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'generated.chef')
+        with open(filename, 'w') as f:
+            f.write(generate_recipe(num_of_statements))
+
+        def parse():
+            with open(filename) as f:
+                parse_recipe(f)
+
+        def load():
+            with open(filename) as f:
+                parse_recipe_cached(f)
+        # write the cache file
+        load()
+        assert os.path.exists(cache_filename(filename))
+        return best_time(parse, repetitions), best_time(load, repetitions)
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv):
+    num_of_statements = int(argv[0]) if argv else 200000
+    repetitions = int(argv[1]) if len(argv) > 1 else 3
+    parse, load = bench(num_of_statements, repetitions)
+    print '%d statements: parsed in %.3f s, loaded from cache in %.3f s' % (
+        num_of_statements, parse, load)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
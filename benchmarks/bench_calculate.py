@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+'''Measures the time per instruction of a recipe which does arithmetic on the
+top of a mixing bowl while the mixing bowl grows by one ingredient per
+iteration, for loops of increasing length. The time per instruction should
+not depend on how deep the mixing bowl gets.
+
+Usage: bench_calculate.py [largest-number-of-iterations [engine]]
+
+'''
+import sys
+import time
+
+from chef.parser import parse_recipe_string
+from chef.interpreter import interpret_recipe
+
+RECIPE = '''Growing bowl.
+
+Ingredients.
+%d counter
+1 one
+2 two
+
+Method.
+Put one into mixing bowl.
+Count the counter.
+Put counter into mixing bowl.
+Add one to mixing bowl.
+Combine two into mixing bowl.
+Remove one from mixing bowl.
+Divide two into mixing bowl.
+Count the counter until counted.
+'''
+
+
+def bench(num_of_iterations, engine):
+    recipe = parse_recipe_string(RECIPE % num_of_iterations)
+    start = time.time()
+    interpret_recipe(recipe, engine)
+    return time.time() - start
+
+
+def main(argv):
+    largest = int(argv[0]) if argv else 1000000
+    engine = argv[1] if len(argv) > 1 else 'bytecode'
+    num_of_iterations = 1000
+    while num_of_iterations <= largest:
+        seconds = bench(num_of_iterations, engine)
+        # each iteration executes seven instructions
+        print '%s, %7d iterations: %.3f s (%.2f us per instruction)' % (
+            engine, num_of_iterations, seconds,
+            seconds / num_of_iterations / 7 * 1e6)
+        num_of_iterations *= 10
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''Measures the time per run of "chef" for many short runs of a small recipe,
+with and without the daemon of "chef serve".
+
+Usage: bench_daemon.py [number-of-runs]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+CHEF = os.path.join(os.path.dirname(__file__), os.pardir, 'bin', 'chef')
+
+RECIPE = '''Short order.
+
+Ingredients.
+72 g haricot beans
+105 ml water
+
+Method.
+Put water into mixing bowl.
+Put haricot beans into mixing bowl.
+Liquefy contents of the mixing bowl.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.
+'''
+
+
+def bench(argv, num_of_runs):
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        for i in xrange(num_of_runs):
+            subprocess.check_call(
+                [sys.executable, CHEF] + argv, stdout=devnull)
+        return (time.time() - start) / num_of_runs
+
+
+def main(argv):
+    num_of_runs = int(argv[0]) if argv else 50
+    directory = tempfile.mkdtemp()
+    try:
+        recipe_file = os.path.join(directory, 'short.chef')
+        with open(recipe_file, 'w') as f:
+            f.write(RECIPE)
+        socket_path = os.path.join(directory, 'chef.sock')
+        daemon = subprocess.Popen(
+            [sys.executable, CHEF, 'serve', '--socket', socket_path])
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.01)
+            plain = bench(['-f', recipe_file, '--no-cache'], num_of_runs)
+            with_daemon = bench([
+                'run', '--daemon', '--socket', socket_path,
+                '-f', recipe_file], num_of_runs)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    finally:
+        shutil.rmtree(directory)
+    print '%d runs' % num_of_runs
+    print 'chef:                %.1f ms per run' % (plain * 1e3)
+    print 'chef run --daemon:   %.1f ms per run' % (with_daemon * 1e3)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+'''Measures how the time to parse the ingredient list grows with the number
+of declared ingredients.
+
+Usage: bench_ingredients.py [largest-number-of-ingredients]
+
+'''
+import sys
+import time
+
+from chef.parser import parse_ingredient_list
+
+MEASURES = ['', 'g ', 'kg ', 'pinches ', 'ml ', 'dashes ', 'cups ']
+
+
+def generate_ingredient_list(num_of_ingredients):
+    lines = []
+    for i in xrange(num_of_ingredients):
+        lines.append('%d %singredient %d' % (
+            i, MEASURES[i % len(MEASURES)], i))
+    # redeclare some of the ingredients to exercise the override semantics
+    for i in xrange(0, num_of_ingredients, 10):
+        lines.append('%d ingredient %d' % (-i, i))
+    return '\n'.join(lines) + '\n'
+
+
+def bench(num_of_ingredients, repetitions=3):
+    ingredient_list = generate_ingredient_list(num_of_ingredients)
+    timings = []
+    for i in xrange(repetitions):
+        start = time.time()
+        parse_ingredient_list(ingredient_list, 1)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(argv):
+    largest = int(argv[0]) if argv else 32000
+    num_of_ingredients = 1000
+    while num_of_ingredients <= largest:
+        best = bench(num_of_ingredients)
+        print '%6d ingredients: %.4f s (%.2f us per ingredient)' % (
+            num_of_ingredients, best, best / num_of_ingredients * 1e6)
+        num_of_ingredients *= 2
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+'''Measures the time per number of reading the input of "take" from a text
+file and from a binary file (see chef.refrigerator).
+
+Usage: bench_input.py [number-of-numbers]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from chef.refrigerator import NumberReader, BinaryNumberReader,\
+        write_numbers
+
+
+def readline_numbers(f, num_of_numbers):
+    for i in xrange(num_of_numbers):
+        int(f.readline().strip())
+
+
+def reader_numbers(reader, num_of_numbers):
+    read_number = reader.read_number
+    for i in xrange(num_of_numbers):
+        read_number(3)
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main(argv):
+    num_of_numbers = int(argv[0]) if argv else 1000000
+    numbers = xrange(10 ** 12, 10 ** 12 + num_of_numbers)
+    directory = tempfile.mkdtemp()
+    try:
+        text_filename = os.path.join(directory, 'numbers.txt')
+        binary_filename = os.path.join(directory, 'numbers.bin')
+        with open(text_filename, 'w') as f:
+            f.writelines(['%d\n' % number for number in numbers])
+        with open(binary_filename, 'wb') as f:
+            write_numbers(f, numbers)
+        with open(text_filename) as f:
+            timings = [('readline', timed(
+                readline_numbers, f, num_of_numbers))]
+        with open(text_filename) as f:
+            timings.append(('NumberReader', timed(
+                reader_numbers, NumberReader(f), num_of_numbers)))
+        with open(binary_filename, 'rb') as f:
+            reader = BinaryNumberReader(f)
+        timings.append(('BinaryNumberReader', timed(
+            reader_numbers, reader, num_of_numbers)))
+    finally:
+        shutil.rmtree(directory)
+    print '%d numbers' % num_of_numbers
+    for name, seconds in timings:
+        print '%-20s %.3f s (%.3f us per number)' % (
+            name, seconds, seconds / num_of_numbers * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+'''Measures how long it takes to execute a recipe whose loop runs many times.
+
+Usage: bench_interpreter.py [number-of-iterations [repetitions [engine]]]
+
+'''
+from __future__ import with_statement
+
+import sys
+import time
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from chef.parser import parse_recipe
+from chef.interpreter import interpret_recipe
+
+RECIPE = '''Counting loop.
+
+Ingredients.
+%d counter
+1 one
+
+Method.
+Count the counter.
+Put counter into mixing bowl.
+Add one to mixing bowl.
+Combine one into mixing bowl.
+Remove one from mixing bowl.
+Clean mixing bowl.
+Count the counter until counted.
+'''
+
+
+def bench(num_of_iterations, repetitions, engine='bytecode'):
+    source = RECIPE % num_of_iterations
+    timings = []
+    for i in xrange(repetitions):
+        recipe = parse_recipe(StringIO(source))
+        start = time.time()
+        interpret_recipe(recipe, engine)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(argv):
+    num_of_iterations = int(argv[0]) if argv else 100000
+    repetitions = int(argv[1]) if len(argv) > 1 else 3
+    engine = argv[2] if len(argv) > 2 else 'bytecode'
+    best = bench(num_of_iterations, repetitions, engine)
+    # each iteration executes seven instructions
+    print '%s, %d iterations: %.3f s (%.2f us per instruction)' % (
+        engine, num_of_iterations, best, best / num_of_iterations / 7 * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
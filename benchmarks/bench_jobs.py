@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+'''Measures the time per job of executing many jobs of a small recipe which
+takes two numbers, by running "chef" once per job and by "chef batch".
+
+Usage: bench_jobs.py [number-of-jobs [number-of-processes]]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+CHEF = os.path.join(os.path.dirname(__file__), os.pardir, 'bin', 'chef')
+
+RECIPE = '''Sum.
+
+Ingredients.
+number
+
+Method.
+Take number from refrigerator.
+Put number into mixing bowl.
+Take number from refrigerator.
+Add number to mixing bowl.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.
+'''
+
+
+def main(argv):
+    num_of_jobs = int(argv[0]) if argv else 200
+    processes = argv[1] if len(argv) > 1 else '4'
+    directory = tempfile.mkdtemp()
+    try:
+        recipe_file = os.path.join(directory, 'sum.chef')
+        with open(recipe_file, 'w') as f:
+            f.write(RECIPE)
+        with open(os.path.join(directory, 'input.txt'), 'w') as f:
+            f.write('20\n3\n')
+        manifest = os.path.join(directory, 'manifest.jsonl')
+        with open(manifest, 'w') as f:
+            f.write(
+                '{"recipe": "sum.chef", "input": "input.txt"}\n' * num_of_jobs)
+        with open(os.devnull, 'w') as devnull:
+            start = time.time()
+            for i in xrange(num_of_jobs):
+                with open(os.path.join(directory, 'input.txt')) as stdin:
+                    subprocess.check_call(
+                        [sys.executable, CHEF, '-f', recipe_file,
+                            '--no-cache'],
+                        stdin=stdin, stdout=devnull)
+            single = (time.time() - start) / num_of_jobs
+            start = time.time()
+            subprocess.check_call(
+                [sys.executable, CHEF, 'batch', '-j', processes, manifest],
+                stdout=devnull)
+            batch = (time.time() - start) / num_of_jobs
+    finally:
+        shutil.rmtree(directory)
+    print '%d jobs' % num_of_jobs
+    print 'chef per job:          %.2f ms per job' % (single * 1e3)
+    print 'chef batch -j %s:       %.2f ms per job' % (processes, batch * 1e3)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
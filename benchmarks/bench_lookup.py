@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+'''Measures how the time to execute a recipe grows with the number of
+declared ingredients which are not used by its method.
+
+Usage: bench_lookup.py [largest-number-of-ingredients [iterations]]
+
+'''
+import sys
+import time
+
+from chef.parser import parse_recipe_string
+from chef.interpreter import interpret_recipe
+
+METHOD = '''Method.
+Count the counter.
+Put counter into mixing bowl.
+Add one to mixing bowl.
+Clean mixing bowl.
+Count the counter until counted.
+'''
+
+
+def generate_recipe(num_of_ingredients, num_of_iterations):
+    lines = ['Lookups.', '', 'Ingredients.']
+    for i in xrange(num_of_ingredients):
+        lines.append('%d ingredient %d' % (i, i))
+    lines.append('%d counter' % num_of_iterations)
+    lines.append('1 one')
+    return '\n'.join(lines) + '\n\n' + METHOD
+
+
+def bench(num_of_ingredients, num_of_iterations, repetitions=3):
+    source = generate_recipe(num_of_ingredients, num_of_iterations)
+    timings = []
+    for i in xrange(repetitions):
+        # executing a recipe changes the values of its ingredients
+        recipe = parse_recipe_string(source)
+        start = time.time()
+        interpret_recipe(recipe)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(argv):
+    largest = int(argv[0]) if argv else 1000
+    num_of_iterations = int(argv[1]) if len(argv) > 1 else 10000
+    num_of_ingredients = 10
+    while num_of_ingredients <= largest:
+        best = bench(num_of_ingredients, num_of_iterations)
+        # each iteration executes five instructions
+        print '%5d ingredients: %.3f s (%.2f us per instruction)' % (
+            num_of_ingredients, best, best / num_of_iterations / 5 * 1e6)
+        num_of_ingredients *= 10
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
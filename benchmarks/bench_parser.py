@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+'''Measures how long it takes to parse a large, machine-generated recipe.
+
+Usage: bench_parser.py [number-of-statements [repetitions]]
+
+'''
+from __future__ import with_statement
+
+import sys
+import time
+import random
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from chef.parser import parse_recipe
+
+STATEMENTS = [
+    'Take sugar from refrigerator.',
+    'Put sugar into mixing bowl.',
+    'Put flour into 2nd mixing bowl.',
+    'Fold eggs into 3rd mixing bowl.',
+    'Add flour to 2nd mixing bowl.',
+    'Add dry ingredients.',
+    'Remove eggs.',
+    'Combine sugar into mixing bowl.',
+    'Divide flour.',
+    'Liquefy sugar.',
+    'Liquefy contents of the mixing bowl.',
+    'Stir for 3 minutes.',
+    'Stir the 2nd mixing bowl for 2 minutes.',
+    'Stir eggs into the mixing bowl.',
+    'Mix the mixing bowl well.',
+    'Clean 2nd mixing bowl.',
+    'Pour contents of the mixing bowl into the baking dish.',
+    'Knead the eggs.\nPut eggs into mixing bowl.\nKnead the eggs until kneaded.']
+
+
+def generate_recipe(num_of_statements, seed=0):
+    rnd = random.Random(seed)
+    lines = [
+        'A generated recipe.',
+        '',
+        'Ingredients.',
+        '10 g sugar',
+        '20 g flour',
+        '3 eggs',
+        '',
+        'Method.']
+    for i in xrange(num_of_statements):
+        lines.append(rnd.choice(STATEMENTS))
+    lines.extend(['', 'Serves 1.', ''])
+    return '\n'.join(lines)
+
+
+def bench(num_of_statements, repetitions):
+    source = generate_recipe(num_of_statements)
+    timings = []
+    for i in xrange(repetitions):
+        f = StringIO(source)
+        start = time.time()
+        parse_recipe(f)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(argv):
+    num_of_statements = int(argv[0]) if argv else 200000
+    repetitions = int(argv[1]) if len(argv) > 1 else 3
+    best = bench(num_of_statements, repetitions)
+    print '%d statements: %.3f s (%.2f us per statement)' % (
+        num_of_statements, best, best / num_of_statements * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
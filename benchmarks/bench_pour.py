@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+'''Measures the time of pouring a large mixing bowl into a baking dish
+repeatedly and of changing both afterwards.
+
+Usage: bench_pour.py [number-of-elements [pours]]
+
+'''
+import sys
+import time
+
+from chef.datastructures import Ingredient, IngredientProperties,\
+        Ingredients, CompactIngredients
+
+
+def generate_ingredients(num_of_elements):
+    return [
+        Ingredient('sugar', IngredientProperties(value, True, False))
+        for value in xrange(num_of_elements)]
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def bench(container_class, ingredients, num_of_pours):
+    mixing_bowl = container_class(ingredients)
+    baking_dish = container_class()
+    pour = min([
+        timed(baking_dish.extend, mixing_bowl)
+        for i in xrange(num_of_pours)])
+    # the first changes of the bottom of both containers after pouring
+    change = timed(mixing_bowl.__setitem__, 0, ingredients[-1]) + \
+        timed(baking_dish.__setitem__, 0, ingredients[-1])
+    return [pour, change]
+
+
+def main(argv):
+    num_of_elements = int(argv[0]) if argv else 1000000
+    num_of_pours = int(argv[1]) if len(argv) > 1 else 10
+    ingredients = generate_ingredients(num_of_elements)
+    print '%d elements, %d pours' % (num_of_elements, num_of_pours)
+    print '%-20s %10s %10s' % ('container', 'pour', 'change')
+    for container_class in [Ingredients, CompactIngredients]:
+        print '%-20s %9.4fs %9.4fs' % tuple(
+            [container_class.__name__] +
+            bench(container_class, ingredients, num_of_pours))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+'''Measures the throughput of serving a large baking dish, whose ingredients
+are numbers with ten digits.
+
+Usage: bench_serves.py [number-of-elements [output-file]]
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import time
+
+from chef.datastructures import Ingredient, IngredientProperties,\
+        CompactIngredients
+from chef.interpreter import Interpreter, open_output
+
+
+def main(argv):
+    num_of_elements = int(argv[0]) if argv else 10000000
+    filename = argv[1] if len(argv) > 1 else os.devnull
+    interpreter = Interpreter()
+    interpreter.baking_dishes = [CompactIngredients(
+        Ingredient('sugar', IngredientProperties(value, True, False))
+        for value in xrange(10 ** 9, 10 ** 9 + num_of_elements))]
+    size = num_of_elements * 10
+    with open_output(filename) as output:
+        start = time.time()
+        interpreter.serves(1, output)
+        seconds = time.time() - start
+    print '%d elements, %.1f MB: %.2f s (%.1f MB/s)' % (
+        num_of_elements, size / 1e6, seconds, size / 1e6 / seconds)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
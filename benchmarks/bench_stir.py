@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+'''Measures the time to stir the top n ingredients of mixing bowls which hold
+many ingredients, for n from a few ingredients up to the whole bowl.
+
+Usage: bench_stir.py [number-of-elements [stirs]]
+
+'''
+import sys
+import time
+
+from chef.datastructures import Ingredient, IngredientProperties,\
+        Ingredients, CompactIngredients
+
+
+def generate_ingredients(num_of_elements):
+    names = ['sugar', 'flour', 'eggs', 'milk']
+    return [
+        Ingredient(names[value % 4], IngredientProperties(value, True, False))
+        for value in xrange(num_of_elements)]
+
+
+def bench(mixing_bowl, n, num_of_stirs):
+    'Return the average time in seconds of stirring the top `n` ingredients.'
+    start = time.time()
+    for i in xrange(num_of_stirs):
+        mixing_bowl.stir(n)
+    return (time.time() - start) / num_of_stirs
+
+
+def main(argv):
+    num_of_elements = int(argv[0]) if argv else 1000000
+    num_of_stirs = int(argv[1]) if len(argv) > 1 else 1000
+    ingredients = generate_ingredients(num_of_elements)
+    depths = [1, 10, 1000, 100000, num_of_elements // 2, num_of_elements - 1]
+    print '%d elements, %d stirs' % (num_of_elements, num_of_stirs)
+    print '%-20s' % 'n' + ''.join(['%12d' % n for n in depths])
+    for container_class in [Ingredients, CompactIngredients]:
+        mixing_bowl = container_class(ingredients)
+        timings = [bench(mixing_bowl, n, num_of_stirs) for n in depths]
+        print '%-20s' % container_class.__name__ + ''.join([
+            '%10.2fus' % (timing * 1e6) for timing in timings])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+'''Measures the time per number of a recipe which takes many numbers from the
+refrigerator, with and without the background reader.
+
+Usage: bench_take.py [number-of-numbers [engine]]
+
+'''
+import sys
+import time
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from chef.parser import parse_recipe_string
+from chef.interpreter import interpret_recipe
+from chef.refrigerator import NumberReader
+
+RECIPE = '''Cold leftovers.
+
+Ingredients.
+%d counter
+0 leftover
+
+Method.
+Count the counter.
+Take leftover from refrigerator.
+Count the counter until counted.
+'''
+
+
+def bench(num_of_numbers, engine, background):
+    recipe = parse_recipe_string(RECIPE % num_of_numbers)
+    stdin = StringIO(''.join([
+        '%d\n' % number for number in xrange(num_of_numbers)]))
+    start = time.time()
+    refrigerator = NumberReader(stdin, background=background)
+    interpret_recipe(recipe, engine, refrigerator=refrigerator)
+    return time.time() - start
+
+
+def main(argv):
+    num_of_numbers = int(argv[0]) if argv else 1000000
+    engine = argv[1] if len(argv) > 1 else 'bytecode'
+    for background in [False, True]:
+        seconds = bench(num_of_numbers, engine, background)
+        print '%s, %d numbers, background=%s: %.3f s (%.2f us per number)' % (
+            engine, num_of_numbers, background, seconds,
+            seconds / num_of_numbers * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+'''Measures the cost of a single call of the functions which check whether an
+until-statement matches the verb of its loop.
+
+Usage: bench_verbs.py [number-of-calls]
+
+'''
+import sys
+import timeit
+
+SETUP = '''
+from chef.morphology import match_verbs, verbs_match, past_form, is_past_form
+pairs = [
+    ('Examine', 'examined'), ('Join', 'joined'), ('Stop', 'stopped'),
+    ('Scan', 'scanned'), ('Add', 'added'), ('Knead', 'kneaded')]
+precomputed = [(present, past, past_form(present)) for present, past in pairs]
+'''
+
+STATEMENTS = [
+    ('uncached', 'for present, past in pairs: match_verbs(present, past)'),
+    ('cached', 'for present, past in pairs: verbs_match(present, past)'),
+    ('precomputed past form',
+        'for present, past, expected in precomputed:'
+        ' is_past_form(past, present, expected)')]
+
+
+def main(argv):
+    number = int(argv[0]) if argv else 100000
+    for name, statement in STATEMENTS:
+        best = min(timeit.repeat(statement, SETUP, repeat=3, number=number))
+        # each statement checks six pairs of verbs
+        print '%-22s %.3f us per call' % (name, best / number / 6 * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+'''Measures the time of serving several large baking dishes to a slow file,
+with and without writing in a background thread. The slow file stands for a
+pipe or a network file system and accepts a fixed number of bytes per
+second.
+
+Usage: bench_write_behind.py [number-of-elements [megabytes-per-second]]
+
+'''
+import sys
+import time
+
+from chef.datastructures import Ingredient, IngredientProperties,\
+        CompactIngredients
+from chef.interpreter import Interpreter
+from chef.utils import BackgroundWriter
+
+
+class SlowFile(object):
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+
+    def write(self, data):
+        time.sleep(len(data) / self.bytes_per_second)
+
+    def flush(self):
+        pass
+
+
+def bench(num_of_elements, stdout):
+    interpreter = Interpreter()
+    interpreter.baking_dishes = [CompactIngredients(
+        Ingredient('sugar', IngredientProperties(value, True, False))
+        for value in xrange(10 ** 9, 10 ** 9 + num_of_elements))
+        for i in xrange(4)]
+    start = time.time()
+    interpreter.serves(4, stdout)
+    return time.time() - start
+
+
+def main(argv):
+    num_of_elements = int(argv[0]) if argv else 1000000
+    rate = float(argv[1]) if len(argv) > 1 else 20.0
+    slow_file = SlowFile(rate * 1e6)
+    print '4 dishes of %d elements, %.1f MB/s' % (num_of_elements, rate)
+    print 'direct:     %.2f s' % bench(num_of_elements, slow_file)
+    writer = BackgroundWriter(slow_file)
+    print 'background: %.2f s' % bench(num_of_elements, writer)
+    writer.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
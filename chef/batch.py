@@ -0,0 +1,159 @@
+'''Parse many recipes at once, spread across several worker processes.'''
+from __future__ import with_statement
+
+import os
+import sys
+import argparse
+try:
+    from collections import namedtuple
+except ImportError:
+    from namedtuple_recipe import namedtuple
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+from chef.parser import parse_recipe
+from chef.cache import parse_recipe_cached
+from chef.errors import ChefError
+
+RECIPE_EXTENSION = '.chef'
+
+# The result of parsing a single recipe file. `recipe` is None if the file
+# could not be parsed or if the recipes were not requested. `error` is the
+# message of the error which occurred while parsing the file and `lineno` its
+# line number, if known.
+ParseResult = namedtuple('ParseResult', 'filename recipe error lineno')
+
+
+def find_recipe_files(paths):
+    '''Yield the names of the recipe files in `paths`. Directories are
+    searched recursively for files ending with ".chef", all other paths are
+    yielded as they are.
+
+    '''
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith(RECIPE_EXTENSION):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+
+def error_message(error):
+    'Return the message of an exception which was raised while parsing.'
+    return getattr(error, 'msg', None) or str(error)
+
+
+def parse_file(filename, cache=False, keep_recipe=True):
+    '''Parse the recipe file `filename` and return a ParseResult. Syntax
+    errors, other errors of the parser and errors while reading the file are
+    stored in the result instead of being raised. If `cache` is true, the
+    cache file of the recipe is used and written (see chef.cache).
+
+    '''
+    try:
+        with open(filename) as f:
+            if cache:
+                recipe = parse_recipe_cached(f)
+            else:
+                recipe = parse_recipe(f)
+    except ChefError, e:
+        return ParseResult(
+            filename, None, error_message(e), getattr(e, 'lineno', None))
+    except AssertionError:
+        # parse_recipe asserts that nothing follows the recipe
+        return ParseResult(
+            filename, None, 'unexpected text after the recipe', None)
+    except EnvironmentError, e:
+        return ParseResult(filename, None, str(e), None)
+    except Exception, e:
+        # e.g. the ValueError of chef.parser.detect_ingredient_state; a single
+        # file must not stop parsing the others
+        return ParseResult(
+            filename, None, '%s: %s' % (e.__class__.__name__, e), None)
+    if not keep_recipe:
+        recipe = None
+    return ParseResult(filename, recipe, None, None)
+
+
+def _parse_file_in_worker(args):
+    # the pool can only pass a single argument to its workers
+    return parse_file(*args)
+
+
+def parse_files(filenames, processes=None, cache=False, keep_recipes=True,
+        chunksize=8):
+    '''Parse the recipe files `filenames` in `processes` worker processes
+    (by default one per CPU) and yield a ParseResult for each file as soon as
+    it has been parsed, i.e. not necessarily in the order of `filenames`. A
+    file which cannot be parsed does not stop the others. If `keep_recipes`
+    is false, the parsed recipes are not sent back from the workers, which
+    is enough for checking the syntax or for writing the cache files.
+
+    '''
+    jobs = [(filename, cache, keep_recipes) for filename in filenames]
+    if multiprocessing is None or processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            yield _parse_file_in_worker(job)
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(
+                _parse_file_in_worker, jobs, chunksize):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='chef parse',
+        description='check the syntax of many recipes in parallel')
+    parser.add_argument(
+        'paths', nargs='+', metavar='PATH',
+        help='a recipe file or a directory which contains recipe files')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='the number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '-c', '--cache', action='store_true', default=False,
+        help='write the cache files of the recipes')
+    parser.add_argument(
+        '-q', '--quiet', action='store_true', default=False,
+        help='only report the recipes which could not be parsed')
+    return parser.parse_args(argv)
+
+
+def main(argv, stdout=None):
+    '''Run the "chef parse" command and return its exit status: 0 if all
+    recipes could be parsed and 1 otherwise. The results are written to the
+    file `stdout`, which defaults to sys.stdout.
+
+    '''
+    args = parse_args(argv)
+    if stdout is None:
+        stdout = sys.stdout
+    num_of_errors = 0
+    results = parse_files(
+        find_recipe_files(args.paths), args.jobs, args.cache, False)
+    for result in results:
+        if result.error is None:
+            if not args.quiet:
+                stdout.write('%s: ok\n' % result.filename)
+            continue
+        num_of_errors += 1
+        if result.lineno is None:
+            stdout.write('%s: %s\n' % (result.filename, result.error))
+        else:
+            stdout.write('%s:%d: %s\n' % (
+                result.filename, result.lineno, result.error))
+        stdout.flush()
+    return 1 if num_of_errors else 0
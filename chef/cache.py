@@ -0,0 +1,172 @@
+'''Cache parsed recipes in binary sidecar files, similar to the .pyc files of
+Python. The recipe "hello.chef" is cached in "hello.chefc". A cache file is
+only used if it was written for the same content of the recipe by the same
+version of the parser; otherwise it is rebuilt.
+
+'''
+from __future__ import with_statement
+
+import os
+import errno
+import marshal
+import tempfile
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+from chef.parser import parse_recipe_string, PARSER_VERSION
+from chef.datastructures import Recipe, Ingredient, IngredientProperties,\
+        Ingredients, Instruction, unknown, undefined
+
+# the first bytes of every cache file; change the trailing number whenever
+# the layout of the cache files changes
+MAGIC = 'CHEFC\x00\x01\n'
+CACHE_SUFFIX = '.chefc'
+
+
+def cache_filename(filename):
+    'Return the name of the cache file of the recipe file `filename`.'
+    return os.path.splitext(filename)[0] + CACHE_SUFFIX
+
+
+def source_digest(source):
+    'Return the hash of the content of a recipe which keys its cache file.'
+    return sha1(source).digest()
+
+
+def dump_recipe(recipe):
+    '''Convert the Recipe `recipe` into a tuple which only contains types
+    which the marshal module can write. The singletons `unknown` and
+    `undefined` are stored as None.
+
+    '''
+    ingredients = tuple([
+        (
+            ingredient.name,
+            ingredient.properties.value,
+            _dump_singleton(ingredient.properties.is_dry, unknown),
+            _dump_singleton(ingredient.properties.is_liquid, unknown))
+        for ingredient in recipe.ingredients])
+    instructions = tuple([
+        (instruction.opcode, instruction.operands, instruction.jump)
+        for instruction in recipe.instructions])
+    return (
+        ingredients,
+        _dump_singleton(recipe.cooking_time, undefined),
+        _dump_singleton(recipe.oven_temperature, undefined),
+        instructions,
+        _dump_singleton(recipe.serves, undefined))
+
+
+def load_recipe(data):
+    'Create the Recipe which was converted with dump_recipe.'
+    ingredients, cooking_time, oven_temperature, instructions, serves = data
+    ingredients = Ingredients([
+        Ingredient(name, IngredientProperties(
+            value,
+            _load_singleton(is_dry, unknown),
+            _load_singleton(is_liquid, unknown)))
+        for name, value, is_dry, is_liquid in ingredients])
+    instructions = [
+        Instruction(opcode, operands, jump)
+        for opcode, operands, jump in instructions]
+    return Recipe(
+        ingredients,
+        _load_singleton(cooking_time, undefined),
+        _load_singleton(oven_temperature, undefined),
+        instructions,
+        _load_singleton(serves, undefined))
+
+
+def _dump_singleton(value, singleton):
+    if value is singleton:
+        return None
+    return value
+
+
+def _load_singleton(value, singleton):
+    if value is None:
+        return singleton
+    return value
+
+
+def read_cache(filename, digest):
+    '''Return the Recipe which is cached in the file `filename` for the recipe
+    whose content has the hash `digest`. Return None if there is no cache
+    file or if it is stale or corrupt.
+
+    '''
+    try:
+        with open(filename, 'rb') as f:
+            content = f.read()
+    except IOError:
+        return None
+    if not content.startswith(MAGIC):
+        return None
+    try:
+        parser_version, cached_digest, data = marshal.loads(
+            content[len(MAGIC):])
+        if parser_version != PARSER_VERSION or cached_digest != digest:
+            return None
+        return load_recipe(data)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def _create_temp_file(directory):
+    # like tempfile.mkstemp, but the file gets the mode of a new file as
+    # created by open(), because the kernel applies the umask; reading the
+    # umask would change it for all threads for a moment
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    for attempt in xrange(tempfile.TMP_MAX):
+        tmp_filename = os.path.join(
+            directory, 'tmp%s%s' % (os.urandom(6).encode('hex'), CACHE_SUFFIX))
+        try:
+            return os.open(tmp_filename, flags, 0666), tmp_filename
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+    raise IOError(errno.EEXIST, 'no unused name for a temporary file')
+
+
+def write_cache(filename, digest, recipe):
+    '''Write the Recipe `recipe` into the cache file `filename`. The file is
+    replaced atomically, so that concurrent runs never read a half-written
+    file. Errors are ignored, e.g. if the directory is not writable.
+
+    '''
+    content = MAGIC + marshal.dumps(
+        (PARSER_VERSION, digest, dump_recipe(recipe)))
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        fd, tmp_filename = _create_temp_file(directory)
+    except (IOError, OSError):
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.rename(tmp_filename, filename)
+    except (IOError, OSError):
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+
+
+def parse_recipe_cached(f, filename=None):
+    '''Like chef.parser.parse_recipe, but load the recipe from its cache file
+    if it is up to date and write the cache file otherwise. `filename` is the
+    name of the recipe file and defaults to the name of `f`.
+
+    '''
+    if filename is None:
+        filename = f.name
+    source = f.read()
+    digest = source_digest(source)
+    cached = cache_filename(filename)
+    recipe = read_cache(cached, digest)
+    if recipe is None:
+        recipe = parse_recipe_string(source)
+        write_cache(cached, digest, recipe)
+    return recipe
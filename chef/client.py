@@ -0,0 +1,205 @@
+'''Let a daemon ("chef serve", see chef.daemon) execute a recipe for the
+command "chef run --daemon".
+
+Client and daemon exchange frames over a Unix socket: a kind of one byte, the
+length of the payload as a four-byte big-endian number and the payload. The
+client sends its command line arguments (ARGUMENTS, separated by NUL bytes),
+its working directory (DIRECTORY) and then its STDIN as INPUT frames, an
+empty one at its end. The daemon answers with the served dishes in OUTPUT
+frames, an optional error message (ERROR) and the exit status (STATUS) as the
+last frame.
+
+The client imports neither the parser nor the interpreter, so that it starts
+quickly.
+
+'''
+import os
+import sys
+import socket
+import stat
+import struct
+import tempfile
+from functools import partial
+try:
+    import threading
+except ImportError:
+    threading = None
+
+# the kinds of the frames
+ARGUMENTS = 'A'
+DIRECTORY = 'D'
+INPUT = 'I'
+OUTPUT = 'O'
+ERROR = 'E'
+STATUS = 'S'
+
+_HEADER = struct.Struct('>cI')
+
+# the number of bytes of STDIN which the client sends at once
+INPUT_CHUNK_SIZE = 1 << 16
+
+
+class DaemonError(Exception):
+    'A request which the daemon cannot execute, or a broken connection.'
+
+
+def socket_directory():
+    '''Return the private directory of the current user for the socket of
+    the daemon: $XDG_RUNTIME_DIR if it is set, and otherwise a directory of
+    the user in the temporary directory (see check_private_directory).
+
+    '''
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if directory:
+        return directory
+    return os.path.join(tempfile.gettempdir(), 'chef-%d' % os.getuid())
+
+
+def default_socket_path():
+    'Return the path of the socket of the daemon of the current user.'
+    return os.path.join(socket_directory(), 'chef.sock')
+
+
+def check_owner(path):
+    '''Raise a DaemonError if the file `path` belongs to another user, who
+    could have created it in place of the daemon or of its directory.
+
+    '''
+    if os.lstat(path).st_uid != os.getuid():
+        raise DaemonError('%s belongs to another user' % path)
+
+
+def check_private_directory(directory):
+    '''Raise a DaemonError unless `directory` is a directory which only the
+    current user can access.
+
+    '''
+    check_owner(directory)
+    mode = os.lstat(directory).st_mode
+    if not stat.S_ISDIR(mode) or stat.S_IMODE(mode) & 077:
+        raise DaemonError('%s is not a private directory' % directory)
+
+
+def send_frame(f, kind, payload=''):
+    'Write a frame of the kind `kind` to the file `f`.'
+    f.write(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def read_frame(f):
+    '''Read a frame from the file `f` and return its kind and its payload.
+    Raise a DaemonError if the connection has been closed.
+
+    '''
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise DaemonError('the connection has been closed')
+    kind, size = _HEADER.unpack(header)
+    payload = f.read(size)
+    if len(payload) < size:
+        raise DaemonError('the connection has been closed')
+    return kind, payload
+
+
+def _send_input(f, stdin):
+    # the target of the thread which sends the STDIN of the client
+    try:
+        read = partial(os.read, stdin.fileno())
+    except AttributeError:
+        read = stdin.read
+    try:
+        while True:
+            data = read(INPUT_CHUNK_SIZE)
+            send_frame(f, INPUT, data)
+            if not data:
+                return
+    except EnvironmentError:
+        # the daemon has finished the request
+        pass
+
+
+class _SocketWriter(object):
+    # a file which only writes to the socket `sock`
+    def __init__(self, sock):
+        self.write = sock.sendall
+
+
+def run_client(argv, path=None, stdin=None, stdout=None, stderr=None):
+    '''Let the daemon which listens on the Unix socket `path` (by default
+    default_socket_path) execute the recipe for the command line arguments
+    `argv` of "chef", while sending `stdin` to it and writing its output to
+    `stdout` and `stderr` (by default the standard files). Return the exit
+    status.
+
+    '''
+    if stdin is None:
+        stdin = sys.stdin
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+    if path is None:
+        path = default_socket_path()
+    try:
+        if path == default_socket_path():
+            check_private_directory(os.path.dirname(path))
+        check_owner(path)
+    except OSError, e:
+        stderr.write('chef: no daemon listens on %s (%s)\n' % (path, e))
+        return 1
+    except DaemonError, e:
+        stderr.write('chef: %s\n' % e)
+        return 1
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error, e:
+        sock.close()
+        stderr.write('chef: no daemon listens on %s (%s)\n' % (path, e))
+        return 1
+    rfile = sock.makefile('rb')
+    # the frames are sent by two threads, so they go directly to the socket
+    # instead of through the buffer of a file object
+    wfile = _SocketWriter(sock)
+    try:
+        send_frame(wfile, ARGUMENTS, '\0'.join(argv))
+        send_frame(wfile, DIRECTORY, os.getcwd())
+        thread = threading.Thread(target=_send_input, args=(wfile, stdin))
+        thread.setDaemon(True)
+        thread.start()
+        while True:
+            try:
+                kind, payload = read_frame(rfile)
+            except DaemonError, e:
+                stderr.write('chef: %s\n' % e)
+                return 1
+            if kind == OUTPUT:
+                stdout.write(payload)
+                stdout.flush()
+            elif kind == ERROR:
+                stderr.write(payload)
+            elif kind == STATUS:
+                return int(payload)
+    finally:
+        rfile.close()
+        sock.close()
+
+
+def main(argv):
+    '''Run the "chef run --daemon [--socket PATH] ARGUMENTS" command; the
+    other arguments are passed on to the daemon.
+
+    '''
+    argv = [argument for argument in argv if argument != '--daemon']
+    if argv[:1] == ['run']:
+        del argv[0]
+    path = None
+    for index, argument in enumerate(argv):
+        if argument == '--socket' and index + 1 < len(argv):
+            path = argv[index + 1]
+            del argv[index:index + 2]
+            break
+        if argument.startswith('--socket='):
+            path = argument[len('--socket='):]
+            del argv[index]
+            break
+    return run_client(argv, path)
@@ -0,0 +1,264 @@
+'''Compile the instructions of a recipe into flat code for a single dispatch
+loop.
+
+Every ingredient which is declared by the recipe is assigned a slot, i.e. an
+index into the array which holds the global ingredients while the code runs,
+so that the code never looks up an ingredient by its name. An instruction
+which uses an ingredient that is not declared is reported when the recipe is
+compiled.
+
+The code is a list of tuples (vm_opcode, target, slot, operands, extra).
+`operands` are the operands of the chef.datastructures.Instruction which the
+entry was compiled from and `slot` is the slot of its ingredient, or None if
+it has none. The meaning of `target` and `extra` depends on `vm_opcode`:
+
+JUMP_IF_ZERO        loop start; `target` is the index of the entry after the
+                    loop
+DECREMENT_AND_JUMP  until-statement; `target` is the index of the loop start
+PUT, CLEAN          `target` is the index of the mixing bowl
+CALCULATE           add, remove, combine and divide; `target` is the index of
+                    the mixing bowl and `extra` the arithmetic function
+CALL                every other command; `target` is the opcode of the
+                    command whose method of the interpreter is called
+
+Mixing bowl indices are only precomputed for valid mixing bowl IDs; an
+instruction with an invalid ID is compiled to CALL, so that the interpreter
+reports the error.
+
+'''
+from operator import add, sub, mul, floordiv as div
+try:
+    from collections import namedtuple
+except ImportError:
+    from namedtuple_recipe import namedtuple
+
+from chef.datastructures import Ingredient, IngredientProperties,\
+        COMMAND_FIELDS, COMMANDS, OPCODES, LOOP_START, LOOP_END
+from chef.errors.runtime import UndefinedIngredientError
+
+CALL = 0
+JUMP_IF_ZERO = 1
+DECREMENT_AND_JUMP = 2
+PUT = 3
+CALCULATE = 4
+CLEAN = 5
+
+_arithmetic_functions = {
+    OPCODES['add']: add,
+    OPCODES['remove']: sub,
+    OPCODES['combine']: mul,
+    OPCODES['divide']: div}
+
+# the index of the ingredient in the operands of each command or None
+_ingredient_operands = [
+    fields.index('ingredient') if 'ingredient' in fields else None
+    for command, fields in COMMAND_FIELDS]
+
+# The code of a recipe. `ingredient_names` are the names of the declared
+# ingredients, in the order of their slots.
+CompiledRecipe = namedtuple('CompiledRecipe', 'code ingredient_names')
+
+
+def mixing_bowl_index(mixing_bowl_id):
+    '''Return the index of the mixing bowl with the ID `mixing_bowl_id` in
+    the list of mixing bowls or None if the ID is invalid.
+
+    '''
+    if mixing_bowl_id is None:
+        return 0
+    if mixing_bowl_id < 1:
+        return None
+    return mixing_bowl_id - 1
+
+
+def instruction_ingredient(instruction):
+    'Return the name of the ingredient of `instruction` or None.'
+    index = _ingredient_operands[instruction.opcode]
+    if index is None:
+        return None
+    return instruction.operands[index]
+
+
+def ingredient_slots(ingredients, instructions):
+    '''Return a dict which maps the names of the declared `ingredients` to
+    their slots. Raise an UndefinedIngredientError for the first instruction
+    in `instructions` which uses an ingredient that is not declared.
+
+    '''
+    slots = {}
+    for ingredient in ingredients:
+        if ingredient.name not in slots:
+            slots[ingredient.name] = len(slots)
+    for instruction in instructions:
+        name = instruction_ingredient(instruction)
+        if name is not None and name not in slots:
+            raise UndefinedIngredientError(name, instruction.lineno)
+    return slots
+
+
+def compile_instructions(instructions, slots):
+    '''Compile the list `instructions`, whose loops have been resolved by
+    chef.parser.resolve_loops, and return the code. `slots` maps the names of
+    the ingredients to their slots (see ingredient_slots).
+
+    '''
+    code = []
+    for pc, instruction in enumerate(instructions):
+        opcode = instruction.opcode
+        operands = instruction.operands
+        slot = slots.get(instruction_ingredient(instruction))
+        entry = (CALL, opcode, slot, operands, None)
+        if opcode == LOOP_START:
+            entry = (JUMP_IF_ZERO, pc + instruction.jump + 1, slot, operands,
+                None)
+        elif opcode == LOOP_END:
+            entry = (DECREMENT_AND_JUMP, pc - instruction.jump, slot,
+                operands, None)
+        elif opcode == OPCODES['put'] or opcode in _arithmetic_functions:
+            index = mixing_bowl_index(operands[1])
+            if index is not None:
+                if opcode == OPCODES['put']:
+                    entry = (PUT, index, slot, operands, None)
+                else:
+                    entry = (
+                        CALCULATE, index, slot, operands,
+                        _arithmetic_functions[opcode])
+        elif opcode == OPCODES['clean']:
+            index = mixing_bowl_index(operands[0])
+            if index is not None:
+                entry = (CLEAN, index, slot, operands, None)
+        code.append(entry)
+    return code
+
+
+def compile_recipe(recipe):
+    '''Compile the instructions of the Recipe `recipe` and return a
+    CompiledRecipe. Raise an UndefinedIngredientError if an instruction uses
+    an ingredient which the recipe does not declare.
+
+    '''
+    slots = ingredient_slots(recipe.ingredients, recipe.instructions)
+    names = sorted(slots, key=slots.get)
+    return CompiledRecipe(
+        compile_instructions(recipe.instructions, slots), names)
+
+
+class GlobalIngredientsView(object):
+    '''The global ingredients of an interpreter which runs compiled code. The
+    ingredients are stored in the list `ingredients` at their slots, which
+    the dict `slots` maps their names to. The view supports the operations of
+    chef.datastructures.Ingredients which the interpreter uses, so the
+    methods of the interpreter work on the same ingredients as the code.
+
+    '''
+    def __init__(self, slots, ingredients):
+        self.slots = slots
+        self.ingredients = ingredients
+
+    def __contains__(self, ingredient_name):
+        return ingredient_name in self.slots
+
+    def __getitem__(self, ingredient_name):
+        return self.ingredients[self.slots[ingredient_name]]
+
+    def __setitem__(self, ingredient_name, ingredient_properties):
+        # the number of ingredients is fixed; a new name raises a KeyError
+        self.ingredients[self.slots[ingredient_name]] = Ingredient(
+            ingredient_name, ingredient_properties)
+
+    def __iter__(self):
+        return iter(self.ingredients)
+
+    def __len__(self):
+        return len(self.ingredients)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.ingredients)
+
+
+def run(compiled_recipe, interpreter):
+    '''Execute the CompiledRecipe `compiled_recipe` with the
+    chef.interpreter.Interpreter `interpreter`. Loops are jumps within the
+    code, so neither the nesting depth nor the number of iterations is
+    limited by the Python stack.
+
+    The global ingredients of the interpreter are copied into an array which
+    is indexed by the slots of the ingredients; afterwards, its attribute
+    `global_ingredients` is a GlobalIngredientsView of the array, and the sum
+    of its dry ingredients is computed again for the view.
+
+    The most frequent instructions operate on the ingredients and mixing
+    bowls directly. Whenever such an instruction cannot be executed, e.g.
+    because of an empty mixing bowl, the method of the interpreter is called
+    instead to raise the error (or, for "put", to create a new mixing bowl).
+
+    '''
+    names = compiled_recipe.ingredient_names
+    ingredients = [interpreter.global_ingredients[name] for name in names]
+    interpreter.global_ingredients = GlobalIngredientsView(
+        dict((name, slot) for slot, name in enumerate(names)), ingredients)
+    interpreter.reset_dry_sum()
+    # the methods of the interpreter, indexed by their opcodes
+    dispatch = [getattr(interpreter, command) for command in COMMANDS]
+    mixing_bowls = interpreter.mixing_bowls
+    tuple_new = tuple.__new__
+    code = compiled_recipe.code
+    pc = 0
+    end = len(code)
+    while pc < end:
+        vm_opcode, target, slot, operands, extra = code[pc]
+        if vm_opcode == JUMP_IF_ZERO:
+            if ingredients[slot].properties.value == 0:
+                pc = target
+                continue
+        elif vm_opcode == DECREMENT_AND_JUMP:
+            if slot is not None:
+                properties = ingredients[slot].properties
+                ingredients[slot] = Ingredient(
+                    operands[1],
+                    IngredientProperties(
+                        properties.value - 1,
+                        properties.is_dry,
+                        properties.is_liquid))
+                if properties.is_dry is True:
+                    interpreter.dry_sum -= 1
+            pc = target
+            continue
+        elif vm_opcode == CALCULATE:
+            properties = ingredients[slot].properties
+            try:
+                mixing_bowl = mixing_bowls[target]
+                top_ingredient = mixing_bowl.top
+            except IndexError:
+                interpreter.calculate(extra, *operands)
+            else:
+                mixing_bowl.replace_top(tuple_new(Ingredient, (
+                    operands[0],
+                    tuple_new(IngredientProperties, (
+                        extra(top_ingredient.properties.value,
+                            properties.value),
+                        properties.is_dry,
+                        properties.is_liquid)))))
+        elif vm_opcode == PUT:
+            try:
+                mixing_bowl = mixing_bowls[target]
+            except IndexError:
+                interpreter.put(*operands)
+            else:
+                mixing_bowl.append(ingredients[slot])
+        elif vm_opcode == CLEAN:
+            try:
+                mixing_bowl = mixing_bowls[target]
+            except IndexError:
+                interpreter.clean(*operands)
+            else:
+                del mixing_bowl[:]
+        else:
+            dispatch[target](*operands)
+        pc += 1
@@ -0,0 +1,230 @@
+'''Execute recipes in a long-running process ("chef serve") on behalf of
+short-lived clients ("chef run --daemon", see chef.client).
+
+The daemon listens on a Unix socket and serves every connection in a thread
+of its own. It keeps the prepared recipes (see
+chef.interpreter.prepare_recipe) in an LRU cache which is keyed by the hash
+of the recipe source and the engine, so a recipe is only parsed and compiled
+when it is requested for the first time.
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import socket
+import argparse
+import SocketServer
+
+from chef.client import DaemonError, ARGUMENTS, DIRECTORY, INPUT, OUTPUT,\
+        ERROR, STATUS, default_socket_path, check_owner,\
+        check_private_directory, send_frame, read_frame
+from chef.errors import ChefError
+from chef.interpreter import execute_recipe, parse_args, open_refrigerator,\
+        open_output
+from chef.prepare import CACHE_SIZE, RecipeCache, prepare_recipe_source
+from chef.utils import BackgroundWriter
+
+
+class _InputFile(object):
+    # the STDIN of the client, read from INPUT frames
+    def __init__(self, f):
+        self.file = f
+        self._buffer = ''
+        self._eof = False
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or not self._buffer):
+            kind, payload = read_frame(self.file)
+            if kind != INPUT:
+                raise DaemonError('unexpected frame %r' % kind)
+            if payload:
+                self._buffer += payload
+            else:
+                self._eof = True
+        if size < 0:
+            size = len(self._buffer)
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+
+class _OutputFile(object):
+    # the STDOUT of the client, written as OUTPUT frames
+    def __init__(self, f):
+        self.file = f
+
+    def write(self, data):
+        send_frame(self.file, OUTPUT, data)
+
+    def flush(self):
+        pass
+
+
+class _ArgumentsError(Exception):
+    # the arguments of a client which argparse has rejected, or --help or
+    # --version; `text` is what argparse would have printed
+    def __init__(self, status, text):
+        Exception.__init__(self, status, text)
+        self.status = status
+        self.text = text
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    # raises an _ArgumentsError instead of printing to the STDOUT or STDERR
+    # of the daemon and exiting
+    def error(self, message):
+        raise _ArgumentsError(2, '%s%s: error: %s\n' % (
+            self.format_usage(), self.prog, message))
+
+    def exit(self, status=0, message=None):
+        raise _ArgumentsError(status, message or '')
+
+    def print_help(self, file=None):
+        self.exit(0, self.format_help())
+
+
+def _read_request(f):
+    # the command line arguments and the working directory of the client
+    values = []
+    for expected_kind in [ARGUMENTS, DIRECTORY]:
+        kind, payload = read_frame(f)
+        if kind != expected_kind:
+            raise DaemonError('unexpected frame %r' % kind)
+        values.append(payload)
+    arguments, directory = values
+    return (arguments.split('\0') if arguments else []), directory
+
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    'Execute the recipe of a single "chef run --daemon".'
+
+    def handle(self):
+        status = 0
+        error = None
+        try:
+            argv, directory = _read_request(self.rfile)
+            status = self.server.run_recipe(
+                argv, directory, _InputFile(self.rfile),
+                _OutputFile(self.wfile))
+        except ChefError, e:
+            status, error = 1, '%s\n' % e
+        except (DaemonError, EnvironmentError), e:
+            status, error = 1, 'chef: %s\n' % e
+        except _ArgumentsError, e:
+            status, error = e.status, e.text
+        except Exception, e:
+            status, error = 1, '%s: %s\n' % (e.__class__.__name__, e)
+        try:
+            if error is not None:
+                send_frame(self.wfile, ERROR, error)
+            send_frame(self.wfile, STATUS, str(status))
+        except socket.error:
+            # the client has gone away
+            pass
+
+
+class ChefDaemon(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    '''Listen on the Unix socket `path` and execute the recipes which the
+    clients request, keeping at most `cache_size` prepared recipes.
+
+    '''
+    daemon_threads = True
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        SocketServer.UnixStreamServer.__init__(self, path, RequestHandler)
+        self.cache = RecipeCache(prepare_recipe_source, cache_size)
+
+    def run_recipe(self, argv, directory, stdin, stdout):
+        '''Execute the recipe as requested by the command line arguments
+        `argv` of a client whose working directory is `directory` and whose
+        STDIN and STDOUT are the files `stdin` and `stdout`. Return the exit
+        status.
+
+        '''
+        args = parse_args(argv, _ArgumentParser)
+        if args.parse_only or not args.file:
+            raise DaemonError('the daemon only executes recipe files')
+        # the paths are relative to the working directory of the client
+        with open(os.path.join(directory, args.file)) as f:
+            source = f.read()
+        if args.input:
+            args.input = os.path.join(directory, args.input)
+        recipe, execute = self.cache.get(source, args.engine)
+        refrigerator = open_refrigerator(args, stdin)
+        if args.output:
+            stdout = open_output(os.path.join(directory, args.output))
+        try:
+            if args.write_behind:
+                with BackgroundWriter(stdout) as writer:
+                    execute_recipe(recipe, execute, writer, refrigerator)
+            else:
+                execute_recipe(recipe, execute, stdout, refrigerator)
+        finally:
+            if args.output:
+                stdout.close()
+        return 0
+
+
+def serve(path=None, cache_size=CACHE_SIZE):
+    '''Return a ChefDaemon which listens on the Unix socket `path` (by
+    default chef.client.default_socket_path, whose private directory is
+    created if needed). A stale socket file is removed; raise a DaemonError
+    if another daemon listens on it or if it belongs to another user.
+
+    '''
+    if path is None:
+        path = default_socket_path()
+        directory = os.path.dirname(path)
+        if not os.path.lexists(directory):
+            os.mkdir(directory, 0700)
+        check_private_directory(directory)
+    if os.path.lexists(path):
+        check_owner(path)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                probe.connect(path)
+            except socket.error:
+                os.remove(path)
+            else:
+                raise DaemonError('a daemon listens on %s' % path)
+        finally:
+            probe.close()
+    return ChefDaemon(path, cache_size)
+
+
+def parse_serve_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='chef serve',
+        description='execute the recipes of "chef run --daemon"')
+    parser.add_argument(
+        '--socket', default=None,
+        help='the path of the Unix socket (default: %s)' %
+            default_socket_path())
+    parser.add_argument(
+        '--cache-size', type=int, default=CACHE_SIZE,
+        help='the number of prepared recipes which are kept (default: %d)' %
+            CACHE_SIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    '''Run the "chef serve" command until it is interrupted and return its
+    exit status.
+
+    '''
+    args = parse_serve_args(argv)
+    try:
+        daemon = serve(args.socket, args.cache_size)
+    except (DaemonError, EnvironmentError), e:
+        sys.stderr.write('chef serve: %s\n' % e)
+        return 1
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+        os.remove(daemon.server_address)
+    return 0
@@ -1,5 +1,12 @@
 from __future__ import with_statement
 
+import sys
+import random
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import izip
+
 try:
     from collections import namedtuple
 except ImportError:
@@ -63,37 +70,967 @@ undefined = Singleton(
     'a singleton used to show if a specific property of a recipe is undefined')
 
 
+# the methods of list which Ingredients overrides, for calling them without
+# looking them up
+_list_getitem = list.__getitem__
+_list_setitem = list.__setitem__
+_list_append = list.append
+_list_pop = list.pop
+
+
 class Ingredients(list):
+    '''A stack of ingredients whose ingredients can also be looked up by
+    their names. The first position of each name is kept in an index, so that
+    looking up, replacing and pushing or popping the top ingredient take
+    constant time. Inserting shifts the positions of the distinct names above
+    the new ingredient; the other changes of the order rebuild the index.
+
+    '''
+    def __init__(self, ingredients=()):
+        list.__init__(self, ingredients)
+        self._reindex()
+
+    def _reindex(self):
+        # map the name of each ingredient to its first position
+        positions = self._positions = {}
+        for index in xrange(len(self) - 1, -1, -1):
+            positions[list.__getitem__(self, index).name] = index
+
+    def _find(self, ingredient_name, start):
+        # the first position of `ingredient_name` from `start` on or None
+        for index in xrange(start, len(self)):
+            if list.__getitem__(self, index).name == ingredient_name:
+                return index
+        return None
+
+    def _forget(self, ingredient_name, index):
+        # the ingredient at `index` has been removed or replaced
+        if self._positions.get(ingredient_name) == index:
+            next_index = self._find(ingredient_name, index)
+            if next_index is None:
+                del self._positions[ingredient_name]
+            else:
+                self._positions[ingredient_name] = next_index
+
+    def __reduce__(self):
+        # the index is not pickled but rebuilt from the ingredients
+        return self.__class__, (list(self),)
+
     @property
     def top(self):
         return list.__getitem__(self, -1)
 
     def __contains__(self, ingredient_name):
-        for ingredient in self:
-            if ingredient.name == ingredient_name:
-                return True
-        return False
-
-    def __getitem__(self, ingredient_name):
-        for ingredient in self:
-            if ingredient.name == ingredient_name:
-                return ingredient
-        raise KeyError(ingredient_name)
-
-    def __setitem__(self, ingredient_name, ingredient_properties):
+        return ingredient_name in self._positions
+
+    def __getitem__(self, key):
+        try:
+            return _list_getitem(self, self._positions[key])
+        except (KeyError, TypeError):
+            # slices are not hashable
+            if isinstance(key, (int, long, slice)):
+                return _list_getitem(self, key)
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, basestring):
+            # replace the first ingredient named `key`
+            ingredient = tuple.__new__(Ingredient, (key, value))
+            index = self._positions.get(key)
+            if index is None:
+                self.append(ingredient)
+            else:
+                _list_setitem(self, index, ingredient)
+        elif isinstance(key, slice):
+            _list_setitem(self, key, value)
+            self._reindex()
+        else:
+            if key < 0:
+                key += len(self)
+            old_name = _list_getitem(self, key).name
+            _list_setitem(self, key, value)
+            if old_name != value.name:
+                self._forget(old_name, key)
+                if self._positions.get(value.name, key) >= key:
+                    self._positions[value.name] = key
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            list.__delitem__(self, key)
+            self._reindex()
+            return
+        if key < 0:
+            key += len(self)
+        ingredient = list.__getitem__(self, key)
+        list.__delitem__(self, key)
+        positions = self._positions
+        for name, index in positions.items():
+            if index > key:
+                positions[name] = index - 1
+        self._forget(ingredient.name, key)
+
+    def __setslice__(self, i, j, ingredients):
+        list.__setslice__(self, i, j, ingredients)
+        self._reindex()
+
+    def __delslice__(self, i, j):
+        list.__delslice__(self, i, j)
+        if self:
+            self._reindex()
+        else:
+            self._positions = {}
+
+    def __iadd__(self, ingredients):
+        self.extend(ingredients)
+        return self
+
+    def __imul__(self, n):
+        list.__imul__(self, n)
+        self._reindex()
+        return self
+
+    def append(self, ingredient):
+        _list_append(self, ingredient)
+        positions = self._positions
+        if ingredient.name not in positions:
+            positions[ingredient.name] = len(self) - 1
+
+    def extend(self, ingredients):
+        start = len(self)
+        list.extend(self, ingredients)
+        setdefault = self._positions.setdefault
+        for index in xrange(start, len(self)):
+            setdefault(list.__getitem__(self, index).name, index)
+
+    def insert(self, index, ingredient):
+        size = len(self)
+        if index < 0:
+            index = max(index + size, 0)
+        elif index > size:
+            index = size
+        list.insert(self, index, ingredient)
+        positions = self._positions
+        for name, position in positions.items():
+            if position >= index:
+                positions[name] = position + 1
+        if positions.get(ingredient.name, index) >= index:
+            positions[ingredient.name] = index
+
+    def pop(self, index=-1):
+        if index != -1 and index != len(self) - 1:
+            ingredient = _list_getitem(self, index)
+            del self[index]
+            return ingredient
+        ingredient = _list_pop(self)
+        if self._positions[ingredient.name] == len(self):
+            del self._positions[ingredient.name]
+        return ingredient
+
+    def remove(self, ingredient):
+        list.remove(self, ingredient)
+        self._reindex()
+
+    def reverse(self):
+        list.reverse(self)
+        self._reindex()
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._reindex()
+
+    def shuffle(self):
+        '''Randomise the order of the ingredients like random.shuffle, but
+        rebuild the index only once.
+
+        '''
+        ingredients = list(self)
+        random.shuffle(ingredients)
+        self[:] = ingredients
+
+    def unicode_chunks(self, chunk_size):
+        '''Yield the ingredients from the top to the bottom as they are
+        served: liquids as the characters of their values and the others as
+        their values in decimal. Each unicode string holds at most
+        `chunk_size` ingredients.
+
+        '''
+        for end in xrange(len(self), 0, -chunk_size):
+            chunk = list.__getslice__(self, max(end - chunk_size, 0), end)
+            chunk.reverse()
+            yield u''.join([
+                unichr(value) if is_liquid else unicode(value)
+                for name, (value, is_dry, is_liquid) in chunk])
+
+    def replace_top(self, ingredient):
+        'Replace the top ingredient with `ingredient` in constant time.'
+        old_name = _list_getitem(self, -1).name
+        _list_setitem(self, -1, ingredient)
+        if old_name != ingredient.name:
+            positions = self._positions
+            top = len(self) - 1
+            if positions[old_name] == top:
+                del positions[old_name]
+            if ingredient.name not in positions:
+                positions[ingredient.name] = top
+
+    def liquefy(self):
+        'Turn all ingredients into liquids.'
         for index, ingredient in enumerate(self):
-            if ingredient.name == ingredient_name:
-                # TODO: (remove the current value which is linked to
-                # `ingredient_name`) and append the new value to the
-                # mixing bowl!
-                list.__setitem__(
-                    self,
-                    index,
-                    Ingredient(ingredient_name, ingredient_properties))
-                return
-        self.append(Ingredient(ingredient_name, ingredient_properties))
+            _list_setitem(self, index, Ingredient(
+                ingredient.name,
+                IngredientProperties(ingredient.properties.value, False, True)))
 
     # TODO: probably needs a good doc-string :P
     def stir(self, n):
         l = len(self)
         self.insert(0 if n >= l else l - n - 1, self.pop())
+
+
+# the type code of the arrays which store the values in CompactIngredients;
+# older versions of Python have no type code for 64-bit integers, but "l" is
+# 64 bits wide on most 64-bit platforms
+try:
+    array('q')
+    VALUE_TYPECODE = 'q'
+except ValueError:
+    VALUE_TYPECODE = 'l'
+
+# the states (is_dry, is_liquid) of the ingredients in CompactIngredients,
+# indexed by the byte which encodes them
+_states = []
+_state_codes = {}
+
+# serializes adding to the tables above, which the threads of the daemon
+# share; looking up a state does not need it, because an entry is appended
+# to the list before its index is published in the dict
+_intern_lock = threading.Lock()
+
+
+def _state_code(is_dry, is_liquid):
+    try:
+        return _state_codes[is_dry, is_liquid]
+    except KeyError:
+        with _intern_lock:
+            if (is_dry, is_liquid) not in _state_codes:
+                if len(_states) == 256:
+                    raise ValueError(
+                        'too many states of ingredients: %r' % (
+                            (is_dry, is_liquid),))
+                _states.append((is_dry, is_liquid))
+                _state_codes[is_dry, is_liquid] = len(_states) - 1
+            return _state_codes[is_dry, is_liquid]
+
+for _is_dry in (False, True, unknown):
+    for _is_liquid in (False, True, unknown):
+        _state_code(_is_dry, _is_liquid)
+LIQUID = _state_code(False, True)
+
+_tuple_new = tuple.__new__
+_everything = slice(None)
+
+# the number of ingredients in a block of CompactIngredients; a block which
+# has grown to twice this size by insertions is split
+BLOCK_SIZE = 4096
+
+
+class CompactIngredients(object):
+    '''A stack of ingredients like Ingredients, which stores its ingredients
+    as a struct of arrays: their values in an array of 64-bit integers, the
+    codes of their states (whether they are dry or liquid) in a bytearray and
+    the IDs of their interned names in an array of integers. An element
+    takes 13 bytes instead of two tuples, so large mixing bowls and baking
+    dishes need much less memory. The ingredients are created when they are
+    read.
+
+    The names are interned in a table which the container shares with its
+    family: the container `family` it is created with, or the first
+    CompactIngredients an empty container is extended with. The table lives
+    as long as the containers which share it, e.g. those of an interpreter.
+    Ingredients which are moved between two families get new IDs.
+
+    The arrays are split into blocks of about BLOCK_SIZE ingredients, and the
+    position of the first ingredient of each block is kept in a sorted list.
+    Pushing and popping the top ingredient only change the last block.
+    Inserting an ingredient moves the ingredients above it within its block
+    and shifts the positions of the blocks above it, so stirring the top n
+    ingredients of a deep mixing bowl takes O(log depth + n / BLOCK_SIZE +
+    BLOCK_SIZE) time instead of moving all n ingredients.
+
+    If a value does not fit into 64 bits or is not an integer, the values are
+    stored in lists instead, until the container is emptied.
+
+    Like Ingredients, the container keeps the first position of each name in
+    an index. Emptying the container (del container[:]) and turning all
+    ingredients into liquids (liquefy) are slice operations.
+
+    Extending the container with another CompactIngredients, e.g. pouring a
+    mixing bowl into a baking dish, shares the blocks of the other container
+    which are at least half full instead of copying them; the others are
+    copied. A shared block is copied by the container which changes it
+    first, so pouring takes O(depth / BLOCK_SIZE + BLOCK_SIZE) time. The last
+    block of a container is never shared, so pushing and popping do not
+    check for shared blocks.
+
+    '''
+    __hash__ = None
+
+    def __init__(self, ingredients=(), family=None):
+        if isinstance(family, CompactIngredients):
+            self._interned = family._interned
+            self._interned_ids = family._interned_ids
+        else:
+            # the names of the family and the ID of each name
+            self._interned = []
+            self._interned_ids = {}
+        self._reset()
+        self.extend(ingredients)
+
+    def _intern(self, name):
+        try:
+            return self._interned_ids[name]
+        except KeyError:
+            self._interned.append(name)
+            name_id = self._interned_ids[name] = len(self._interned) - 1
+            return name_id
+
+    def _reset(self):
+        # whether the values are stored in lists instead of arrays
+        self._wide = False
+        self._values = [array(VALUE_TYPECODE)]
+        self._states = [bytearray()]
+        self._name_ids = [array('i')]
+        # the position of the first ingredient of each block
+        self._starts = [0]
+        # whether each block is not shared with another container
+        self._owned = [True]
+        self._size = 0
+        # map the ID of each name to its first position
+        self._positions = {}
+
+    def _clear(self):
+        # keep the arrays of a container with a single block
+        if len(self._starts) > 1 or self._wide or not self._owned[0]:
+            self._reset()
+            return
+        del self._values[0][:]
+        del self._states[0][:]
+        del self._name_ids[0][:]
+        self._size = 0
+        self._positions.clear()
+
+    def _add_block(self):
+        self._starts.append(self._size)
+        self._owned.append(True)
+        self._values.append([] if self._wide else array(VALUE_TYPECODE))
+        self._states.append(bytearray())
+        self._name_ids.append(array('i'))
+
+    def _remove_block(self, block):
+        for blocks in (self._values, self._states, self._name_ids,
+                self._starts, self._owned):
+            del blocks[block]
+        if not self._owned[-1]:
+            self._own(-1)
+
+    def _own(self, block):
+        # copy a block which is shared with another container before it is
+        # changed
+        for blocks in self._values, self._states, self._name_ids:
+            blocks[block] = blocks[block][:]
+        self._owned[block] = True
+
+    def _split_block(self, block):
+        # move the upper half of a block into a new block above it
+        half = len(self._states[block]) // 2
+        for blocks in self._values, self._states, self._name_ids:
+            blocks.insert(block + 1, blocks[block][half:])
+            del blocks[block][half:]
+        self._starts.insert(block + 1, self._starts[block] + half)
+        self._owned.insert(block + 1, True)
+
+    def _share_block(self, other, block):
+        # append a block of the CompactIngredients `other` without copying it
+        if not self._states[-1]:
+            for blocks in (self._values, self._states, self._name_ids,
+                    self._starts, self._owned):
+                blocks.pop()
+        other._owned[block] = False
+        self._owned.append(False)
+        self._starts.append(self._size)
+        self._values.append(other._values[block])
+        self._states.append(other._states[block])
+        self._name_ids.append(other._name_ids[block])
+        self._size += len(other._states[block])
+
+    def _store_values_in_lists(self):
+        if not self._wide:
+            self._wide = True
+            # the states and name IDs of shared blocks are still shared, so
+            # the blocks stay unowned and are copied before they are changed
+            self._values = [list(values) for values in self._values]
+
+    def _index(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('index out of range')
+        return index
+
+    def _locate(self, index):
+        # the block which holds the ingredient at `index` and its offset in
+        # the block
+        block = bisect_right(self._starts, index) - 1
+        return block, index - self._starts[block]
+
+    def _ingredient(self, index):
+        block, offset = self._locate(index)
+        return _tuple_new(Ingredient, (
+            self._interned[self._name_ids[block][offset]],
+            _tuple_new(
+                IngredientProperties,
+                (self._values[block][offset],) +
+                _states[self._states[block][offset]])))
+
+    def _set(self, block, offset, ingredient):
+        # the block must not be shared
+        name, (value, is_dry, is_liquid) = ingredient
+        self._set_properties(block, offset, value, is_dry, is_liquid)
+        self._name_ids[block][offset] = self._intern(name)
+
+    def _set_properties(self, block, offset, value, is_dry, is_liquid):
+        try:
+            self._values[block][offset] = value
+        except (OverflowError, TypeError):
+            self._store_values_in_lists()
+            self._values[block][offset] = value
+        try:
+            self._states[block][offset] = _state_codes[is_dry, is_liquid]
+        except KeyError:
+            self._states[block][offset] = _state_code(is_dry, is_liquid)
+
+    def _arrays(self):
+        # copies of the values, states and name IDs of all ingredients
+        values = [] if self._wide else array(VALUE_TYPECODE)
+        name_ids = array('i')
+        for block_values, block_name_ids in izip(self._values, self._name_ids):
+            values.extend(block_values)
+            name_ids.extend(block_name_ids)
+        return values, bytearray().join(self._states), name_ids
+
+    def _extend_arrays(self, values, states, name_ids):
+        # append the ingredients stored in the arrays, filling up the last
+        # block before adding new ones
+        if isinstance(values, list):
+            self._store_values_in_lists()
+        start = 0
+        end = len(states)
+        while start < end:
+            room = BLOCK_SIZE - len(self._states[-1])
+            if room <= 0 or not self._owned[-1]:
+                self._add_block()
+                continue
+            stop = min(start + room, end)
+            self._values[-1].extend(values[start:stop])
+            self._states[-1].extend(states[start:stop])
+            self._name_ids[-1].extend(name_ids[start:stop])
+            self._size += stop - start
+            start = stop
+
+    def _replace_arrays(self, values, states, name_ids):
+        self._reset()
+        self._extend_arrays(values, states, name_ids)
+        self._reindex()
+
+    def _reindex(self):
+        positions = self._positions = {}
+        for start, name_ids in izip(self._starts, self._name_ids):
+            for name_id in set(name_ids):
+                if name_id not in positions:
+                    positions[name_id] = start + name_ids.index(name_id)
+
+    def _find(self, name_id, start):
+        # the first position of `name_id` from `start` on or None
+        if start >= self._size:
+            return None
+        block, offset = self._locate(start)
+        starts = self._starts
+        while block < len(starts):
+            name_ids = self._name_ids[block]
+            if offset:
+                name_ids = name_ids[offset:]
+            try:
+                return starts[block] + offset + name_ids.index(name_id)
+            except ValueError:
+                block += 1
+                offset = 0
+        return None
+
+    def _forget(self, name_id, index):
+        # the ingredient at `index` has been removed or replaced
+        if self._positions.get(name_id) == index:
+            next_index = self._find(name_id, index)
+            if next_index is None:
+                del self._positions[name_id]
+            else:
+                self._positions[name_id] = next_index
+
+    def _replace_all(self, ingredients):
+        self._reset()
+        self.extend(ingredients)
+
+    def _pop_top(self):
+        # remove the top ingredient and return its value, the code of its
+        # state and the ID of its name
+        states = self._states[-1]
+        state = states.pop()
+        name_id = self._name_ids[-1].pop()
+        value = self._values[-1].pop()
+        size = self._size = self._size - 1
+        if not states and size:
+            self._remove_block(-1)
+        if self._positions[name_id] == size:
+            del self._positions[name_id]
+        return value, state, name_id
+
+    def _insert(self, index, value, state, name_id):
+        # insert an ingredient at 0 <= index <= len(self)
+        block, offset = self._locate(index)
+        if not self._owned[block]:
+            self._own(block)
+        try:
+            self._values[block].insert(offset, value)
+        except (OverflowError, TypeError):
+            self._store_values_in_lists()
+            self._values[block].insert(offset, value)
+        self._states[block].insert(offset, state)
+        self._name_ids[block].insert(offset, name_id)
+        self._size += 1
+        starts = self._starts
+        for later_block in xrange(block + 1, len(starts)):
+            starts[later_block] += 1
+        if len(self._states[block]) >= 2 * BLOCK_SIZE:
+            self._split_block(block)
+        positions = self._positions
+        for other_name_id, position in positions.items():
+            if position >= index:
+                positions[other_name_id] = position + 1
+        if positions.get(name_id, index) >= index:
+            positions[name_id] = index
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __sizeof__(self):
+        blocks = self._values + self._states + self._name_ids
+        return object.__sizeof__(self) + sum(map(sys.getsizeof, blocks + [
+            self._values, self._states, self._name_ids, self._starts]))
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        names = self._interned
+        states = _states
+        for block_values, block_states, block_name_ids in izip(
+                self._values, self._states, self._name_ids):
+            for value, state, name_id in izip(
+                    block_values, block_states, block_name_ids):
+                is_dry, is_liquid = states[state]
+                yield Ingredient(
+                    names[name_id],
+                    IngredientProperties(value, is_dry, is_liquid))
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, CompactIngredients)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self))
+
+    @property
+    def top(self):
+        is_dry, is_liquid = _states[self._states[-1][-1]]
+        return _tuple_new(Ingredient, (
+            self._interned[self._name_ids[-1][-1]],
+            _tuple_new(
+                IngredientProperties,
+                (self._values[-1][-1], is_dry, is_liquid))))
+
+    def __contains__(self, ingredient_name):
+        return self._interned_ids.get(ingredient_name) in self._positions
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._ingredient(index)
+                for index in xrange(*key.indices(len(self)))]
+        if isinstance(key, (int, long)):
+            return self._ingredient(self._index(key))
+        try:
+            return self._ingredient(
+                self._positions[self._interned_ids[key]])
+        except KeyError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, basestring):
+            # replace the first ingredient named `key`
+            try:
+                index = self._positions[self._interned_ids[key]]
+            except KeyError:
+                self.append(Ingredient(key, value))
+            else:
+                starts = self._starts
+                block = bisect_right(starts, index) - 1
+                if not self._owned[block]:
+                    self._own(block)
+                self._set_properties(block, index - starts[block], *value)
+        elif isinstance(key, slice):
+            ingredients = list(self)
+            ingredients[key] = value
+            self._replace_all(ingredients)
+        else:
+            index = self._index(key)
+            block, offset = self._locate(index)
+            if not self._owned[block]:
+                self._own(block)
+            old_name_id = self._name_ids[block][offset]
+            self._set(block, offset, value)
+            name_id = self._name_ids[block][offset]
+            if old_name_id != name_id:
+                self._forget(old_name_id, index)
+                if self._positions.get(name_id, index) >= index:
+                    self._positions[name_id] = index
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            if key == _everything or \
+                    key.indices(len(self)) == (0, len(self), 1):
+                self._clear()
+            else:
+                values, states, name_ids = self._arrays()
+                del values[key]
+                del states[key]
+                del name_ids[key]
+                self._replace_arrays(values, states, name_ids)
+            return
+        index = self._index(key)
+        block, offset = self._locate(index)
+        if not self._owned[block]:
+            self._own(block)
+        name_id = self._name_ids[block][offset]
+        del self._values[block][offset]
+        del self._states[block][offset]
+        del self._name_ids[block][offset]
+        self._size -= 1
+        starts = self._starts
+        for later_block in xrange(block + 1, len(starts)):
+            starts[later_block] -= 1
+        if not self._states[block] and len(starts) > 1:
+            self._remove_block(block)
+        positions = self._positions
+        for other_name_id, position in positions.items():
+            if position > index:
+                positions[other_name_id] = position - 1
+        self._forget(name_id, index)
+
+    def __delslice__(self, i, j):
+        # called for simple slices like `del container[:]`
+        if i <= 0 and j >= self._size:
+            self._clear()
+        else:
+            self.__delitem__(slice(i, j))
+
+    def __setslice__(self, i, j, ingredients):
+        self.__setitem__(slice(i, j), ingredients)
+
+    def __iadd__(self, ingredients):
+        self.extend(ingredients)
+        return self
+
+    def append(self, ingredient):
+        name, (value, is_dry, is_liquid) = ingredient
+        try:
+            state = _state_codes[is_dry, is_liquid]
+            name_id = self._interned_ids[name]
+        except KeyError:
+            state = _state_code(is_dry, is_liquid)
+            name_id = self._intern(name)
+        states = self._states[-1]
+        if len(states) >= BLOCK_SIZE:
+            self._add_block()
+            states = self._states[-1]
+        try:
+            self._values[-1].append(value)
+        except (OverflowError, TypeError):
+            self._store_values_in_lists()
+            self._values[-1].append(value)
+        states.append(state)
+        self._name_ids[-1].append(name_id)
+        positions = self._positions
+        if name_id not in positions:
+            positions[name_id] = self._size
+        self._size += 1
+
+    def extend(self, ingredients):
+        if not isinstance(ingredients, CompactIngredients):
+            for ingredient in ingredients:
+                self.append(ingredient)
+            return
+        start = self._size
+        other_positions = ingredients._positions.items()
+        if ingredients._interned is not self._interned:
+            if self._size:
+                self._extend_other_family(ingredients)
+                return
+            # an empty container joins the family of `ingredients`
+            self._interned = ingredients._interned
+            self._interned_ids = ingredients._interned_ids
+        if ingredients is self:
+            # the last block grows while it is copied
+            self._extend_arrays(*self._arrays())
+        else:
+            if ingredients._wide:
+                self._store_values_in_lists()
+            share = self._wide == ingredients._wide
+            last_block = len(ingredients._starts) - 1
+            for block, (values, states, name_ids) in enumerate(zip(
+                    ingredients._values, ingredients._states,
+                    ingredients._name_ids)):
+                if share and block < last_block and \
+                        len(states) >= BLOCK_SIZE // 2:
+                    self._share_block(ingredients, block)
+                else:
+                    self._extend_arrays(values, states, name_ids)
+        positions = self._positions
+        for name_id, index in other_positions:
+            if name_id not in positions:
+                positions[name_id] = start + index
+
+    def _extend_other_family(self, ingredients):
+        # copy the ingredients of a CompactIngredients whose names are
+        # interned in another table, translating their name IDs
+        start = self._size
+        names = ingredients._interned
+        intern = self._intern
+        translated = dict([
+            (name_id, intern(names[name_id]))
+            for name_id in ingredients._positions])
+        for values, states, name_ids in zip(
+                ingredients._values, ingredients._states,
+                ingredients._name_ids):
+            self._extend_arrays(values, states, array(
+                'i', [translated[name_id] for name_id in name_ids]))
+        positions = self._positions
+        for name_id, index in ingredients._positions.iteritems():
+            if translated[name_id] not in positions:
+                positions[translated[name_id]] = start + index
+
+    def insert(self, index, ingredient):
+        size = self._size
+        if index < 0:
+            index = max(index + size, 0)
+        if index >= size:
+            self.append(ingredient)
+            return
+        name, (value, is_dry, is_liquid) = ingredient
+        self._insert(
+            index, value, _state_code(is_dry, is_liquid), self._intern(name))
+
+    def pop(self, index=-1):
+        if index != -1 and index != self._size - 1:
+            ingredient = self[index]
+            del self[index]
+            return ingredient
+        value, state, name_id = self._pop_top()
+        is_dry, is_liquid = _states[state]
+        return _tuple_new(Ingredient, (
+            self._interned[name_id],
+            _tuple_new(IngredientProperties, (value, is_dry, is_liquid))))
+
+    def unicode_chunks(self, chunk_size):
+        '''Yield the ingredients from the top to the bottom as they are
+        served, like Ingredients.unicode_chunks. A chunk never spans two
+        blocks.
+
+        '''
+        # the function which converts a value, indexed by the code of the
+        # state of the ingredient
+        converters = [
+            unichr if is_liquid else unicode for is_dry, is_liquid in _states]
+        for block in xrange(len(self._starts) - 1, -1, -1):
+            values = self._values[block]
+            states = self._states[block]
+            for end in xrange(len(states), 0, -chunk_size):
+                start = max(end - chunk_size, 0)
+                yield u''.join([
+                    converters[state](value) for value, state in izip(
+                        values[start:end][::-1], states[start:end][::-1])])
+
+    def replace_top(self, ingredient):
+        'Replace the top ingredient with `ingredient` in constant time.'
+        name, (value, is_dry, is_liquid) = ingredient
+        try:
+            state = _state_codes[is_dry, is_liquid]
+            name_id = self._interned_ids[name]
+        except KeyError:
+            state = _state_code(is_dry, is_liquid)
+            name_id = self._intern(name)
+        name_ids = self._name_ids[-1]
+        old_name_id = name_ids[-1]
+        try:
+            self._values[-1][-1] = value
+        except (OverflowError, TypeError):
+            self._store_values_in_lists()
+            self._values[-1][-1] = value
+        self._states[-1][-1] = state
+        if old_name_id != name_id:
+            name_ids[-1] = name_id
+            positions = self._positions
+            top = self._size - 1
+            if positions[old_name_id] == top:
+                del positions[old_name_id]
+            if name_id not in positions:
+                positions[name_id] = top
+
+    def liquefy(self):
+        'Turn all ingredients into liquids.'
+        self._states = [
+            bytearray([LIQUID]) * len(states) for states in self._states]
+
+    def shuffle(self):
+        'Randomise the order of the ingredients like random.shuffle.'
+        values, states, name_ids = self._arrays()
+        order = range(len(self))
+        random.shuffle(order)
+        shuffled_values = [values[index] for index in order]
+        if not self._wide:
+            shuffled_values = array(VALUE_TYPECODE, shuffled_values)
+        self._replace_arrays(
+            shuffled_values,
+            bytearray([states[index] for index in order]),
+            array('i', [name_ids[index] for index in order]))
+
+    def stir(self, n):
+        '''Move the top ingredient down by `n` positions, or to the bottom if
+        there are at most `n` ingredients below it. The ingredient is moved
+        without creating a tuple for it.
+
+        '''
+        size = self._size
+        if n <= 0 and size:
+            return
+        value, state, name_id = self._pop_top()
+        self._insert(max(size - n - 1, 0), value, state, name_id)
+
+
+# the name of the ingredient which "add dry ingredients" places into a mixing
+# bowl
+DRY_INGREDIENTS = 'dry ingredients'
+
+
+# the names of the commands and the fields of their instructions, in the order
+# in which the methods of chef.interpreter.Interpreter expect them; the
+# opcode of a command is its index
+COMMAND_FIELDS = (
+    ('take', ('ingredient',)),
+    ('put', ('ingredient', 'mixing_bowl_id')),
+    ('fold', ('ingredient', 'mixing_bowl_id')),
+    ('add', ('ingredient', 'mixing_bowl_id')),
+    ('remove', ('ingredient', 'mixing_bowl_id')),
+    ('combine', ('ingredient', 'mixing_bowl_id')),
+    ('divide', ('ingredient', 'mixing_bowl_id')),
+    ('add_dry', ('mixing_bowl_id',)),
+    ('liquefy_ingredient', ('ingredient',)),
+    ('liquefy_contents', ('mixing_bowl_id',)),
+    ('stir_minutes', ('minutes', 'mixing_bowl_id')),
+    ('stir_ingredient', ('ingredient', 'mixing_bowl_id')),
+    ('mix', ('mixing_bowl_id',)),
+    ('clean', ('mixing_bowl_id',)),
+    ('pour', ('mixing_bowl_id', 'baking_dish_id')),
+    ('refrigerate', ('hours',)),
+    ('loop_start', ('verb', 'ingredient')),
+    ('loop_end', ('verb', 'ingredient')))
+COMMANDS = tuple(command for command, fields in COMMAND_FIELDS)
+OPCODES = dict((command, opcode) for opcode, command in enumerate(COMMANDS))
+LOOP_START = OPCODES['loop_start']
+LOOP_END = OPCODES['loop_end']
+
+# the key under which the jump offset of a loop instruction appears in the
+# dict form of an instruction
+_jump_keys = {
+    LOOP_START: 'loop_end_offset',
+    LOOP_END: 'loop_start_offset'}
+
+
+class Instruction(object):
+    '''A single parsed statement of the method. `operands` are the values of
+    the fields of the command (see COMMAND_FIELDS) followed by the line
+    number, so that the instruction can be executed by calling the method of
+    the interpreter with them. `jump` is the distance to the other end of a
+    loop and only set for loop instructions.
+
+    '''
+    __slots__ = ('opcode', 'operands', 'jump')
+
+    def __init__(self, opcode, operands, jump=None):
+        self.opcode = opcode
+        self.operands = operands
+        self.jump = jump
+
+    @property
+    def command(self):
+        return COMMANDS[self.opcode]
+
+    @property
+    def lineno(self):
+        return self.operands[-1]
+
+    def __eq__(self, other):
+        if not isinstance(other, Instruction):
+            return NotImplemented
+        return (self.opcode, self.operands, self.jump) == (
+            other.opcode, other.operands, other.jump)
+
+    def __ne__(self, other):
+        if not isinstance(other, Instruction):
+            return NotImplemented
+        return not self == other
+
+    def __repr__(self):
+        if self.jump is None:
+            return '%s(%r, %r)' % (
+                self.__class__.__name__, self.command, self.operands)
+        return '%s(%r, %r, %r)' % (
+            self.__class__.__name__, self.command, self.operands, self.jump)
+
+    def __pretty__(self, p, cycle):
+        p.pretty(instruction_to_dict(self))
+
+
+def instruction_from_dict(d):
+    '''Create an Instruction from its dict form, e.g. {'command': 'take',
+    'ingredient': 'sugar', 'lineno': 4}.
+
+    '''
+    opcode = OPCODES[d['command']]
+    fields = COMMAND_FIELDS[opcode][1]
+    operands = tuple([d.get(field) for field in fields]) + (d.get('lineno'),)
+    return Instruction(opcode, operands, d.get(_jump_keys.get(opcode)))
+
+
+def instruction_to_dict(instruction):
+    'Return the dict form of the Instruction `instruction`.'
+    command, fields = COMMAND_FIELDS[instruction.opcode]
+    d = dict(zip(fields, instruction.operands))
+    d['command'] = command
+    d['lineno'] = instruction.lineno
+    if instruction.jump is not None:
+        d[_jump_keys[instruction.opcode]] = instruction.jump
+    return d
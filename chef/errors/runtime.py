@@ -103,3 +103,14 @@ class MissingLoopEndError(ChefRuntimeError):
         if self.lineno is not None:
             msg += ' (line %d)' % self.lineno
         return msg
+
+
+class Refrigerated(Exception):
+    '''Raised by "refrigerate" to end the execution of a recipe; it is not an
+    error and caught by chef.interpreter.execute_recipe. `hours` is the
+    number of baking dishes which are served, or None.
+
+    '''
+    def __init__(self, hours=None):
+        Exception.__init__(self, hours)
+        self.hours = hours
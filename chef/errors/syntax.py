@@ -207,3 +207,24 @@ class InvalidCommandError(ChefSyntaxError):
         if self.lineno is not None:
             msg += ' (line %d)' % self.lineno
         return msg
+
+
+class MissingLoopEndError(ChefSyntaxError):
+    def __init__(self, verb, lineno=None):
+        self.verb = verb
+        self.lineno = lineno
+
+    def __repr__(self):
+        if self.lineno is None:
+            return '%s(%r)' % (self.__class__.__name__, self.verb)
+        else:
+            return '%s(%r, %d)' % (
+                self.__class__.__name__, self.verb, self.lineno)
+
+    def __str__(self):
+        msg = (
+            'the loop with the verb %r does not have a matching '
+            'until-statement to mark the end of the loop') % self.verb
+        if self.lineno is not None:
+            msg += ' (line %d)' % self.lineno
+        return msg
@@ -1,33 +1,57 @@
 from __future__ import with_statement
 
 import sys
-import random
 import argparse
-from collections import deque
+from functools import partial
+from itertools import islice
 from operator import add, sub, mul, floordiv as div
 
 from chef import __version__ as chef_version
-from chef.parser import parse_recipe
-from chef.datastructures import Ingredients, IngredientProperties, undefined
+from chef.parser import parse_recipe, parse_recipe_stream
+from chef.refrigerator import NumberReader, BinaryNumberReader
+from chef.datastructures import Ingredients, CompactIngredients,\
+        Ingredient, IngredientProperties, undefined, COMMANDS, LOOP_START,\
+        LOOP_END, DRY_INGREDIENTS
 from chef.errors import ChefError
 from chef.errors.runtime import InvalidInputError, UndefinedIngredientError,\
         InvalidContainerIDError, NonExistingContainerError,\
-        EmptyContainerError, MissingLoopEndError
-from chef.utils import verbs_match
+        EmptyContainerError, MissingLoopEndError, Refrigerated
 from chef.external import pretty
+from chef.utils import BackgroundWriter
+
+
+# the number of ingredients which Interpreter.serves writes at once
+SERVES_CHUNK_SIZE = 65536
+
+
+def dry_value(properties):
+    '''Return the value of an ingredient with `properties` if it is dry and
+    has a value, else 0.
+
+    '''
+    if properties.is_dry is True and properties.value is not None:
+        return properties.value
+    return 0
 
 
 class Interpreter(object):
-    def __init__(self, global_ingredients=None, mixing_bowls=None):
+    def __init__(self, global_ingredients=None, mixing_bowls=None,
+            refrigerator=None):
         if global_ingredients is None:
             self.global_ingredients = Ingredients([])
         else:
             self.global_ingredients = global_ingredients
+        self.reset_dry_sum()
         if mixing_bowls is None:
-            self.mixing_bowls = [Ingredients([])]
+            self.mixing_bowls = [CompactIngredients()]
         else:
             self.mixing_bowls = mixing_bowls
-        self.baking_dishes = [Ingredients([])]
+        self.baking_dishes = [CompactIngredients()]
+        # the chef.refrigerator.NumberReader which "take" reads from
+        if refrigerator is None:
+            self.refrigerator = NumberReader(sys.stdin)
+        else:
+            self.refrigerator = refrigerator
 
     @property
     def first_baking_dish(self):
@@ -66,6 +90,32 @@ class Interpreter(object):
         except KeyError:
             raise UndefinedIngredientError(ingredient_name, lineno)
 
+    def reset_dry_sum(self):
+        '''Compute the sum of the values of the dry global ingredients, which
+        add_dry places into a mixing bowl. The sum is kept up to date by the
+        methods which change the global ingredients; it has to be computed
+        again whenever the global ingredients are changed otherwise.
+
+        '''
+        self.dry_sum = sum([
+            dry_value(ingredient.properties)
+            for ingredient in self.global_ingredients])
+
+    def set_ingredient(self, ingredient_name, properties):
+        '''Replace the properties of the global ingredient named
+        `ingredient_name` with `properties` and update the sum of the dry
+        ingredients.
+
+        '''
+        global_ingredients = self.global_ingredients
+        if ingredient_name in global_ingredients:
+            old_properties = global_ingredients[ingredient_name].properties
+            old_value = dry_value(old_properties)
+        else:
+            old_value = 0
+        global_ingredients[ingredient_name] = properties
+        self.dry_sum += dry_value(properties) - old_value
+
     def calculate(self, func, ingredient_name, mixing_bowl_id=None,
             lineno=None):
         ingredient = self.get_ingredient_by_name(ingredient_name, lineno)
@@ -78,26 +128,34 @@ class Interpreter(object):
         value_in_mixing_bowl = top_ingredient.properties.value
         result = func(value_in_mixing_bowl, value)
         # XXX: which ingredient name should be used?
-        mixing_bowl[ingredient_name] = IngredientProperties(
-            result,
-            ingredient.properties.is_dry,
-            ingredient.properties.is_liquid)
+        mixing_bowl.replace_top(Ingredient(
+            ingredient_name,
+            IngredientProperties(
+                result,
+                ingredient.properties.is_dry,
+                ingredient.properties.is_liquid)))
 
-    def take(self, ingredient_name, lineno=None, stdin=sys.stdin):
+    def take(self, ingredient_name, lineno=None, stdin=None):
         '''This reads a numeric value from STDIN into the ingredient named,
         overwriting any previous value.
 
+        The value is read from the refrigerator of the interpreter, unless a
+        file `stdin` is given, from which a single line is read.
+
         '''
-        input = stdin.readline().strip()
-        try:
-            input_as_int = int(input)
-        except ValueError:
-            raise InvalidInputError(input, lineno)
+        if stdin is None:
+            input_as_int = self.refrigerator.read_number(lineno)
+        else:
+            input = stdin.readline().strip()
+            try:
+                input_as_int = int(input)
+            except ValueError:
+                raise InvalidInputError(input, lineno)
         ingredient = self.get_ingredient_by_name(ingredient_name, lineno)
-        self.global_ingredients[ingredient_name] = IngredientProperties(
+        self.set_ingredient(ingredient_name, IngredientProperties(
             input_as_int,
             ingredient.properties.is_dry,
-            ingredient.properties.is_liquid)
+            ingredient.properties.is_liquid))
 
     def put(self, ingredient_name, mixing_bowl_id=None, lineno=None):
         'This puts the ingredient into the nth mixing bowl.'
@@ -107,7 +165,9 @@ class Interpreter(object):
             # create a new mixing bowl if the ID is larger than the current
             # largest mixing bowl ID by 1
             if mixing_bowl_id - 1 == len(self.mixing_bowls):
-                mixing_bowl = Ingredients()
+                # the mixing bowls share their names, so that pouring them
+                # into the same baking dish does not translate the names
+                mixing_bowl = CompactIngredients(family=self.mixing_bowls[0])
                 self.mixing_bowls.append(mixing_bowl)
             else:
                 raise InvalidContainerIDError(
@@ -122,10 +182,10 @@ class Interpreter(object):
         '''
         mixing_bowl = self.get_nth_container(mixing_bowl_id, lineno)
         try:
-            top_value = mixing_bowl.pop()
+            top_ingredient = mixing_bowl.pop()
         except IndexError:
             raise EmptyContainerError('mixing bowl', mixing_bowl_id, lineno)
-        self.global_ingredients[ingredient_name] = top_value
+        self.set_ingredient(ingredient_name, top_ingredient.properties)
 
     def add(self, ingredient_name, mixing_bowl_id=None, lineno=None):
         '''This adds the value of ingredient to the value of the ingredient on
@@ -159,12 +219,17 @@ class Interpreter(object):
         '''
         self.calculate(div, ingredient_name, mixing_bowl_id, lineno)
 
-    def add_dry(self, lineno=None):
+    def add_dry(self, mixing_bowl_id=None, lineno=None):
         '''This adds the values of all the dry ingredients together and places
         the result into the nth mixing bowl.
 
+        The sum is kept up to date whenever a global ingredient changes (see
+        set_ingredient), so this takes constant time.
+
         '''
-        raise NotImplementedError()
+        mixing_bowl = self.get_nth_container(mixing_bowl_id, lineno)
+        mixing_bowl.append(Ingredient(
+            DRY_INGREDIENTS, IngredientProperties(self.dry_sum, True, False)))
 
     def liquefy_ingredient(self, ingredient_name, lineno=None):
         '''This turns the ingredient into a liquid, i.e. a Unicode character
@@ -172,8 +237,8 @@ class Interpreter(object):
 
         '''
         ingredient = self.get_ingredient_by_name(ingredient_name, lineno)
-        self.global_ingredients[ingredient_name] = IngredientProperties(
-            ingredient.properties.value, False, True)
+        self.set_ingredient(ingredient_name, IngredientProperties(
+            ingredient.properties.value, False, True))
 
     def liquefy_contents(self, mixing_bowl_id=None, lineno=None):
         '''This turns all the ingredients in the nth mixing bowl into a liquid,
@@ -181,9 +246,7 @@ class Interpreter(object):
 
         '''
         mixing_bowl = self.get_nth_container(mixing_bowl_id, lineno)
-        for ingredient in list(mixing_bowl):
-            mixing_bowl[ingredient.name] = IngredientProperties(
-                ingredient.properties.value, False, True)
+        mixing_bowl.liquefy()
 
     def stir_minutes(self, minutes, mixing_bowl_id=None, lineno=None):
         '''This "rolls" the top number ingredients in the nth mixing bowl, such
@@ -212,7 +275,7 @@ class Interpreter(object):
     def mix(self, mixing_bowl_id=None, lineno=None):  # pragma: no cover
         'This randomises the order of the ingredients in the nth mixing bowl.'
         mixing_bowl = self.get_nth_container(mixing_bowl_id, lineno)
-        random.shuffle(mixing_bowl)
+        mixing_bowl.shuffle()
 
     def clean(self, mixing_bowl_id=None, lineno=None):
         'This removes all the ingredients from the nth mixing bowl.'
@@ -229,8 +292,7 @@ class Interpreter(object):
         baking_dish = self.get_nth_container(baking_dish_id, lineno, False)
         baking_dish.extend(mixing_bowl)
 
-    def loop_start(self, verb, ingredient_name, following_instructions,
-            lineno=None):
+    def loop_start(self, verb, ingredient_name, body, lineno=None):
         '''The loop executes as follows: The value of ingredient is checked. If
         it is non-zero, the body of the loop executes until it reaches the
         "until" statement. The value of ingredient is rechecked. If it is
@@ -238,24 +300,19 @@ class Interpreter(object):
         ingredient is zero, the loop exits and execution continues at the
         statement after the "until". Loops may be nested.
 
+        `body` are the instructions of the loop up to and including its
+        until-statement, as matched by chef.parser.resolve_loops.
+
         '''
-        body = []
-        import pprint
-        pprint.pprint(following_instructions)
-        for instr in following_instructions:
-            body.append(instr)
-            if instr['command'] == 'loop_end' and verbs_match(verb, instr['verb']):
-                break
-        else:
-            # no matching loop end
+        if not body or body[-1].opcode != LOOP_END:
             raise MissingLoopEndError(verb, lineno)
-        #print 'body: %r' % body
-        while True:
-            for instruction in body:
-                eval_instruction(instruction, following_instructions, self)
-            ingredient = self.get_ingredient_by_name(ingredient_name, lineno)
-            if ingredient.properties.value == 0:
-                break
+        loop_end_verb, loop_end_ingredient, loop_end_lineno = \
+            body[-1].operands
+        body = body[:-1]
+        while self.get_ingredient_by_name(
+                ingredient_name, lineno).properties.value != 0:
+            eval_instructions(body, self)
+            self.loop_end(loop_end_ingredient, loop_end_lineno)
 
     def loop_end(self, ingredient_name=None, lineno=None):
         '''If the ingredient appears in this statement, its value is
@@ -266,74 +323,226 @@ class Interpreter(object):
         if ingredient_name is not None:
             ingredient = self.get_ingredient_by_name(ingredient_name, lineno)
             new_value = ingredient.properties.value - 1
-            self.global_ingredients[ingredient_name] = IngredientProperties(
+            self.set_ingredient(ingredient_name, IngredientProperties(
                 new_value,
                 ingredient.properties.is_dry,
-                ingredient.properties.is_liquid)
+                ingredient.properties.is_liquid))
+
+    def refrigerate(self, hours=None, lineno=None):
+        '''This causes execution of the recipe in which it appears to end
+        immediately. If the number of hours is given, the first number of
+        hours baking dishes are printed first.
 
-    def serves(self, num_of_diners, stdout=sys.stdout, encoding='utf-8'):
+        Execution ends by raising chef.errors.runtime.Refrigerated, which
+        execute_recipe and interpret_stream catch to serve the dishes.
+
+        '''
+        raise Refrigerated(hours)
+
+    def serves(self, num_of_diners, stdout=None, encoding='utf-8'):
         '''This statement writes to STDOUT the contents of the first
         number-of-diners baking dishes. It begins with the 1st baking dish,
         removing values from the top one by one and printing them until the
         dish is empty, then progresses to the next dish, until all the dishes
         have been printed.
 
+        The values are converted and encoded in chunks of SERVES_CHUNK_SIZE
+        ingredients and each chunk is written with a single call of
+        `stdout.write`. `stdout` defaults to sys.stdout.
+
         '''
+        if stdout is None:
+            stdout = sys.stdout
         for baking_dish in self.baking_dishes[:num_of_diners]:
-            while baking_dish:
-                ingredient = baking_dish.pop()
-                if ingredient.properties.is_liquid:
-                    convert = unichr
-                else:
-                    convert = unicode
-                value = convert(ingredient.properties.value).encode(encoding)
-                stdout.write(value)
+            for chunk in baking_dish.unicode_chunks(SERVES_CHUNK_SIZE):
+                stdout.write(chunk.encode(encoding))
+            del baking_dish[:]
         stdout.flush()
 
 
 def eval_instruction(instruction, instructions, interpreter):
-    cmd = instruction['command']
-    f = getattr(interpreter, cmd)
-    ingredient = instruction.get('ingredient')
-    mixing_bowl_id = instruction.get('mixing_bowl_id')
-    if cmd in ('take', 'liquefy_ingredient', 'loop_end'):
-        args = [ingredient]
-    elif cmd in ('put', 'fold', 'add', 'remove', 'combine', 'divide',
-            'stir_ingredient'):
-        args = [ingredient, mixing_bowl_id]
-    elif cmd == 'add_dry':
-        args = []
-    elif cmd in ('liquefy_contents', 'mix', 'clean'):
-        args = [mixing_bowl_id]
-    elif cmd == 'stir_minutes':
-        args = [mixing_bowl_id, instruction['minutes']]
-    elif cmd == 'pour':
-        args = [mixing_bowl_id, instruction['baking_dish_id']]
-    elif cmd == 'loop_start':
-        args = [instruction['verb'], ingredient, instructions]
+    '''Execute the chef.datastructures.Instruction `instruction`.
+    `instructions` are the instructions which follow it; only a loop start
+    reads its body from them.
+
+    '''
+    opcode = instruction.opcode
+    if opcode == LOOP_START:
+        verb, ingredient, lineno = instruction.operands
+        body = list(islice(instructions, instruction.jump))
+        interpreter.loop_start(verb, ingredient, body, lineno)
+    elif opcode == LOOP_END:
+        verb, ingredient, lineno = instruction.operands
+        interpreter.loop_end(ingredient, lineno)
     else:
-        assert False
-    args.append(instruction['lineno'])
-    #print 'function: %r, args: %r' % (f.__name__, args)
-    f(*args)
-
+        getattr(interpreter, COMMANDS[opcode])(*instruction.operands)
+
+
+def eval_instructions(instructions, interpreter):
+    '''Execute the list `instructions`. Loops are executed by jumping to the
+    offsets which chef.parser.resolve_loops has stored in the loop starts and
+    until-statements, so the instructions are never searched.
+
+    '''
+    # the methods of the interpreter which execute the instructions, indexed
+    # by their opcodes
+    dispatch = [getattr(interpreter, command) for command in COMMANDS]
+    get_ingredient_by_name = interpreter.get_ingredient_by_name
+    pc = 0
+    end = len(instructions)
+    while pc < end:
+        instruction = instructions[pc]
+        opcode = instruction.opcode
+        if opcode == LOOP_START:
+            verb, ingredient, lineno = instruction.operands
+            if get_ingredient_by_name(ingredient, lineno).properties.value \
+                    == 0:
+                # continue after the until-statement
+                pc += instruction.jump
+        elif opcode == LOOP_END:
+            verb, ingredient, lineno = instruction.operands
+            interpreter.loop_end(ingredient, lineno)
+            # jump back to the loop start which rechecks its ingredient
+            pc -= instruction.jump
+            continue
+        else:
+            dispatch[opcode](*instruction.operands)
+        pc += 1
+
+
+# the ways of executing a parsed recipe: "bytecode" runs the code of
+# chef.compiler, "python" transpiles the recipe into a Python function (see
+# chef.transpiler)
+ENGINES = ('bytecode', 'python')
+
+
+def interpret_recipe(recipe, engine='bytecode', stdout=None,
+        refrigerator=None):
+    '''Execute the Recipe `recipe` with the engine `engine`. A recipe whose
+    loops are too deeply nested for the "python" engine is executed as
+    bytecode. The dishes are served to the file `stdout`, which defaults to
+    sys.stdout. "take" reads from the chef.refrigerator.NumberReader
+    `refrigerator`, which defaults to one for sys.stdin.
+
+    '''
+    execute_recipe(
+        recipe, prepare_recipe(recipe, engine), stdout, refrigerator)
+
+
+def prepare_recipe(recipe, engine='bytecode'):
+    '''Compile the instructions of the Recipe `recipe` for the engine
+    `engine` (see interpret_recipe) and return a function which executes
+    them with a given Interpreter. The function can be called any number of
+    times.
+
+    '''
+    # the engines are only imported when they are used, so that e.g. "chef
+    # run --daemon" starts quickly
+    if engine == 'python':
+        import chef.transpiler as chef_transpiler
+        if chef_transpiler.max_loop_depth(
+                recipe.instructions) <= chef_transpiler.MAX_LOOP_DEPTH:
+            return partial(
+                chef_transpiler.run, chef_transpiler.transpile_recipe(recipe))
+    from chef.compiler import compile_recipe, run
+    return partial(run, compile_recipe(recipe))
+
+
+def execute_recipe(recipe, execute, stdout=None, refrigerator=None):
+    '''Execute the Recipe `recipe` with the function `execute` returned by
+    prepare_recipe and serve the dishes; `stdout` and `refrigerator` are
+    the same as for interpret_recipe. The ingredients of `recipe` are
+    copied, so that it can be executed again.
+
+    '''
+    interpreter = Interpreter(
+        Ingredients(recipe.ingredients), refrigerator=refrigerator)
+    try:
+        execute(interpreter)
+    except Refrigerated, e:
+        serve_refrigerated(interpreter, e, stdout)
+    else:
+        if recipe.serves is not undefined:
+            interpreter.serves(recipe.serves, stdout=stdout)
+
+
+def serve_refrigerated(interpreter, refrigerated, stdout=None):
+    '''Serve the dishes of a recipe whose execution has been ended by
+    "refrigerate", i.e. the first number of hours baking dishes if the
+    number is given in the chef.errors.runtime.Refrigerated `refrigerated`.
+    The "serves" statement of the recipe is not executed.
+
+    '''
+    if refrigerated.hours is not None:
+        interpreter.serves(refrigerated.hours, stdout=stdout)
+
+
+def read_loop_body(loop_start, instructions):
+    '''Read the instructions of the loop which begins with the instruction
+    `loop_start` from the iterator `instructions`, up to and including its
+    matching until-statement. Nested loops are part of the body. The parser
+    has already matched the loop, so its length is known in advance.
+
+    '''
+    return list(islice(instructions, loop_start.jump))
+
+
+def interpret_stream(recipe_stream, stdout=None, refrigerator=None):
+    '''Execute the chef.parser.RecipeStream `recipe_stream` while it is being
+    parsed. Each instruction is executed as soon as it has been parsed, only
+    a loop is executed after it has been read up to its until-statement. The
+    dishes are served to the file `stdout`, which defaults to sys.stdout, and
+    "take" reads from `refrigerator` (see interpret_recipe).
+
+    '''
+    interpreter = Interpreter(
+        recipe_stream.ingredients, refrigerator=refrigerator)
+    instructions = iter(recipe_stream.instructions)
+    try:
+        for instruction in instructions:
+            if instruction.opcode == LOOP_START:
+                verb, ingredient, lineno = instruction.operands
+                body = read_loop_body(instruction, instructions)
+                interpreter.loop_start(verb, ingredient, body, lineno)
+            else:
+                eval_instruction(instruction, None, interpreter)
+    except Refrigerated, e:
+        # the rest of the recipe is not even parsed
+        serve_refrigerated(interpreter, e, stdout)
+        return
+    if recipe_stream.serves is not undefined:
+        interpreter.serves(recipe_stream.serves, stdout=stdout)
+
+
+def interpret_file(f, stream=False, cache=False, engine='bytecode',
+        stdout=None, refrigerator=None):
+    '''Execute the recipe in the file `f`. If `cache` is true, the parsed
+    recipe is stored in and loaded from a cache file next to the recipe (see
+    chef.cache); a streamed recipe is never cached. `engine` is ignored for
+    streamed recipes. The dishes are served to the file `stdout` and "take"
+    reads from `refrigerator` (see interpret_recipe).
+
+    '''
+    if stream:
+        interpret_stream(parse_recipe_stream(f), stdout, refrigerator)
+    elif cache:
+        from chef.cache import parse_recipe_cached
+        interpret_recipe(
+            parse_recipe_cached(f), engine, stdout, refrigerator)
+    else:
+        interpret_recipe(parse_recipe(f), engine, stdout, refrigerator)
 
-def interpret_recipe(recipe):
-    interpreter = Interpreter(recipe.ingredients)
-    instructions = deque(recipe.instructions)
-    while instructions:
-        instruction = instructions.popleft()
-        eval_instruction(instruction, instructions, interpreter)
-    if recipe.serves is not undefined:
-        interpreter.serves(recipe.serves)
 
+def open_output(filename):
+    '''Open the file `filename` for serving dishes into it. The file is not
+    buffered, so each chunk is written directly to its file descriptor.
 
-def interpret_file(f):
-    interpret_recipe(parse_recipe(f))
+    '''
+    return open(filename, 'wb', 0)
 
 
-def parse_args(argv):
-    parser = argparse.ArgumentParser(prog='chef')
+def parse_args(argv, parser_class=argparse.ArgumentParser):
+    parser = parser_class(prog='chef')
     parser.add_argument(
         '--version', action='version', version='%(prog)s ' + chef_version)
     parser.add_argument(
@@ -342,6 +551,35 @@ def parse_args(argv):
     parser.add_argument(
         '-p', '--parse-only', action='store_true', default=False,
         help='only parse, do not interpret')
+    parser.add_argument(
+        '-s', '--stream', action='store_true', default=False,
+        help='execute each instruction as soon as it has been parsed')
+    parser.add_argument(
+        '--no-cache', action='store_false', dest='cache', default=True,
+        help='neither read nor write the cache file of the recipe')
+    parser.add_argument(
+        '--engine', choices=ENGINES, default='bytecode',
+        help='how the recipe is executed (default: bytecode)')
+    parser.add_argument(
+        '-o', '--output',
+        help='write the served dishes to this file instead of STDOUT')
+    parser.add_argument(
+        '--read-ahead', action='store_true', default=False,
+        help='read the input of the recipe from STDIN in a background thread')
+    parser.add_argument(
+        '--write-behind', action='store_true', default=False,
+        help='write the served dishes in a background thread')
+    parser.add_argument(
+        '--daemon', action='store_true', default=False,
+        help='let the daemon of "chef serve" execute the recipe')
+    parser.add_argument(
+        '--socket',
+        help='the Unix socket of the daemon (default: chef.sock in '
+            '$XDG_RUNTIME_DIR or in a private temporary directory)')
+    parser.add_argument(
+        '-i', '--input', metavar='FILE',
+        help='read the input of the recipe from this binary file of 64-bit '
+            'numbers instead of STDIN (see chef.refrigerator)')
     # NOTE: debug mode is not implemented yet
     #parser.add_argument(
     #    '-d', '--debug', action='store_true', default=False,
@@ -349,7 +587,43 @@ def parse_args(argv):
     return parser.parse_args(argv)
 
 
+def parse_main(argv):
+    'Run the "chef parse" command (see chef.batch).'
+    import chef.batch as chef_batch
+    return chef_batch.main(argv)
+
+
+def serve_main(argv):
+    'Run the "chef serve" command (see chef.daemon).'
+    # chef.daemon imports this module
+    from chef.daemon import main as daemon_main
+    return daemon_main(argv)
+
+
+def batch_main(argv):
+    'Run the "chef batch" command (see chef.jobs).'
+    # chef.jobs imports this module
+    from chef.jobs import main as jobs_main
+    return jobs_main(argv)
+
+
+# commands which are run with "chef COMMAND [ARGUMENTS]"; without a command,
+# a single recipe is executed
+SUBCOMMANDS = {
+    'parse': parse_main,
+    'serve': serve_main,
+    'batch': batch_main}
+
+
 def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in SUBCOMMANDS:
+        return SUBCOMMANDS[argv[0]](argv[1:])
+    if argv and argv[0] == 'run':
+        # "chef run" is the same as "chef"
+        argv = argv[1:]
+
     def user_friendly_excepthook(exctype, value, traceback):
         'uses only a custom output if exception is ChefError'
         if ChefError in exctype.mro():
@@ -368,16 +642,74 @@ def main(argv=None):
             original_excepthook(exctype, value, traceback)
     original_excepthook = sys.excepthook
     sys.excepthook = user_friendly_excepthook
-    if argv is None:
-        argv = sys.argv[1:]
     args = parse_args(argv)
+    if args.daemon:
+        from chef.client import main as client_main
+        return client_main(argv)
     filename = args.file
+    if args.output and not args.parse_only:
+        with open_output(args.output) as output:
+            return serve_recipe_file(args, output)
+    return serve_recipe_file(args, sys.stdout)
+
+
+def serve_recipe_file(args, stdout):
+    '''Like run_recipe_file, but if requested by `args`, the dishes are
+    written to `stdout` by a chef.utils.BackgroundWriter. All dishes have been
+    written when this function returns.
+
+    '''
+    if args.write_behind and not args.parse_only:
+        with BackgroundWriter(stdout) as writer:
+            return run_recipe_file(args, writer)
+    return run_recipe_file(args, stdout)
+
+
+def open_refrigerator(args, stdin=None):
+    '''Return the reader of chef.refrigerator from which "take" reads, as
+    requested by the parsed command line arguments `args`. The text input is
+    read from the file `stdin`, which defaults to sys.stdin.
+
+    '''
+    if args.input:
+        # the memory map stays valid after the file has been closed
+        with open(args.input, 'rb') as f:
+            return BinaryNumberReader(f)
+    if stdin is None:
+        stdin = sys.stdin
+    return NumberReader(stdin, background=args.read_ahead)
+
+
+def run_recipe_file(args, stdout):
+    '''Parse or execute the recipe as requested by the parsed command line
+    arguments `args`, serving the dishes to `stdout`.
+
+    '''
+    filename = args.file
+    if args.stream and not args.parse_only:
+        if filename:
+            with open(filename) as f:
+                interpret_file(
+                    f, stream=True, stdout=stdout,
+                    refrigerator=open_refrigerator(args))
+        else:
+            # the recipe itself is read from STDIN
+            refrigerator = open_refrigerator(args) if args.input else None
+            interpret_file(
+                sys.stdin, stream=True, stdout=stdout,
+                refrigerator=refrigerator)
+        return
     if filename:
         with open(filename) as f:
-            parsed_recipe = parse_recipe(f)
+            if args.cache:
+                from chef.cache import parse_recipe_cached
+                parsed_recipe = parse_recipe_cached(f)
+            else:
+                parsed_recipe = parse_recipe(f)
     else:
         parsed_recipe = parse_recipe(sys.stdin)
     if args.parse_only:
         pretty.pprint(parsed_recipe)
     else:
-        interpret_recipe(parsed_recipe)
+        interpret_recipe(
+            parsed_recipe, args.engine, stdout, open_refrigerator(args))
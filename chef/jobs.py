@@ -0,0 +1,209 @@
+'''Execute many jobs, each a recipe with its input, spread across several
+worker processes ("chef batch").
+
+The jobs are read from a manifest with one JSON object per line. Its keys
+are "recipe", the path of the recipe file, and optionally "input", the path
+of the file which "take" reads, "binary", which is true if the input is a
+binary file (see chef.refrigerator), and "engine". Relative paths are
+relative to the directory of the manifest.
+
+Every worker keeps the recipes which it has prepared (see
+chef.prepare.RecipeCache), so a recipe is parsed at most once per worker.
+The results are written as JSON objects, one per line, in the order in which
+the jobs are finished.
+
+'''
+from __future__ import with_statement
+
+import os
+import sys
+import argparse
+try:
+    import json
+except ImportError:
+    import simplejson as json
+try:
+    from collections import namedtuple
+except ImportError:
+    from namedtuple_recipe import namedtuple
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from chef.errors import ChefError
+from chef.interpreter import execute_recipe, ENGINES
+from chef.refrigerator import NumberReader, BinaryNumberReader
+from chef.prepare import RecipeCache, prepare_recipe_source
+from chef.batch import error_message
+
+# The job in the line `index` (counted from 0) of a manifest. `input` is None
+# if the recipe does not read any input.
+Job = namedtuple('Job', 'index recipe input binary engine')
+
+# The result of a job. `output` is the text of the served dishes, or None if
+# an error occurred; `error` is its message and `lineno` its line number, if
+# known.
+JobResult = namedtuple('JobResult', 'index recipe output error lineno')
+
+# the prepared recipes of the current process
+_recipe_cache = RecipeCache(prepare_recipe_source)
+
+
+def read_manifest(f, directory='', engine='bytecode'):
+    '''Yield a Job for each line of the manifest file `f`, or a JobResult
+    with the error if the line is not a valid job. Relative paths are joined
+    to `directory`. `engine` is the engine of the jobs which do not name
+    one.
+
+    '''
+    for index, line in enumerate(f):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+            recipe = os.path.join(directory, fields['recipe'])
+            input = fields.get('input')
+            if input is not None:
+                input = os.path.join(directory, input)
+            job = Job(
+                index, recipe, input, bool(fields.get('binary')),
+                fields.get('engine', engine))
+        except (ValueError, KeyError, TypeError, AttributeError), e:
+            yield JobResult(index, None, None, 'invalid job: %s' % e, None)
+            continue
+        if job.engine not in ENGINES:
+            yield JobResult(
+                index, recipe, None, 'unknown engine %r' % job.engine, None)
+            continue
+        yield job
+
+
+def _open_refrigerator(job):
+    # the reader from which the recipe of `job` takes its input
+    if job.input is None:
+        return NumberReader(StringIO(''))
+    if job.binary:
+        with open(job.input, 'rb') as f:
+            return BinaryNumberReader(f)
+    with open(job.input) as f:
+        return NumberReader(StringIO(f.read()))
+
+
+def run_job(job):
+    '''Execute the Job `job` and return its JobResult. Errors are stored in
+    the result instead of being raised.
+
+    '''
+    try:
+        with open(job.recipe) as f:
+            source = f.read()
+        recipe, execute = _recipe_cache.get(source, job.engine)
+        stdout = StringIO()
+        execute_recipe(recipe, execute, stdout, _open_refrigerator(job))
+    except ChefError, e:
+        return JobResult(
+            job.index, job.recipe, None, error_message(e),
+            getattr(e, 'lineno', None))
+    except AssertionError:
+        # parse_recipe asserts that nothing follows the recipe
+        return JobResult(
+            job.index, job.recipe, None, 'unexpected text after the recipe',
+            None)
+    except EnvironmentError, e:
+        return JobResult(job.index, job.recipe, None, str(e), None)
+    except Exception, e:
+        # a single job must not stop the others
+        return JobResult(
+            job.index, job.recipe, None,
+            '%s: %s' % (e.__class__.__name__, e), None)
+    return JobResult(
+        job.index, job.recipe, stdout.getvalue().decode('utf-8'), None, None)
+
+
+def run_jobs(jobs, processes=None, chunksize=8):
+    '''Execute the Jobs `jobs` in `processes` worker processes (by default
+    one per CPU) and yield a JobResult for each job as soon as it has been
+    finished, i.e. not necessarily in the order of `jobs`. A job which fails
+    does not stop the others.
+
+    '''
+    jobs = list(jobs)
+    if multiprocessing is None or processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            yield run_job(job)
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(run_job, jobs, chunksize):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='chef batch',
+        description='execute the jobs of a manifest in parallel')
+    parser.add_argument(
+        'manifest', metavar='MANIFEST',
+        help='a file with one JSON object per job and line')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='the number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '-o', '--output',
+        help='write the results to this file instead of STDOUT')
+    parser.add_argument(
+        '--engine', choices=ENGINES, default='bytecode',
+        help='the engine of the jobs which do not name one '
+            '(default: bytecode)')
+    return parser.parse_args(argv)
+
+
+def write_results(results, stdout):
+    '''Write the JobResults `results` to the file `stdout`, one JSON object
+    per line, and return the number of failed jobs.
+
+    '''
+    num_of_errors = 0
+    for result in results:
+        if result.error is not None:
+            num_of_errors += 1
+        stdout.write(json.dumps(dict(zip(JobResult._fields, result))) + '\n')
+        stdout.flush()
+    return num_of_errors
+
+
+def main(argv, stdout=None):
+    '''Run the "chef batch" command and return its exit status: 0 if all
+    jobs could be executed and 1 otherwise. The results are written to the
+    file `stdout`, which defaults to sys.stdout, unless an output file is
+    given.
+
+    '''
+    args = parse_args(argv)
+    with open(args.manifest) as f:
+        entries = list(read_manifest(
+            f, os.path.dirname(args.manifest), args.engine))
+    invalid = [entry for entry in entries if isinstance(entry, JobResult)]
+    jobs = [entry for entry in entries if isinstance(entry, Job)]
+    if args.output:
+        stdout = open(args.output, 'w')
+    elif stdout is None:
+        stdout = sys.stdout
+    try:
+        num_of_errors = write_results(invalid, stdout)
+        num_of_errors += write_results(run_jobs(jobs, args.jobs), stdout)
+    finally:
+        if args.output:
+            stdout.close()
+    return 1 if num_of_errors else 0
@@ -0,0 +1,89 @@
+import re
+from string import ascii_lowercase
+
+VOWELS = frozenset('aeiou')
+CONSONANTS = frozenset(ascii_lowercase) - VOWELS
+_double_consonant_pattern = '[a-z]+?[%s]{2}' % ''.join(CONSONANTS)
+_double_consonant_present_pattern = re.compile(_double_consonant_pattern)
+_double_consonant_past_pattern = re.compile(_double_consonant_pattern + 'ed')
+
+# the number of results which are kept by verbs_match and past_form; the
+# caches are emptied when they are full
+CACHE_SIZE = 1024
+
+_matches = {}
+_past_forms = {}
+
+
+def match_verbs(present_form, past_form):
+    '''Check if `past_form` is the past form of the verb `present_form`,
+    without looking into the cache of verbs_match.
+
+    '''
+    fst, snd = present_form.lower(), past_form.lower()
+    if fst.endswith('e'):
+        return snd.endswith('d') and fst == snd[:-1]
+    elif _double_consonant_past_pattern.match(snd):
+        if _double_consonant_present_pattern.match(fst):
+            return fst == snd[:-2]
+        else:
+            return fst == snd[:-3]
+    else:
+        return snd.endswith('ed') and fst == snd[:-2]
+
+
+def verbs_match(present_form, past_form):
+    'Like match_verbs, but remember the result for each pair of verbs.'
+    key = present_form, past_form
+    try:
+        return _matches[key]
+    except KeyError:
+        if len(_matches) >= CACHE_SIZE:
+            _matches.clear()
+        result = _matches[key] = match_verbs(present_form, past_form)
+        return result
+
+
+def make_past_form(present_form):
+    '''Return the regular past form of the verb `present_form` in lowercase,
+    e.g. "examined" for "Examine" and "stopped" for "Stop", or None if
+    match_verbs does not accept any regular spelling of it. The final
+    consonant is doubled for verbs with a single vowel which end with a vowel
+    and a consonant.
+
+    '''
+    verb = present_form.lower()
+    if verb.endswith('e'):
+        candidates = [verb + 'd']
+    else:
+        candidates = [verb + 'ed']
+        vowels = [c for c in verb if c in VOWELS]
+        if len(verb) > 2 and len(vowels) == 1 and verb[-1] in CONSONANTS \
+                and verb[-1] not in 'wxy' and verb[-2] in VOWELS:
+            candidates.insert(0, verb + verb[-1] + 'ed')
+    for candidate in candidates:
+        if match_verbs(verb, candidate):
+            return candidate
+    return None
+
+
+def past_form(present_form):
+    'Like make_past_form, but remember the past form of each verb.'
+    try:
+        return _past_forms[present_form]
+    except KeyError:
+        if len(_past_forms) >= CACHE_SIZE:
+            _past_forms.clear()
+        result = _past_forms[present_form] = make_past_form(present_form)
+        return result
+
+
+def is_past_form(past, present_form, precomputed_past_form):
+    '''Check if `past` is a past form of the verb `present_form` whose past
+    form has been computed with past_form before. Matching the precomputed
+    past form is a plain string comparison; the other spellings which
+    match_verbs accepts (e.g. "joinned" for "Join") are still recognized.
+
+    '''
+    return past == precomputed_past_form or \
+        verbs_match(present_form, past)
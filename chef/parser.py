@@ -1,12 +1,20 @@
 import re
 from functools import partial
 
-from chef.datastructures import Recipe, IngredientProperties,\
-        Ingredients, unknown, undefined
+from chef.datastructures import Recipe, Ingredient, IngredientProperties,\
+        Ingredients, unknown, undefined, Instruction, OPCODES,\
+        LOOP_START, LOOP_END
 from chef.validators import validate_title, validate_ordinal_id_suffix,\
         validate_measure_type, validate_cooking_time, validate_time_declaration
 from chef.errors import syntax as syntax_errors
+from chef.scanner import VERB_FORMS, command_form, make_statement,\
+        scan_statements, scan_lines
 import chef.utils as chef_utils
+from chef.morphology import past_form, is_past_form
+
+# increase whenever the recipes returned by parse_recipe change, so that the
+# files of chef.cache are rebuilt
+PARSER_VERSION = 1
 
 DRY_MEASURE_PATTERN = r'k?g|pinch(?:es)?'
 LIQUID_MEASURE_PATTERN = r'm?l|dash(?:es)?'
@@ -38,6 +46,108 @@ ORDINAL_IDENTIFIER_PATTERN = r'([1-9]\d*?)(st|nd|rd|th)'
 
 SERVES_PATTERN = r'Serves ([1-9]\d*)\.'
 
+# cmd ingredient preposition [nth ]mixing bowl.
+INGREDIENT_PREPOSITION_NTH_MIXING_BOWL_PATTERN = (
+    r'(.+?) %%s (?:(%s) )?mixing bowl\.' % ORDINAL_IDENTIFIER_PATTERN)
+
+# cmd ingredient[ preposition [nth ]mixing bowl].
+INGREDIENT_OPTIONAL_PREPOSITION_NTH_MIXING_BOWL_PATTERN = (
+    r'(.+?)(?: %%s (%s )?mixing bowl)?\.' % ORDINAL_IDENTIFIER_PATTERN)
+
+_dry_measure_pattern = re.compile(DRY_MEASURE_PATTERN)
+_liquid_measure_pattern = re.compile(LIQUID_MEASURE_PATTERN)
+_dry_or_liquid_measure_pattern = re.compile(DRY_OR_LIQUID_MEASURE_PATTERN)
+_ingredient_list_item_pattern = re.compile(INGREDIENT_LIST_ITEM_PATTERN)
+_cooking_time_pattern = re.compile(COOKING_TIME_PATTERN)
+_oven_temperature_pattern = re.compile(OVEN_TEMPERATURE_PATTERN)
+_ordinal_identifier_pattern = re.compile(ORDINAL_IDENTIFIER_PATTERN)
+_serves_pattern = re.compile(SERVES_PATTERN)
+
+# the number of ordinal identifiers which parse_ordinal_identifier keeps;
+# the cache is emptied when it is full
+ORDINAL_CACHE_SIZE = 1024
+
+# maps the valid ordinal identifiers which have been parsed recently to
+# their numbers, e.g. '2nd' to 2
+_ordinal_identifiers = {}
+
+# the opcodes of the instructions which the statement parsers create
+_TAKE = OPCODES['take']
+_ADD_DRY = OPCODES['add_dry']
+_LIQUEFY_INGREDIENT = OPCODES['liquefy_ingredient']
+_LIQUEFY_CONTENTS = OPCODES['liquefy_contents']
+_STIR_MINUTES = OPCODES['stir_minutes']
+_STIR_INGREDIENT = OPCODES['stir_ingredient']
+_MIX = OPCODES['mix']
+_CLEAN = OPCODES['clean']
+_POUR = OPCODES['pour']
+_REFRIGERATE = OPCODES['refrigerate']
+
+# the prepositions which are used by the commands Put, Fold, Add, Remove,
+# Combine and Divide
+_ingredient_preposition_patterns = dict(
+    (preposition, re.compile(
+        INGREDIENT_PREPOSITION_NTH_MIXING_BOWL_PATTERN % preposition))
+    for preposition in ('into',))
+_ingredient_optional_preposition_patterns = dict(
+    (preposition, re.compile(
+        INGREDIENT_OPTIONAL_PREPOSITION_NTH_MIXING_BOWL_PATTERN % preposition))
+    for preposition in ('to', 'from', 'into'))
+
+# The grammar of the method statements: one compiled pattern per command form.
+# The patterns are only compiled once, i.e. when this module is imported.
+GRAMMAR = {
+    # Take ingredient from refrigerator.
+    'take': re.compile(r'(.+?) from refrigerator\.'),
+    # Put ingredient into [nth] mixing bowl.
+    'put': _ingredient_preposition_patterns['into'],
+    # Fold ingredient into [nth] mixing bowl.
+    'fold': _ingredient_preposition_patterns['into'],
+    # Add ingredient [to [nth] mixing bowl].
+    'add': _ingredient_optional_preposition_patterns['to'],
+    # Remove ingredient [from [nth] mixing bowl].
+    'remove': _ingredient_optional_preposition_patterns['from'],
+    # Combine ingredient [into [nth] mixing bowl].
+    'combine': _ingredient_optional_preposition_patterns['into'],
+    # Divide ingredient [into [nth] mixing bowl].
+    'divide': _ingredient_optional_preposition_patterns['into'],
+    # Add dry ingredients [to [nth] mixing bowl].
+    'add_dry': re.compile(
+        r'dry ingredients(?: to (%s )mixing bowl)?\.' % (
+            ORDINAL_IDENTIFIER_PATTERN)),
+    # Liquefy ingredient.
+    'liquefy_ingredient': re.compile(r'(.+?)\.'),
+    # Liquefy contents of the [nth] mixing bowl.
+    # The last group is the ingredient of a "Liquefy ingredient." statement
+    # whose arguments only start like the contents of a mixing bowl.
+    'liquefy_contents': re.compile(
+        r'contents of the( (%s))? mixing bowl\.|(.+?)\.' % (
+            ORDINAL_IDENTIFIER_PATTERN)),
+    # Stir [the [nth] mixing bowl] for number minutes.
+    'stir_minutes': re.compile(
+        r'(?:the( (%s))? mixing bowl )?for (\d+?) minutes\.' % (
+            ORDINAL_IDENTIFIER_PATTERN)),
+    # Stir ingredient into the [nth] mixing bowl.
+    'stir_ingredient': re.compile(
+        r'(.+?) into the(?: (%s))? mixing bowl\.' % (
+            ORDINAL_IDENTIFIER_PATTERN)),
+    # Mix [the [nth] mixing bowl] well.
+    'mix': re.compile(
+        r'(the ((%s) )?mixing bowl )?well\.' % ORDINAL_IDENTIFIER_PATTERN),
+    # Clean [nth] mixing bowl.
+    'clean': re.compile(r'((%s) )?mixing bowl\.' % ORDINAL_IDENTIFIER_PATTERN),
+    # Pour contents of the [nth] mixing bowl into the [pth] baking dish.
+    'pour': re.compile(
+        r'contents of the( (%(ord)s))? mixing bowl into the'
+        r'( (%(ord)s))? baking dish\.' % {'ord': ORDINAL_IDENTIFIER_PATTERN}),
+    # Refrigerate [for number hours].
+    'refrigerate': re.compile(r'(for ([1-9]\d*?) (hours?))?\.'),
+    # Verb the ingredient.
+    'loop_start': re.compile(r'the (.+?)\.'),
+    # Verb [the ingredient] until verbed.
+    'loop_end': re.compile(r'(the (.+?) )?until ([a-z]+ed)\.'),
+}
+
 
 def parse_ordinal_identifier(ordinal_identifier, lineno=None):
     '''Checks if the string `ordinal_identifier` is a number followed by one of
@@ -46,12 +156,19 @@ def parse_ordinal_identifier(ordinal_identifier, lineno=None):
     appertaining number as an integer.
 
     '''
-    m = re.match(ORDINAL_IDENTIFIER_PATTERN, ordinal_identifier)
+    try:
+        return _ordinal_identifiers[ordinal_identifier]
+    except KeyError:
+        pass
+    m = _ordinal_identifier_pattern.match(ordinal_identifier)
     if m is None:
         raise syntax_errors.OrdinalIdentifierError(ordinal_identifier, lineno)
     num_str, suffix = m.groups()
     validate_ordinal_id_suffix(num_str, suffix, lineno)
-    return int(num_str)
+    if len(_ordinal_identifiers) >= ORDINAL_CACHE_SIZE:
+        _ordinal_identifiers.clear()
+    number = _ordinal_identifiers[ordinal_identifier] = int(num_str)
+    return number
 
 
 def detect_ingredient_state(measure, measure_type=None, lineno=None):
@@ -69,11 +186,11 @@ def detect_ingredient_state(measure, measure_type=None, lineno=None):
     elif measure_type is not None:
         validate_measure_type(measure, measure_type, lineno)
         is_dry, is_liquid = True, False
-    elif re.match(DRY_MEASURE_PATTERN, measure) is not None:
+    elif _dry_measure_pattern.match(measure) is not None:
         is_dry, is_liquid = True, False
-    elif re.match(LIQUID_MEASURE_PATTERN, measure) is not None:
+    elif _liquid_measure_pattern.match(measure) is not None:
         is_dry, is_liquid = False, True
-    elif re.match(DRY_OR_LIQUID_MEASURE_PATTERN, measure) is not None:
+    elif _dry_or_liquid_measure_pattern.match(measure) is not None:
         is_dry, is_liquid = unknown, unknown
     else:
         raise ValueError('invalid measure: %r' % measure)
@@ -81,9 +198,14 @@ def detect_ingredient_state(measure, measure_type=None, lineno=None):
 
 
 def parse_ingredient_list(ingredient_list, lineno):
-    ingredients = Ingredients()
+    # If an ingredient is declared more than once, the new declaration
+    # replaces the previous one at its position. The positions of the names
+    # are remembered so that this does not require scanning the ingredients
+    # parsed so far.
+    ingredients = []
+    positions = {}
     for item in ingredient_list.splitlines():
-        m = re.match(INGREDIENT_LIST_ITEM_PATTERN, item)
+        m = _ingredient_list_item_pattern.match(item)
         if m is None:
             raise syntax_errors.InvalidCommandError('ingredient', lineno)
         try:
@@ -92,20 +214,26 @@ def parse_ingredient_list(ingredient_list, lineno):
             value = None
         is_dry, is_liquid = detect_ingredient_state(m.group('measure'))
         name = m.group('name')
-        properties = IngredientProperties(value, is_dry, is_liquid)
-        ingredients[name] = properties
+        ingredient = Ingredient(
+            name, IngredientProperties(value, is_dry, is_liquid))
+        position = positions.get(name)
+        if position is None:
+            positions[name] = len(ingredients)
+            ingredients.append(ingredient)
+        else:
+            ingredients[position] = ingredient
         lineno += 1
-    return ingredients, lineno
+    return Ingredients(ingredients), lineno
 
 
 def is_cooking_time(line):
-    m = re.match(COOKING_TIME_PATTERN, line)
+    m = _cooking_time_pattern.match(line)
     return m is not None
 
 
 def parse_cooking_time(line, lineno=None):
-    m = re.match(COOKING_TIME_PATTERN, line)
-    if not is_cooking_time(line):
+    m = _cooking_time_pattern.match(line)
+    if m is None:
         raise syntax_errors.InvalidCookingTimeError(lineno)
     time, unit = m.groups()
     validate_cooking_time(time, unit, lineno)
@@ -114,12 +242,12 @@ def parse_cooking_time(line, lineno=None):
 
 
 def is_oven_temperature(line):
-    m = re.match(OVEN_TEMPERATURE_PATTERN, line)
+    m = _oven_temperature_pattern.match(line)
     return m is not None
 
 
 def parse_oven_temperature(line, lineno=None):
-    m = re.match(OVEN_TEMPERATURE_PATTERN, line)
+    m = _oven_temperature_pattern.match(line)
     if m is None:
         raise syntax_errors.InvalidOvenTemperature(lineno)
     elements = m.groups()
@@ -145,48 +273,36 @@ def get_ordinal_id(match_object, group_num, lineno=None):
 def parse_ingredient_preposition_nth_mixing_bowl(cmd, preposition, statement,
                                                  lineno=None):
     # cmd ingredient preposition [nth ]mixing bowl.
-    #pattern = '(.+?) %s (?:(%s )|the )mixing bowl\.' % (
-    pattern = '(.+?) %s (?:(%s) )?mixing bowl\.' % (
-        preposition, ORDINAL_IDENTIFIER_PATTERN)
-    m = re.match(pattern, statement)
+    pattern = _ingredient_preposition_patterns.get(preposition)
+    if pattern is None:
+        raise syntax_errors.InvalidCommandError(cmd, lineno)
+    m = pattern.match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError(cmd, lineno)
-    ingredient = m.group(1)
-    mixing_bowl_id = get_ordinal_id(m, 2)
-    return {
-        'command': cmd.lower(),
-        'ingredient': ingredient,
-        'mixing_bowl_id': mixing_bowl_id}
+    return Instruction(
+        OPCODES[cmd.lower()], (m.group(1), get_ordinal_id(m, 2), lineno))
 
 
 def parse_ingredient_optional_preposition_nth_mixing_bowl(cmd, preposition,
                                                           statement,
                                                           lineno=None):
     # cmd ingredient[ to [nth ]mixing bowl].
-    pattern_with_suffix = r'(.+?)(?: %s (%s )?mixing bowl)\.' % (
-        preposition, ORDINAL_IDENTIFIER_PATTERN)
-    m = re.match(pattern_with_suffix, statement)
+    pattern = _ingredient_optional_preposition_patterns.get(preposition)
+    if pattern is None:
+        raise syntax_errors.InvalidCommandError(cmd, lineno)
+    m = pattern.match(statement)
     if m is None:
-        pattern_without_suffix = r'(.+?)\.'
-        m = re.match(pattern_without_suffix, statement)
-        if m is None:
-            raise syntax_errors.InvalidCommandError(cmd, lineno)
-        mixing_bowl_id = None
-    else:
-        mixing_bowl_id = get_ordinal_id(m, 2)
-    ingredient = m.group(1)
-    return {
-        'command': cmd.lower(),
-        'ingredient': ingredient,
-        'mixing_bowl_id': mixing_bowl_id}
+        raise syntax_errors.InvalidCommandError(cmd, lineno)
+    return Instruction(
+        OPCODES[cmd.lower()], (m.group(1), get_ordinal_id(m, 2), lineno))
 
 
 def parse_take(statement, lineno=None):
     # Take ingredient from refrigerator.
-    m = re.match('(.+?) from refrigerator\.', statement)
+    m = GRAMMAR['take'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Take', lineno)
-    return {'command': 'take', 'ingredient': m.group(1)}
+    return Instruction(_TAKE, (m.group(1), lineno))
 
 
 def parse_put(statement, lineno=None):
@@ -202,17 +318,17 @@ def parse_fold(statement, lineno=None):
 
 
 def parse_add(statement, lineno=None):
-    # Add ingredient [to [nth] mixing bowl].
-    # attempt to parse 'Add dry ingredients' command before trying to parse
-    # 'Add'
-    try:
+    # the keywords 'dry ingredients' introduce the 'Add dry ingredients'
+    # command
+    if command_form('Add', statement) == 'add_dry':
         return parse_add_dry(statement, lineno)
-    except syntax_errors.InvalidCommandError:
-        if statement.startswith('dry ingredients'):
-            raise
-        else:
-            return parse_ingredient_optional_preposition_nth_mixing_bowl(
-                'Add', 'to', statement, lineno)
+    return parse_add_ingredient(statement, lineno)
+
+
+def parse_add_ingredient(statement, lineno=None):
+    # Add ingredient [to [nth] mixing bowl].
+    return parse_ingredient_optional_preposition_nth_mixing_bowl(
+        'Add', 'to', statement, lineno)
 
 
 def parse_remove(statement, lineno=None):
@@ -235,69 +351,54 @@ def parse_divide(statement, lineno=None):
 
 def parse_add_dry(statement, lineno=None):
     # Add dry ingredients [to [nth] mixing bowl].
-    pattern = (
-        'dry ingredients'
-        '(?: to (%s )mixing bowl)?\.' % ORDINAL_IDENTIFIER_PATTERN)
-    m = re.match(pattern, statement)
+    m = GRAMMAR['add_dry'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Add dry', lineno)
-    mixing_bowl_id = get_ordinal_id(m, 1)
-    return {'command': 'add_dry', 'mixing_bowl_id': mixing_bowl_id}
+    return Instruction(_ADD_DRY, (get_ordinal_id(m, 1), lineno))
 
 
 def parse_liquefy_ingredient(statement, lineno=None):
     # Liquefy ingredient.
-    m = re.match('(.+?)\.', statement)
+    m = GRAMMAR['liquefy_ingredient'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Liquefy', lineno)
-    return {'command': 'liquefy_ingredient', 'ingredient': m.group(1)}
+    return Instruction(_LIQUEFY_INGREDIENT, (m.group(1), lineno))
 
 
 def parse_liquefy_contents(statement, lineno=None):
     # Liquefy contents of the [nth] mixing bowl.
-    pattern = (
-        'contents of the( (%s))? mixing bowl\.' % ORDINAL_IDENTIFIER_PATTERN)
-    m = re.match(pattern, statement)
+    m = GRAMMAR['liquefy_contents'].match(statement)
     if m is None:
-        return parse_liquefy_ingredient(statement, lineno)
-    mixing_bowl_id = get_ordinal_id(m, 2)
-    return {
-        'command': 'liquefy_contents',
-        'mixing_bowl_id': mixing_bowl_id}
+        raise syntax_errors.InvalidCommandError('Liquefy', lineno)
+    ingredient = m.group(5)
+    if ingredient is not None:
+        return Instruction(_LIQUEFY_INGREDIENT, (ingredient, lineno))
+    return Instruction(_LIQUEFY_CONTENTS, (get_ordinal_id(m, 2), lineno))
 
 
 def parse_stir_minutes(statement, lineno=None):
     # Stir [the [nth] mixing bowl] for number minutes.
-    pattern = '(?:the( (%s))? mixing bowl )?for (\d+?) minutes\.' % (
-        ORDINAL_IDENTIFIER_PATTERN)
-    m = re.match(pattern, statement)
+    m = GRAMMAR['stir_minutes'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Stir', lineno)
-    return {
-        'command': 'stir_minutes',
-        'mixing_bowl_id': get_ordinal_id(m, 2),
-        'minutes': int(m.group(5))}
+    return Instruction(
+        _STIR_MINUTES, (int(m.group(5)), get_ordinal_id(m, 2), lineno))
 
 
 def parse_stir_ingredient(statement, lineno=None):
     # Stir ingredient into the [nth] mixing bowl.
-    pattern = '(.+?) into the(?: (%s))? mixing bowl\.' % (
-        ORDINAL_IDENTIFIER_PATTERN)
-    m = re.match(pattern, statement)
+    m = GRAMMAR['stir_ingredient'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Stir', lineno)
-    return {
-        'command': 'stir_ingredient',
-        'ingredient': m.group(1),
-        'mixing_bowl_id': get_ordinal_id(m, 2)}
+    return Instruction(
+        _STIR_INGREDIENT, (m.group(1), get_ordinal_id(m, 2), lineno))
 
 
 def parse_stir(statement, lineno=None):
     # If the first word of `statement` is either 'the' or 'for', then the
     # command is in the first form. Otherwise, it is the last form, i.e. the
     # first word is an ingredient.
-    first_word, _ = statement.split(' ', 1)
-    if first_word in ('the', 'for'):
+    if command_form('Stir', statement) == 'stir_minutes':
         return parse_stir_minutes(statement, lineno)
     else:
         return parse_stir_ingredient(statement, lineno)
@@ -305,132 +406,364 @@ def parse_stir(statement, lineno=None):
 
 def parse_mix(statement, lineno=None):
     # Mix [the [nth] mixing bowl] well.
-    pattern = '(the ((%s) )?mixing bowl )?well\.' % ORDINAL_IDENTIFIER_PATTERN
-    m = re.match(pattern, statement)
+    m = GRAMMAR['mix'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Mix', lineno)
-    mixing_bowl_id = get_ordinal_id(m, 2)
-    return {
-        'command': 'mix', 'mixing_bowl_id': mixing_bowl_id}
+    return Instruction(_MIX, (get_ordinal_id(m, 2), lineno))
 
 
 def parse_clean(statement, lineno=None):
     # Clean [nth] mixing bowl.
-    pattern = '((%s) )?mixing bowl\.' % ORDINAL_IDENTIFIER_PATTERN
-    m = re.match(pattern, statement)
+    m = GRAMMAR['clean'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Clean', lineno)
-    mixing_bowl_id = get_ordinal_id(m, 2)
-    return {'command': 'clean', 'mixing_bowl_id': mixing_bowl_id}
+    return Instruction(_CLEAN, (get_ordinal_id(m, 2), lineno))
 
 
 def parse_pour(statement, lineno=None):
     # Pour contents of the [nth] mixing bowl into the [pth] baking dish.
-    pattern = (
-        'contents of the( (%(ord)s))? mixing bowl into the'
-        '( (%(ord)s))? baking dish\.' % {'ord': ORDINAL_IDENTIFIER_PATTERN})
-    m = re.match(pattern, statement)
+    m = GRAMMAR['pour'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Pour', lineno)
     get_id = partial(get_ordinal_id, m)
     mixing_bowl_id = get_id(2)
     baking_dish_id = get_id(6)
-    return {
-        'command': 'pour',
-        'mixing_bowl_id': mixing_bowl_id,
-        'baking_dish_id': baking_dish_id}
+    return Instruction(_POUR, (mixing_bowl_id, baking_dish_id, lineno))
 
 
 def parse_refrigerate(statement, lineno=None):
     # Refrigerate [for number hours].
-    pattern = '(for ([1-9]\d*?) (hours?))?\.'
-    m = re.match(pattern, statement)
+    m = GRAMMAR['refrigerate'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError('Refrigerate', lineno)
     hours = m.group(2)
     hour_or_hours = m.group(3)
     # "1 hours" and "2 hour" are invalid
     validate_time_declaration(hours, hour_or_hours, lineno)
-    return {
-        'command': 'refrigerate',
-        'hours': int(hours) if hours is not None else None}
+    return Instruction(
+        _REFRIGERATE,
+        (int(hours) if hours is not None else None, lineno))
 
 
 def parse_loop_start(verb, statement, lineno=None):
     # Verb the ingredient.
-    m = re.match('the (.+?)\.', statement)
+    m = GRAMMAR['loop_start'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError(verb, lineno)
-    return {
-        'command': 'loop_start', 'verb': verb, 'ingredient': m.group(1)}
+    return Instruction(LOOP_START, (verb, m.group(1), lineno))
 
 
 def parse_loop_end(verb, statement, lineno=None):
     # Verb [the ingredient] until verbed.
-    m = re.match('(the (.+?) )?until ([a-z]+ed)\.', statement)
+    m = GRAMMAR['loop_end'].match(statement)
     if m is None:
         raise syntax_errors.InvalidCommandError(verb, lineno)
-    return {
-        'command': 'loop_end', 'verb': m.group(3), 'ingredient': m.group(2)}
+    return Instruction(LOOP_END, (m.group(3), m.group(2), lineno))
 
 
 def parse_loop(verb, statement, lineno=None):
-    try:
+    # an until-statement ends the loop, every other statement begins it
+    if command_form(verb, statement) == 'loop_end':
         return parse_loop_end(verb, statement, lineno)
+    return parse_loop_start(verb, statement, lineno)
+
+
+# maps the command forms which are detected by chef.scanner.command_form to
+# the functions which parse their arguments
+FORM_PARSERS = {
+    'take': parse_take,
+    'put': parse_put,
+    'fold': parse_fold,
+    'add': parse_add_ingredient,
+    'remove': parse_remove,
+    'combine': parse_combine,
+    'divide': parse_divide,
+    'add_dry': parse_add_dry,
+    'liquefy_ingredient': parse_liquefy_ingredient,
+    'liquefy_contents': parse_liquefy_contents,
+    'stir_minutes': parse_stir_minutes,
+    'stir_ingredient': parse_stir_ingredient,
+    'mix': parse_mix,
+    'clean': parse_clean,
+    'pour': parse_pour,
+    'refrigerate': parse_refrigerate}
+
+
+def parse_statement(statement):
+    '''Parse the arguments of the chef.scanner.Statement `statement` with the
+    parser of its command form and return the resulting
+    chef.datastructures.Instruction.
+
+    '''
+    form, verb, arguments, lineno, column = statement
+    func = FORM_PARSERS.get(form)
+    if func is not None:
+        return func(arguments, lineno)
+    try:
+        if form == 'loop_end':
+            return parse_loop_end(verb, arguments, lineno)
+        return parse_loop_start(verb, arguments, lineno)
     except syntax_errors.InvalidCommandError:
-        return parse_loop_start(verb, statement, lineno)
+        raise syntax_errors.ChefSyntaxError(
+            'invalid method name: %r' % verb, lineno)
 
 
 def parse_instruction(line, lineno=None):
-    method, statement = line.split(' ', 1)
-    functions = {
-        'Take': parse_take,
-        'Put': parse_put,
-        'Fold': parse_fold,
-        'Add': parse_add,
-        'Remove': parse_remove,
-        'Combine': parse_combine,
-        'Divide': parse_divide,
-        'Liquefy': parse_liquefy_contents,
-        'Stir': parse_stir,
-        'Mix': parse_mix,
-        'Clean': parse_clean,
-        'Pour': parse_pour,
-        'Refrigerate': parse_refrigerate}
-    func = functions.get(method)
-    if func is None:
-        try:
-            d = parse_loop(method, statement, lineno)
-        except syntax_errors.InvalidCommandError:
-            raise syntax_errors.ChefSyntaxError(
-                'invalid method name: %r' % method, lineno)
-    else:
-        d = func(statement, lineno)
-    d['lineno'] = lineno
-    return d
+    return parse_statement(make_statement(line, lineno))
+
+
+# The fast path of parse_method: the statements of a method whose words are
+# separated by single spaces are matched by a single pattern, and their
+# instructions are built from its groups. Each alternative of the pattern
+# starts with a verb and only matches if chef.scanner.command_form chooses
+# the same command form and the pattern of GRAMMAR for that form matches;
+# everything else, e.g. a statement which spans multiple lines or an invalid
+# statement, is left to chef.scanner.scan_statements and parse_statement.
+
+# an ingredient name and an ordinal identifier of the fast path
+_I = r'([^.\n]+?)'
+_O = r'([1-9]\d*?(?:st|nd|rd|th))'
+# a verb which begins a loop, i.e. which does not introduce any other command
+_LOOP_VERB = r'(?!(?:%s) )([^.\s]+) ' % '|'.join(
+    sorted(VERB_FORMS) + ['Add', 'Liquefy', 'Stir'])
+
+# the whitespace which scan_statements collapses
+_IRREGULAR_WHITESPACE = ('  ', ' \n', '\n ', ' .', '\t', '\r', '\v', '\f')
+
+
+def _ordinal_id(ordinal_identifier, lineno):
+    if ordinal_identifier is None:
+        return None
+    return parse_ordinal_identifier(ordinal_identifier, lineno)
+
+
+def _build_ingredient_mixing_bowl(opcode):
+    def build(groups, lineno):
+        ingredient, ordinal_identifier = groups
+        return Instruction(opcode, (
+            ingredient, _ordinal_id(ordinal_identifier, lineno), lineno))
+    return build
+
+
+def _build_mixing_bowl(opcode):
+    def build(ordinal_identifier, lineno):
+        return Instruction(
+            opcode, (_ordinal_id(ordinal_identifier, lineno), lineno))
+    return build
+
+
+def _build_liquefy(groups, lineno):
+    ordinal_identifier, ingredient = groups
+    if ingredient is not None:
+        return Instruction(_LIQUEFY_INGREDIENT, (ingredient, lineno))
+    return Instruction(
+        _LIQUEFY_CONTENTS, (_ordinal_id(ordinal_identifier, lineno), lineno))
+
+
+def _build_stir_minutes(groups, lineno):
+    ordinal_identifier, minutes = groups
+    return Instruction(_STIR_MINUTES, (
+        int(minutes), _ordinal_id(ordinal_identifier, lineno), lineno))
+
+
+def _build_pour(groups, lineno):
+    mixing_bowl, baking_dish = groups
+    return Instruction(_POUR, (
+        _ordinal_id(mixing_bowl, lineno), _ordinal_id(baking_dish, lineno),
+        lineno))
+
+
+def _build_take(ingredient, lineno):
+    return Instruction(_TAKE, (ingredient, lineno))
+
+
+def _build_liquefy_ingredient(ingredient, lineno):
+    return Instruction(_LIQUEFY_INGREDIENT, (ingredient, lineno))
+
+
+def _build_loop_start(groups, lineno):
+    verb, ingredient = groups
+    return Instruction(LOOP_START, (verb, ingredient, lineno))
+
+
+def _build_loop_end(groups, lineno):
+    verb, ingredient, past_verb = groups
+    return Instruction(LOOP_END, (past_verb, ingredient, lineno))
+
+
+def _build_refrigerate(groups, lineno):
+    hours, hour_or_hours = groups
+    validate_time_declaration(hours, hour_or_hours, lineno)
+    return Instruction(
+        _REFRIGERATE, (int(hours) if hours is not None else None, lineno))
+
+
+# the alternatives of the pattern, roughly in the order of their frequency,
+# and the functions which build the instructions from their groups (as
+# returned by re.MatchObject.group, i.e. a tuple if there are several)
+_FAST_FORMS = [
+    (r'Put %s into (?:%s )?mixing bowl' % (_I, _O),
+        _build_ingredient_mixing_bowl(OPCODES['put'])),
+    (r'Take %s from refrigerator' % _I, _build_take),
+    (r'Fold %s into (?:%s )?mixing bowl' % (_I, _O),
+        _build_ingredient_mixing_bowl(OPCODES['fold'])),
+    (r'Add dry ingredients(?: to %s mixing bowl)?' % _O,
+        _build_mixing_bowl(_ADD_DRY)),
+    (r'Add (?!dry ingredients)%s(?: to (?:%s )?mixing bowl)?' % (_I, _O),
+        _build_ingredient_mixing_bowl(OPCODES['add'])),
+    (r'Remove %s(?: from (?:%s )?mixing bowl)?' % (_I, _O),
+        _build_ingredient_mixing_bowl(OPCODES['remove'])),
+    (r'Combine %s(?: into (?:%s )?mixing bowl)?' % (_I, _O),
+        _build_ingredient_mixing_bowl(OPCODES['combine'])),
+    (r'Divide %s(?: into (?:%s )?mixing bowl)?' % (_I, _O),
+        _build_ingredient_mixing_bowl(OPCODES['divide'])),
+    (r'Liquefy (?=contents of the )'
+        r'(?:contents of the (?:%s )?mixing bowl|%s)' % (_O, _I),
+        _build_liquefy),
+    (r'Liquefy (?!contents of the )%s' % _I, _build_liquefy_ingredient),
+    (r'Stir (?=the |for )(?:the (?:%s )?mixing bowl )?for (\d+?) minutes' % (
+        _O), _build_stir_minutes),
+    (r'Stir (?!the |for )%s into the (?:%s )?mixing bowl' % (_I, _O),
+        _build_ingredient_mixing_bowl(_STIR_INGREDIENT)),
+    (r'Mix (?:the (?:%s )?mixing bowl )?well' % _O, _build_mixing_bowl(_MIX)),
+    (r'Clean (?:%s )?mixing bowl' % _O, _build_mixing_bowl(_CLEAN)),
+    (r'Pour contents of the (?:%s )?mixing bowl into the (?:%s )?baking '
+        r'dish' % (_O, _O), _build_pour),
+    (r'Refrigerate(?: for ([1-9]\d*?) (hours?))?', _build_refrigerate),
+    (r'%s(?:the %s )?until ([a-z]+ed)' % (_LOOP_VERB, _I), _build_loop_end),
+    (r'%s(?![^.\n]*? until )the %s' % (_LOOP_VERB, _I), _build_loop_start),
+]
+
+
+def _compile_fast_forms(forms):
+    # the pattern, whose first group is a line break in front of the
+    # statement, and a list which maps the group of each alternative (see
+    # re.MatchObject.lastindex) to the numbers of its inner groups and to its
+    # build function. The last alternative takes everything up to the next
+    # full stop, which is left to the slow path, so that the matches of the
+    # pattern cover the whole text.
+    alternatives = []
+    builders = [None, None]
+    for pattern, build in forms:
+        num_of_groups = re.compile(pattern).groups
+        first = len(builders) + 1
+        alternatives.append('(%s\\.)' % pattern)
+        builders.append((tuple(xrange(first, first + num_of_groups)), build))
+        builders.extend([None] * num_of_groups)
+    alternatives.append(r'([^.]+\.?|\.)')
+    builders.append(None)
+    return re.compile(r'(?: |(\n))?(?:%s)' % '|'.join(alternatives)), builders
+
+_fast_pattern, _fast_builders = _compile_fast_forms(_FAST_FORMS)
+
+
+def parse_statements(text, lineno=1):
+    '''Parse the statements of the method `text`, whose first character is
+    on the line `lineno`, like scan_statements and parse_statement do, and
+    return the list of their instructions.
+
+    '''
+    instructions = []
+    append = instructions.append
+    for whitespace in _IRREGULAR_WHITESPACE:
+        if whitespace in text:
+            for statement in scan_statements(text, lineno):
+                append(parse_statement(statement))
+            return instructions
+    builders = _fast_builders
+    for m in _fast_pattern.finditer(text):
+        if m.group(1):
+            lineno += 1
+        builder = builders[m.lastindex]
+        if builder is None:
+            chunk = m.group(m.lastindex)
+            for statement in scan_statements(chunk, lineno):
+                append(parse_statement(statement))
+            lineno += chunk.count('\n')
+        else:
+            groups, build = builder
+            append(build(m.group(*groups), lineno))
+    return instructions
+
+
+def iter_resolved_loops(instructions):
+    '''Match each loop start of the iterable `instructions` with its
+    until-statement and store the distance between them as the jump offset of
+    both instructions. Yield the instructions; the instructions of a loop are
+    held back until the until-statement of the outermost loop has been read.
+
+    '''
+    # the instructions of the loops which have not been closed yet
+    pending = []
+    # the indices of the open loop starts in `pending` and the past forms of
+    # their verbs, innermost last
+    open_loops = []
+    for instruction in instructions:
+        opcode = instruction.opcode
+        if opcode == LOOP_START:
+            verb = instruction.operands[0]
+            open_loops.append((len(pending), past_form(verb)))
+            pending.append(instruction)
+        elif opcode == LOOP_END:
+            verb = instruction.operands[0]
+            if not open_loops:
+                raise syntax_errors.ChefSyntaxError(
+                    'until-statement without a loop: %r' % verb,
+                    instruction.lineno)
+            start_index, loop_past_form = open_loops.pop()
+            loop_start = pending[start_index]
+            loop_verb = loop_start.operands[0]
+            # loops are nested, so the until-statement has to close the
+            # innermost loop
+            if not is_past_form(verb, loop_verb, loop_past_form):
+                raise syntax_errors.MissingLoopEndError(
+                    loop_verb, loop_start.lineno)
+            offset = len(pending) - start_index
+            loop_start.jump = offset
+            instruction.jump = offset
+            pending.append(instruction)
+            if not open_loops:
+                for instruction in pending:
+                    yield instruction
+                pending = []
+        elif open_loops:
+            pending.append(instruction)
+        else:
+            yield instruction
+    if open_loops:
+        loop_start = pending[open_loops[-1][0]]
+        raise syntax_errors.MissingLoopEndError(
+            loop_start.operands[0], loop_start.lineno)
+
+
+def resolve_loops(instructions):
+    '''Store the jump offsets of all loops in the list `instructions` (see
+    iter_resolved_loops) and return the list.
+
+    '''
+    for instruction in iter_resolved_loops(instructions):
+        pass
+    return instructions
 
 
 def parse_method(paragraph, lineno):
-    # remove the introductory line if it exists
-    if paragraph.startswith('Method.\n'):
-        paragraph = paragraph.lstrip('Method.\n')
-    parsed_instructions = []
-    for instr in paragraph.rstrip('.').split('.'):
-        #lineno += instr.count('\n')
-        lineno += 1
-        if instr.strip():
-            parsed_instructions.append(
-                parse_instruction(instr.strip() + '.', lineno))
-    return parsed_instructions, lineno
+    # skip the introductory line if it exists
+    headline, separator, rest = paragraph.partition('\n')
+    if headline == 'Method.':
+        paragraph = rest
+    parsed_instructions = parse_statements(paragraph, lineno + 1)
+    if parsed_instructions:
+        lineno = parsed_instructions[-1].lineno
+    return resolve_loops(parsed_instructions), lineno
 
 
 def is_serves(line):
-    m = re.match(SERVES_PATTERN, line)
+    m = _serves_pattern.match(line)
     return m is not None
 
 
 def parse_serves(line, lineno):
-    m = re.match(SERVES_PATTERN, line)
+    m = _serves_pattern.match(line)
     num_of_diners = int(m.group(1))
     return num_of_diners
 
@@ -451,7 +784,29 @@ def parse_serves_if_possible(f, lineno):
     return serves, lineno
 
 
-def parse_recipe(f):
+def read_paragraph_headline(f):
+    '''Read the first line of the next paragraph of the file `f`. Return an
+    empty string if the paragraph is empty or if the end of the file has been
+    reached.
+
+    '''
+    try:
+        line = f.next()
+    except StopIteration:
+        return ''
+    if line == '\n':
+        return ''
+    return line
+
+
+def parse_recipe_header(f):
+    '''Parse everything in front of the method of the recipe in the file `f`,
+    i.e. the title, the comments, the ingredient list, the cooking time and
+    the oven temperature. Stop right after the line "Method." has been read.
+    Return a tuple in the form (ingredients, cooking_time, oven_temperature,
+    lineno) where `lineno` is the line number of "Method.".
+
+    '''
     consumed_comments = False
     title = f.readline().rstrip()
     validate_title(title)
@@ -461,10 +816,23 @@ def parse_recipe(f):
     parsed_ingredients = parsed_cooking_time = parsed_oven_temperature = False
     # set some default values for recipe elements
     ingredients = Ingredients()
-    cooking_time = oven_temperature = serves = undefined
+    cooking_time = oven_temperature = undefined
     while True:
-        cur_par, cur_line = update_current_par_and_line(f)
+        headline = read_paragraph_headline(f)
+        cur_line = headline.rstrip('\n')
         lineno += 1
+        if cur_line == 'Method.':
+            if parsed_ingredients:
+                lineno += 1
+            if parsed_cooking_time:
+                lineno += 1
+            if parsed_oven_temperature:
+                lineno += 1
+            return ingredients, cooking_time, oven_temperature, lineno
+        if headline:
+            cur_par = headline + chef_utils.read_until_blank_line(f)
+        else:
+            cur_par = ''
         if cur_line == 'Ingredients.':
             headline, ingredient_list = cur_par.split('\n', 1)
             ingredients, lineno = parse_ingredient_list(
@@ -476,16 +844,6 @@ def parse_recipe(f):
         elif is_oven_temperature(cur_line):
             oven_temperature = parse_oven_temperature(cur_line, lineno)
             parsed_oven_temperature = True
-        elif cur_line == 'Method.':
-            if parsed_ingredients:
-                lineno += 1
-            if parsed_cooking_time:
-                lineno += 1
-            if parsed_oven_temperature:
-                lineno += 1
-            parsed_instructions, lineno = parse_method(cur_par, lineno)
-            serves, lineno = parse_serves_if_possible(f, lineno)
-            break
         else:
             if consumed_comments:
                 raise syntax_errors.ChefSyntaxError(
@@ -493,9 +851,70 @@ def parse_recipe(f):
             else:
                 lineno += cur_par.count('\n')
                 consumed_comments = True
+
+
+def parse_recipe(f):
+    ingredients, cooking_time, oven_temperature, lineno = \
+        parse_recipe_header(f)
+    parsed_instructions, lineno = parse_method(
+        chef_utils.read_until_blank_line(f), lineno)
+    serves, lineno = parse_serves_if_possible(f, lineno)
     # make sure the whole file content is exhausted
     rest = f.read()
     assert rest == ''
     return Recipe(
         ingredients, cooking_time,
         oven_temperature, parsed_instructions, serves)
+
+
+def parse_recipe_string(text):
+    'Parse the recipe in the string `text`.'
+    return parse_recipe(chef_utils.BufferReader(text))
+
+
+def parse_recipe_bytes(buffer):
+    '''Parse the recipe in the byte buffer `buffer`, i.e. a str or any object
+    which supports find() and slicing like str does, e.g. a mmap.mmap. Only
+    the paragraphs of the recipe are copied out of the buffer.
+
+    '''
+    return parse_recipe(chef_utils.BufferReader(buffer))
+
+
+class RecipeStream(object):
+    '''A recipe whose method is parsed while it is being read. It has the
+    same attributes as chef.datastructures.Recipe, but `instructions` is an
+    iterator which yields each instruction as soon as its statement has been
+    read from the file. `serves` stays undefined until all instructions have
+    been consumed.
+
+    '''
+    def __init__(self, f):
+        self.ingredients, self.cooking_time, self.oven_temperature, lineno = \
+            parse_recipe_header(f)
+        self.serves = undefined
+        self.instructions = self.iter_instructions(f, lineno)
+
+    def __iter__(self):
+        return self.instructions
+
+    def iter_instructions(self, f, lineno):
+        # the method ends with the next blank line
+        statements = scan_lines(iter(f.next, '\n'), lineno + 1)
+        for instruction in iter_resolved_loops(
+                parse_statement(statement) for statement in statements):
+            yield instruction
+            lineno = instruction.lineno
+        self.serves, lineno = parse_serves_if_possible(f, lineno)
+        # make sure the whole file content is exhausted
+        rest = f.read()
+        assert rest == ''
+
+
+def parse_recipe_stream(f):
+    '''Parse the recipe in the file `f` incrementally. Only the part in front
+    of the method is parsed immediately; the statements of the method are
+    parsed while iterating over the returned RecipeStream.
+
+    '''
+    return RecipeStream(f)
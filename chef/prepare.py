@@ -0,0 +1,64 @@
+'''Keep prepared recipes (see chef.interpreter.prepare_recipe) for processes
+which execute many recipes, like the daemon of "chef serve" (see
+chef.daemon) and the workers of "chef batch" (see chef.jobs).
+
+'''
+from __future__ import with_statement
+
+import hashlib
+import threading
+
+from chef.parser import parse_recipe_string
+from chef.interpreter import prepare_recipe
+
+# the number of prepared recipes which a RecipeCache keeps by default
+CACHE_SIZE = 128
+
+
+class RecipeCache(object):
+    '''An LRU cache of at most `max_size` recipes, which are prepared by the
+    function `prepare` from their source and an engine. It may be used by
+    several threads.
+
+    '''
+    def __init__(self, prepare, max_size=CACHE_SIZE):
+        self.prepare = prepare
+        self.max_size = max_size
+        # maps the keys to their last use and their values
+        self._entries = {}
+        self._uses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, source, engine):
+        '''Return the value of `prepare` for the recipe `source` and the
+        engine `engine`, which is only computed if it is not cached.
+
+        '''
+        key = (hashlib.sha1(source).digest(), engine)
+        with self._lock:
+            self._uses += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[0] = self._uses
+                return entry[1]
+        # prepared outside of the lock, so that other requests can go on
+        value = self.prepare(source, engine)
+        with self._lock:
+            entries = self._entries
+            if key not in entries and len(entries) >= self.max_size:
+                del entries[min(entries, key=lambda key: entries[key][0])]
+            entries[key] = [self._uses, value]
+        return value
+
+
+def prepare_recipe_source(source, engine):
+    '''Parse the recipe `source` and return the Recipe and the function which
+    executes it with the engine `engine` (see
+    chef.interpreter.prepare_recipe).
+
+    '''
+    recipe = parse_recipe_string(source)
+    return recipe, prepare_recipe(recipe, engine)
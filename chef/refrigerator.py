@@ -0,0 +1,279 @@
+'''Read the numbers which "Take ingredient from refrigerator" reads from
+STDIN.
+
+Every number is read from a line of its own, like with ``int(readline())``,
+but the file is read in large blocks which are split into lines, and the
+lines of a block are converted into numbers at once. A block only contains
+what is available, so reading from a terminal or a pipe does not wait for
+more input than the next line. "take" only pops the
+next number from the converted block. Optionally, the blocks are read by a
+background thread while the recipe is being executed.
+
+A line which is not a number is reported by an InvalidInputError with the
+stripped line, when "take" reaches it; the end of the file is reported like
+an empty line.
+
+The numbers can also be read from a binary file (see BinaryNumberReader),
+which is memory-mapped and needs no conversion of text. The file consists
+of 64-bit words in little-endian byte order. Every word is a signed number,
+except for the word ESCAPE, which is followed by a word with the number of
+words n of a larger number and by the n words of the number itself, the
+least significant word first. Only the most significant word of the larger
+number is signed.
+
+'''
+import os
+import mmap
+import Queue
+from functools import partial
+from struct import pack, unpack_from
+try:
+    import threading
+except ImportError:
+    threading = None
+
+from chef.errors.runtime import InvalidInputError
+
+# the number of bytes which are read at once
+BLOCK_SIZE = 1 << 16
+
+# the number of blocks which the background thread reads ahead
+READ_AHEAD = 8
+
+# the number of words which BinaryNumberReader converts at once
+WORD_BLOCK_SIZE = 1 << 13
+
+# the word which introduces a number that does not fit into a single word
+ESCAPE = -1 << 63
+
+_WORD_MASK = (1 << 64) - 1
+
+
+class NumberReader(object):
+    '''Read numbers, one per line, from the file `f`. If `background` is
+    true, the blocks are read by a daemon thread (see READ_AHEAD).
+
+    '''
+    def __init__(self, f, block_size=BLOCK_SIZE, background=False):
+        self.file = f
+        self.block_size = block_size
+        # reads the next block; os.read returns what is available instead of
+        # waiting for a whole block like the read method of a file
+        try:
+            self._read_block = partial(os.read, f.fileno(), block_size)
+        except (AttributeError, EnvironmentError, ValueError):
+            # e.g. StringIO
+            if hasattr(f, 'readline'):
+                self._read_block = f.readline
+            else:
+                self._read_block = partial(f.read, block_size)
+        # returns the next converted number of the current block
+        self._next_number = iter([]).next
+        # the invalid line which is reported after the numbers, and the
+        # lines after it which have not been converted yet
+        self._invalid = None
+        self._lines = []
+        # the incomplete last line of the last block
+        self._rest = ''
+        self._eof = False
+        self._queue = None
+        if background:
+            if threading is None:
+                raise ValueError('threads are not supported')
+            self._queue = Queue.Queue(READ_AHEAD)
+            thread = threading.Thread(target=self._read_ahead)
+            thread.setDaemon(True)
+            thread.start()
+
+    def _read_lines(self):
+        # the next complete lines of the file or an empty list at its end
+        while True:
+            block = self._read_block()
+            if not block:
+                rest, self._rest = self._rest, ''
+                if rest:
+                    return [rest]
+                return []
+            lines = (self._rest + block).split('\n')
+            self._rest = lines.pop()
+            if lines:
+                return lines
+
+    def _read_ahead(self):
+        # the target of the background thread
+        try:
+            while True:
+                lines = self._read_lines()
+                self._queue.put(lines)
+                if not lines:
+                    return
+        except Exception, e:
+            self._queue.put(e)
+
+    def _next_lines(self):
+        if self._eof:
+            return []
+        if self._queue is None:
+            lines = self._read_lines()
+        else:
+            lines = self._queue.get()
+            if isinstance(lines, Exception):
+                self._eof = True
+                raise lines
+        if not lines:
+            self._eof = True
+        return lines
+
+    def _refill(self, lineno):
+        # convert the next lines, or raise the error for the invalid line
+        # which follows the numbers that have been read
+        if self._invalid is not None:
+            invalid, self._invalid = self._invalid, None
+            raise InvalidInputError(invalid, lineno)
+        lines = self._lines or self._next_lines()
+        self._lines = []
+        if not lines:
+            raise InvalidInputError('', lineno)
+        try:
+            numbers = map(int, lines)
+        except ValueError:
+            numbers = []
+            for index, line in enumerate(lines):
+                try:
+                    numbers.append(int(line))
+                except ValueError:
+                    self._invalid = line.strip()
+                    self._lines = lines[index + 1:]
+                    break
+        self._next_number = iter(numbers).next
+
+    def read_number(self, lineno=None):
+        '''Return the number on the next line. Raise an InvalidInputError
+        with the recipe line number `lineno` if the line is not a number or
+        if there are no more lines.
+
+        '''
+        while True:
+            try:
+                return self._next_number()
+            except StopIteration:
+                self._refill(lineno)
+
+
+def _join_words(words):
+    # the number of the signed words `words`, least significant word first
+    number = words[-1]
+    for word in reversed(words[:-1]):
+        number = (number << 64) | (word & _WORD_MASK)
+    return number
+
+
+class BinaryNumberReader(object):
+    '''Read numbers from the binary file `f` (see the module documentation),
+    which is memory-mapped. `block_size` is the number of words which are
+    converted at once.
+
+    '''
+    def __init__(self, f, block_size=WORD_BLOCK_SIZE):
+        self.block_size = block_size
+        try:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            self._map = ''
+        # the position of the next word which has not been converted
+        self._offset = 0
+        self._next_number = iter([]).next
+
+    def _invalid(self, lineno):
+        # the file ends in the middle of a number, or a larger number has an
+        # invalid length; the rest of the file is skipped
+        invalid = self._map[self._offset:self._offset + 16]
+        self._offset = len(self._map)
+        raise InvalidInputError(invalid.encode('hex'), lineno)
+
+    def _read_large_number(self, lineno):
+        data = self._map
+        offset = self._offset + 16
+        if offset > len(data):
+            self._invalid(lineno)
+        num_of_words = unpack_from('<q', data, offset - 8)[0]
+        end = offset + 8 * num_of_words
+        if num_of_words < 1 or end > len(data):
+            self._invalid(lineno)
+        number = _join_words(
+            unpack_from('<%dq' % num_of_words, data, offset))
+        self._offset = end
+        return number
+
+    def _refill(self, lineno):
+        data = self._map
+        count = min(self.block_size, (len(data) - self._offset) // 8)
+        if not count:
+            if self._offset < len(data):
+                self._invalid(lineno)
+            raise InvalidInputError('', lineno)
+        words = unpack_from('<%dq' % count, data, self._offset)
+        if ESCAPE not in words:
+            numbers = words
+            self._offset += 8 * count
+        elif words[0] == ESCAPE:
+            numbers = [self._read_large_number(lineno)]
+        else:
+            numbers = []
+            start = 0
+            while start < count:
+                try:
+                    index = words.index(ESCAPE, start)
+                except ValueError:
+                    index = count
+                numbers.extend(words[start:index])
+                end = index + 2
+                if end <= count:
+                    end += words[index + 1]
+                if end > count or words[index + 1] < 1:
+                    # the number is converted by the next refill
+                    start = index
+                    break
+                numbers.append(_join_words(words[index + 2:end]))
+                start = end
+            self._offset += 8 * start
+        self._next_number = iter(numbers).next
+
+    def read_number(self, lineno=None):
+        '''Return the next number. Raise an InvalidInputError with the recipe
+        line number `lineno` if there are no more numbers. Its value is empty
+        at the end of the file and the hexadecimal bytes of the invalid words
+        if the file ends in the middle of a number.
+
+        '''
+        while True:
+            try:
+                return self._next_number()
+            except StopIteration:
+                self._refill(lineno)
+
+
+def write_numbers(f, numbers):
+    '''Write the numbers of the iterable `numbers` to the binary file `f`
+    in the format which BinaryNumberReader reads.
+
+    '''
+    words = []
+    for number in numbers:
+        if ESCAPE < number <= -(ESCAPE + 1):
+            words.append(number)
+            if len(words) == WORD_BLOCK_SIZE:
+                f.write(pack('<%dq' % len(words), *words))
+                del words[:]
+            continue
+        large_number = []
+        while not ESCAPE <= number <= -(ESCAPE + 1):
+            large_number.append(number & _WORD_MASK)
+            number >>= 64
+        words.extend([ESCAPE, len(large_number) + 1])
+        f.write(pack('<%dq' % len(words), *words))
+        f.write(pack('<%dQ' % len(large_number), *large_number))
+        words = [number]
+    if words:
+        f.write(pack('<%dq' % len(words), *words))
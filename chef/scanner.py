@@ -0,0 +1,141 @@
+import re
+try:
+    from collections import namedtuple
+except ImportError:
+    from namedtuple_recipe import namedtuple
+
+# A single statement of the method. `form` is the name of the command form
+# (e.g. 'add_dry' or 'loop_end'), `verb` is the first word of the statement
+# and `arguments` is the rest of the statement including the trailing full
+# stop. `lineno` and `column` point to the first character of the statement.
+Statement = namedtuple('Statement', 'form verb arguments lineno column')
+
+# verbs which always introduce the same command form, no matter which
+# keywords follow them
+VERB_FORMS = {
+    'Take': 'take',
+    'Put': 'put',
+    'Fold': 'fold',
+    'Remove': 'remove',
+    'Combine': 'combine',
+    'Divide': 'divide',
+    'Mix': 'mix',
+    'Clean': 'clean',
+    'Pour': 'pour',
+    'Refrigerate': 'refrigerate'}
+
+# a statement starts with the first character which is neither whitespace
+# nor a full stop and ends with the next full stop; the first group is the
+# verb, the second group the arguments
+_statement_pattern = re.compile(r'([^.\s]+) ?([^.]*\.?)')
+
+
+def command_form(verb, arguments):
+    '''Return the name of the command form of the statement which starts with
+    `verb`. The form is chosen by looking at the verb and the keywords which
+    follow it; the arguments are not matched against any pattern here.
+
+    '''
+    form = VERB_FORMS.get(verb)
+    if form is not None:
+        return form
+    if verb == 'Add':
+        if arguments.startswith('dry ingredients'):
+            return 'add_dry'
+        return 'add'
+    if verb == 'Liquefy':
+        if arguments.startswith('contents of the '):
+            return 'liquefy_contents'
+        return 'liquefy_ingredient'
+    if verb == 'Stir':
+        if arguments.startswith('the ') or arguments.startswith('for '):
+            return 'stir_minutes'
+        return 'stir_ingredient'
+    # every other verb marks either the beginning or the end of a loop
+    if arguments.startswith('until ') or ' until ' in arguments:
+        return 'loop_end'
+    return 'loop_start'
+
+
+def split_statement(statement):
+    '''Split the statement into its verb and its arguments. The arguments
+    always keep the trailing full stop, so the statement "Refrigerate." has the
+    verb "Refrigerate" and the arguments ".".
+
+    '''
+    verb, separator, arguments = statement.partition(' ')
+    if not separator:
+        return verb.rstrip('.'), '.'
+    return verb, arguments
+
+
+def make_statement(text, lineno=None, column=None):
+    'Create a Statement token of a single statement which ends with a dot.'
+    verb, arguments = split_statement(text)
+    return Statement(
+        command_form(verb, arguments), verb, arguments, lineno, column)
+
+
+def scan_statements(text, lineno=1, column=1):
+    '''Walk through the text of the method once and yield a Statement token
+    for each statement in it. Statements are terminated by a full stop; the
+    last statement may miss its full stop. Whitespace between the words of a
+    statement, e.g. the line break of a statement which spans multiple lines,
+    is collapsed into single spaces.
+    `lineno` and `column` are the position of the first character of `text`.
+
+    '''
+    count = text.count
+    rfind = text.rfind
+    get_verb_form = VERB_FORMS.get
+    # tuple.__new__ skips the Python-level constructor of the namedtuple
+    new_statement = tuple.__new__
+    line_start = -column
+    last = 0
+    for m in _statement_pattern.finditer(text):
+        start = m.start()
+        newlines = count('\n', last, start)
+        if newlines:
+            lineno += newlines
+            line_start = rfind('\n', last, start)
+        last = start
+        verb, arguments = m.group(1, 2)
+        if arguments[-1:] != '.':
+            # the last statement misses its full stop
+            arguments = arguments.rstrip() + '.'
+        if '\n' in arguments or '\t' in arguments or '  ' in arguments or \
+                arguments[0] == ' ' or arguments[-2:] == ' .':
+            # collapse line breaks and other irregular whitespace
+            arguments = ' '.join(arguments[:-1].split()) + '.'
+        form = get_verb_form(verb)
+        if form is None:
+            form = command_form(verb, arguments)
+        yield new_statement(
+            Statement, (form, verb, arguments, lineno, start - line_start))
+
+
+def scan_lines(lines, lineno=1):
+    '''Like scan_statements, but read the method from the iterable `lines`
+    (e.g. a file) and yield each statement as soon as its full stop has been
+    read. `lineno` is the line number of the first line.
+
+    '''
+    # the text which has been read but not scanned yet, i.e. the beginning of
+    # a statement which spans multiple lines, and its position
+    pending = ''
+    pending_lineno, pending_column = lineno, 1
+    for line in lines:
+        if not pending:
+            pending_lineno, pending_column = lineno, 1
+        end = line.rfind('.')
+        if end == -1:
+            pending += line
+        else:
+            for statement in scan_statements(
+                    pending + line[:end + 1], pending_lineno, pending_column):
+                yield statement
+            pending = line[end + 1:]
+            pending_lineno, pending_column = lineno, end + 2
+        lineno += 1
+    for statement in scan_statements(pending, pending_lineno, pending_column):
+        yield statement
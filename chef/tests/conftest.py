@@ -58,6 +58,21 @@ the comment
 not-a-method''')
 
 
+def pytest_funcarg__loop_recipe(request):
+    return StringIO('''A simple loop.
+
+Ingredients.
+3 number
+
+Method.
+Count the number.
+Put number into mixing bowl.
+Decrement the number until counted.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.''')
+
+
 def pytest_funcarg__multiple_instr(request):
     return StringIO('''A recipe with more than one instruction.
 
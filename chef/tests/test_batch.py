@@ -0,0 +1,105 @@
+from __future__ import with_statement
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import mock
+
+import chef.batch as chef_batch
+from chef.parser import parse_recipe
+
+VALID_RECIPE = '''Valid.
+
+Ingredients.
+3 number
+
+Method.
+Count the number.
+Put number into mixing bowl.
+Count the number until counted.
+
+Serves 1.
+'''
+
+INVALID_RECIPE = '''Invalid.
+
+Method.
+Count the number.
+'''
+
+
+def pytest_funcarg__recipe_dir(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    tmpdir.join('a.chef').write(VALID_RECIPE)
+    tmpdir.join('b.chef').write(INVALID_RECIPE)
+    tmpdir.ensure('sub', dir=True).join('c.chef').write(VALID_RECIPE)
+    tmpdir.join('notes.txt').write('not a recipe')
+    return tmpdir
+
+
+def test_find_recipe_files(recipe_dir):
+    filenames = list(chef_batch.find_recipe_files(
+        [str(recipe_dir), 'missing.chef']))
+    assert filenames == [
+        str(recipe_dir.join('a.chef')),
+        str(recipe_dir.join('b.chef')),
+        str(recipe_dir.join('sub', 'c.chef')),
+        'missing.chef']
+
+
+class TestParseFiles(object):
+    params = {
+        'test_results': [{'processes': 1}, {'processes': 2}]}
+
+    def test_results(self, recipe_dir, processes):
+        filenames = list(chef_batch.find_recipe_files([str(recipe_dir)]))
+        filenames.append(str(recipe_dir.join('missing.chef')))
+        results = chef_batch.parse_files(filenames, processes, chunksize=1)
+        results = dict((result.filename, result) for result in results)
+        assert sorted(results) == sorted(filenames)
+        valid = results[str(recipe_dir.join('a.chef'))]
+        assert valid.error is None
+        assert valid.recipe == parse_recipe(StringIO(VALID_RECIPE))
+        invalid = results[str(recipe_dir.join('b.chef'))]
+        assert invalid.recipe is None
+        assert invalid.lineno == 4
+        missing = results[str(recipe_dir.join('missing.chef'))]
+        assert missing.recipe is None
+        assert 'No such file' in missing.error
+
+    def test_other_errors(self, recipe_dir):
+        filenames = [str(recipe_dir.join('a.chef'))] * 2
+        with mock.patch.object(
+                chef_batch, 'parse_recipe', side_effect=[
+                    ValueError("invalid measure: 'spoons'"),
+                    parse_recipe(StringIO(VALID_RECIPE))]):
+            results = list(chef_batch.parse_files(filenames, 1))
+        assert results[0] == chef_batch.ParseResult(
+            filenames[0], None, "ValueError: invalid measure: 'spoons'", None)
+        assert results[1].error is None
+
+    def test_without_recipes(self, recipe_dir):
+        filename = str(recipe_dir.join('a.chef'))
+        results = list(chef_batch.parse_files([filename], keep_recipes=False))
+        assert results == [
+            chef_batch.ParseResult(filename, None, None, None)]
+
+
+def test_main(recipe_dir):
+    stdout = StringIO()
+    status = chef_batch.main(['-q', '-j', '1', str(recipe_dir)], stdout)
+    assert status == 1
+    assert stdout.getvalue().startswith(
+        '%s:4: ' % recipe_dir.join('b.chef'))
+    assert stdout.getvalue().count('\n') == 1
+
+
+def test_main_default_stdout(recipe_dir):
+    # sys.stdout is looked up when main is called, not when it is defined
+    with mock.patch('sys.stdout', StringIO()) as stdout:
+        status = chef_batch.main(['-q', '-j', '1', str(recipe_dir)])
+    assert status == 1
+    assert stdout.getvalue().startswith(
+        '%s:4: ' % recipe_dir.join('b.chef'))
@@ -0,0 +1,104 @@
+from __future__ import with_statement
+
+import os
+import stat
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import mock
+
+import chef.cache as chef_cache
+from chef.parser import parse_recipe, parse_recipe_string
+
+RECIPE = '''Cached.
+
+Ingredients.
+3 number
+2 cups flour
+
+Cooking time: 10 minutes.
+
+Method.
+Count the number.
+Put number into mixing bowl.
+Count the number until counted.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.
+'''
+
+
+def pytest_funcarg__recipe_file(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    recipe_file = tmpdir.join('cached.chef')
+    recipe_file.write(RECIPE)
+    return recipe_file
+
+
+def parse_cached(recipe_file):
+    with open(str(recipe_file)) as f:
+        return chef_cache.parse_recipe_cached(f)
+
+
+def test_cache_filename():
+    assert chef_cache.cache_filename('/a/b/hello.chef') == '/a/b/hello.chefc'
+
+
+def test_dump_and_load():
+    recipe = parse_recipe(StringIO(RECIPE))
+    assert chef_cache.load_recipe(chef_cache.dump_recipe(recipe)) == recipe
+
+
+class TestParseRecipeCached(object):
+    def test_writes_cache(self, recipe_file):
+        recipe = parse_cached(recipe_file)
+        assert recipe == parse_recipe(StringIO(RECIPE))
+        assert recipe_file.new(ext='chefc').check()
+
+    def test_cache_mode(self, recipe_file):
+        umask = os.umask(022)
+        try:
+            parse_cached(recipe_file)
+        finally:
+            os.umask(umask)
+        cache_file = recipe_file.new(ext='chefc')
+        assert stat.S_IMODE(cache_file.stat().mode) == 0644
+
+    def test_cache_mode_keeps_umask(self, recipe_file):
+        # the umask is shared by all threads, e.g. those of the daemon
+        with mock.patch('os.umask') as umask:
+            parse_cached(recipe_file)
+        assert not umask.called
+        assert recipe_file.new(ext='chefc').check()
+
+    def test_reads_cache(self, recipe_file):
+        recipe = parse_cached(recipe_file)
+        with mock.patch.object(chef_cache, 'parse_recipe_string') as parse:
+            assert parse_cached(recipe_file) == recipe
+        assert not parse.called
+
+    def test_stale(self, recipe_file):
+        parse_cached(recipe_file)
+        recipe_file.write(RECIPE.replace('3 number', '4 number'))
+        recipe = parse_cached(recipe_file)
+        assert recipe.ingredients['number'].properties.value == 4
+
+    def test_other_parser_version(self, recipe_file, monkeypatch):
+        parse_cached(recipe_file)
+        monkeypatch.setattr(
+            chef_cache, 'PARSER_VERSION', chef_cache.PARSER_VERSION + 1)
+        with mock.patch.object(
+                chef_cache, 'parse_recipe_string',
+                side_effect=parse_recipe_string) as parse:
+            parse_cached(recipe_file)
+        assert parse.called
+
+    def test_corrupt(self, recipe_file):
+        expected = parse_cached(recipe_file)
+        cache_file = recipe_file.new(ext='chefc')
+        for content in ['', 'garbage', chef_cache.MAGIC + 'garbage',
+                cache_file.read('rb')[:-10]]:
+            cache_file.write(content, 'wb')
+            assert parse_cached(recipe_file) == expected
@@ -0,0 +1,200 @@
+from __future__ import with_statement
+
+import pytest
+
+from chef.datastructures import Ingredient, IngredientProperties, Ingredients
+from chef.parser import parse_recipe_string
+from chef.interpreter import Interpreter, eval_instructions
+from chef.errors.runtime import UndefinedIngredientError,\
+        NonExistingContainerError, EmptyContainerError, InvalidContainerIDError
+import chef.compiler as chef_compiler
+
+RECIPE = '''Compiled.
+
+Ingredients.
+3 number
+2 counter
+1 one
+
+Method.
+%s
+'''
+
+
+def parse(method):
+    return parse_recipe_string(RECIPE % method)
+
+
+def run_recipe(recipe):
+    interpreter = Interpreter(Ingredients(recipe.ingredients))
+    chef_compiler.run(chef_compiler.compile_recipe(recipe), interpreter)
+    return interpreter
+
+
+def test_mixing_bowl_index():
+    assert chef_compiler.mixing_bowl_index(None) == 0
+    assert chef_compiler.mixing_bowl_index(3) == 2
+    assert chef_compiler.mixing_bowl_index(0) is None
+
+
+def test_jump_targets():
+    recipe = parse(
+        'Count the number.\n'
+        'Put number into mixing bowl.\n'
+        'Count the number until counted.\n'
+        'Clean mixing bowl.')
+    code = chef_compiler.compile_recipe(recipe).code
+    assert [(entry[0], entry[1]) for entry in code] == [
+        (chef_compiler.JUMP_IF_ZERO, 3),
+        (chef_compiler.PUT, 0),
+        (chef_compiler.DECREMENT_AND_JUMP, 0),
+        (chef_compiler.CLEAN, 0)]
+
+
+def test_ingredient_slots():
+    recipe = parse(
+        'Put counter into mixing bowl.\n'
+        'Fold number into mixing bowl.')
+    assert chef_compiler.ingredient_slots(
+        recipe.ingredients, recipe.instructions) == {
+            'number': 0, 'counter': 1, 'one': 2}
+    compiled = chef_compiler.compile_recipe(recipe)
+    assert compiled.ingredient_names == ['number', 'counter', 'one']
+    assert [entry[2] for entry in compiled.code] == [1, 0]
+
+
+def test_undefined_ingredient_before_execution():
+    recipe = parse(
+        'Put number into mixing bowl.\n'
+        'Count the number.\n'
+        'Count the sugar until counted.')
+    with pytest.raises(UndefinedIngredientError) as e:
+        chef_compiler.compile_recipe(recipe)
+    assert e.value.ingredient == 'sugar'
+    assert e.value.lineno == 11
+
+
+class TestGlobalIngredientsView(object):
+    def setup_method(self, method):
+        self.ingredients = [
+            Ingredient('number', IngredientProperties(3, False, False)),
+            Ingredient('one', IngredientProperties(1, False, False))]
+        self.view = chef_compiler.GlobalIngredientsView(
+            {'number': 0, 'one': 1}, self.ingredients)
+
+    def test_read(self):
+        assert self.view['one'] == self.ingredients[1]
+        assert 'number' in self.view
+        assert 'sugar' not in self.view
+        assert len(self.view) == 2
+        assert self.view == Ingredients(self.ingredients)
+        with pytest.raises(KeyError):
+            self.view['sugar']
+
+    def test_write(self):
+        self.view['number'] = IngredientProperties(4, True, False)
+        assert self.ingredients[0] == Ingredient(
+            'number', IngredientProperties(4, True, False))
+        with pytest.raises(KeyError):
+            self.view['sugar'] = IngredientProperties(4, True, False)
+
+
+class TestRun(object):
+    params = {
+        'test_same_as_eval_instructions': [
+            {'method':
+                'Count the number.\n'
+                'Put number into mixing bowl.\n'
+                'Count the number until counted.'},
+            {'method':
+                'Count the number.\n'
+                'Knead the counter.\n'
+                'Put number into mixing bowl.\n'
+                'Add one to mixing bowl.\n'
+                'Knead the counter until kneaded.\n'
+                'Put one into 2nd mixing bowl.\n'
+                'Combine number into 2nd mixing bowl.\n'
+                'Count the number until counted.'},
+            {'method':
+                'Put counter into mixing bowl.\n'
+                'Remove one from mixing bowl.\n'
+                'Divide counter into mixing bowl.\n'
+                'Stir for 2 minutes.\n'
+                'Pour contents of the mixing bowl into the baking dish.\n'
+                'Clean mixing bowl.'}]}
+
+    def test_same_as_eval_instructions(self, method):
+        recipe = parse(method)
+        expected = Interpreter(Ingredients(recipe.ingredients))
+        eval_instructions(recipe.instructions, expected)
+        interpreter = run_recipe(recipe)
+        assert interpreter.global_ingredients == expected.global_ingredients
+        assert interpreter.mixing_bowls == expected.mixing_bowls
+        assert interpreter.baking_dishes == expected.baking_dishes
+
+    def test_add_dry(self):
+        recipe = parse_recipe_string(
+            'Dry.\n\n'
+            'Ingredients.\n2 g flour\n3 kg sugar\n1 water\n\n'
+            'Method.\n'
+            'Knead the flour.\n'
+            'Add dry ingredients.\n'
+            'Knead the flour until kneaded.\n'
+            'Fold sugar into mixing bowl.\n'
+            'Liquefy flour.\n'
+            'Add dry ingredients to 1st mixing bowl.\n')
+        expected = Interpreter(Ingredients(recipe.ingredients))
+        eval_instructions(recipe.instructions, expected)
+        interpreter = run_recipe(recipe)
+        assert [i.properties.value for i in interpreter.first_mixing_bowl] \
+            == [5, 4]
+        assert interpreter.mixing_bowls == expected.mixing_bowls
+        assert interpreter.dry_sum == expected.dry_sum == 4
+
+    def test_deep_nesting(self):
+        depth = 2000
+        method = (
+            'Count the number.\n' * depth +
+            'Put one into mixing bowl.\n' +
+            'Count the number until counted.\n' +
+            'Count until counted.\n' * (depth - 1))
+        interpreter = run_recipe(parse(method))
+        # the innermost loop empties `number`, so all outer loops end after
+        # their first iteration
+        assert interpreter.first_mixing_bowl == Ingredients([
+            Ingredient('one', IngredientProperties(1, False, False))] * 3)
+
+    def test_new_mixing_bowl(self):
+        interpreter = run_recipe(parse('Put one into 2nd mixing bowl.'))
+        assert interpreter.mixing_bowls == [
+            Ingredients(),
+            Ingredients([
+                Ingredient('one', IngredientProperties(1, False, False))])]
+
+    def test_undefined_ingredient(self):
+        with pytest.raises(UndefinedIngredientError) as e:
+            run_recipe(parse('Put sugar into mixing bowl.'))
+        assert e.value.lineno == 9
+        with pytest.raises(UndefinedIngredientError):
+            run_recipe(parse('Count the sugar.\nCount until counted.'))
+
+    def test_global_ingredients_view(self):
+        recipe = parse(
+            'Count the number.\n'
+            'Count the number until counted.\n'
+            'Liquefy one.')
+        interpreter = run_recipe(recipe)
+        assert interpreter.global_ingredients['number'] == Ingredient(
+            'number', IngredientProperties(0, False, False))
+        assert interpreter.global_ingredients['one'] == Ingredient(
+            'one', IngredientProperties(1, False, True))
+
+    def test_empty_mixing_bowl(self):
+        with pytest.raises(EmptyContainerError):
+            run_recipe(parse('Add one to mixing bowl.'))
+
+    def test_invalid_mixing_bowl(self):
+        with pytest.raises(NonExistingContainerError):
+            run_recipe(parse('Add one to 3rd mixing bowl.'))
+        with pytest.raises(InvalidContainerIDError):
+            run_recipe(parse('Put one into 3rd mixing bowl.'))
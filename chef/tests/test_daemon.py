@@ -0,0 +1,168 @@
+from __future__ import with_statement
+
+import os
+import stat
+import threading
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import mock
+import pytest
+
+from chef.daemon import serve
+from chef.client import run_client, default_socket_path, DaemonError
+from chef.refrigerator import write_numbers
+
+TAKE_RECIPE = '''Cold leftovers.
+
+Ingredients.
+number
+
+Method.
+Take number from refrigerator.
+Put number into mixing bowl.
+Take number from refrigerator.
+Add number to mixing bowl.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.'''
+
+
+def pytest_funcarg__daemon(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    daemon = serve(str(tmpdir.join('chef.sock')))
+    thread = threading.Thread(
+        target=daemon.serve_forever, kwargs={'poll_interval': 0.01})
+    thread.setDaemon(True)
+    thread.start()
+
+    def shutdown():
+        daemon.shutdown()
+        daemon.server_close()
+    request.addfinalizer(shutdown)
+    return daemon
+
+
+def run(daemon, argv, stdin=''):
+    stdout = StringIO()
+    stderr = StringIO()
+    status = run_client(
+        argv, daemon.server_address, StringIO(stdin), stdout, stderr)
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+class TestDaemon(object):
+    def test_run(self, daemon, tmpdir):
+        recipe_file = tmpdir.join('take.chef')
+        recipe_file.write(TAKE_RECIPE)
+        for engine in ['bytecode', 'python', 'bytecode']:
+            assert run(
+                daemon, ['-f', str(recipe_file), '--engine', engine],
+                '20\n3\n') == (0, '23', '')
+        assert len(daemon.cache) == 2
+
+    def test_concurrent_requests(self, daemon, tmpdir):
+        # every request is executed in its own thread of the daemon
+        recipe_file = tmpdir.join('take.chef')
+        recipe_file.write(TAKE_RECIPE)
+        results = {}
+
+        def request(k):
+            results[k] = run(
+                daemon, ['-f', str(recipe_file)], '%d\n%d\n' % (k, k))
+        threads = [
+            threading.Thread(target=request, args=(k,)) for k in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == dict([(k, (0, str(2 * k), '')) for k in xrange(8)])
+
+    def test_relative_paths(self, daemon, tmpdir):
+        tmpdir.join('take.chef').write(TAKE_RECIPE)
+        with tmpdir.join('input').open('wb') as f:
+            write_numbers(f, [1 << 64, 1])
+        with tmpdir.as_cwd():
+            status = run(
+                daemon, ['-f', 'take.chef', '-i', 'input', '-o', 'output'])
+        assert status == (0, '', '')
+        assert tmpdir.join('output').read() == str((1 << 64) + 1)
+
+    def test_errors(self, daemon, tmpdir):
+        recipe_file = tmpdir.join('take.chef')
+        recipe_file.write(TAKE_RECIPE)
+        assert run(daemon, ['-f', str(recipe_file)], 'x\n') == (
+            1, '', "invalid input: 'x' (line 7)\n")
+        status, stdout, stderr = run(
+            daemon, ['-f', str(tmpdir.join('missing.chef'))])
+        assert status == 1
+        assert 'No such file' in stderr
+        assert run(daemon, ['-p', '-f', str(recipe_file)]) == (
+            1, '', 'chef: the daemon only executes recipe files\n')
+
+    def test_invalid_arguments(self, daemon):
+        # the message of argparse is sent to the client instead of being
+        # written to the STDERR of the daemon
+        with mock.patch('sys.stderr', StringIO()) as daemon_stderr:
+            status, stdout, stderr = run(daemon, ['--engine', 'spam'])
+        assert (status, stdout) == (2, '')
+        assert stderr.startswith('usage: chef ')
+        assert "chef: error: argument --engine: invalid choice: 'spam'" in (
+            stderr)
+        assert daemon_stderr.getvalue() == ''
+        status, stdout, stderr = run(daemon, ['--help'])
+        assert (status, stdout) == (0, '')
+        assert 'show this help message and exit' in stderr
+
+    def test_no_daemon(self, tmpdir):
+        stderr = StringIO()
+        status = run_client(
+            ['-f', 'take.chef'], str(tmpdir.join('missing.sock')),
+            StringIO(), StringIO(), stderr)
+        assert status == 1
+        assert stderr.getvalue().startswith('chef: no daemon listens on')
+
+    def test_no_daemon_default_stderr(self, tmpdir):
+        with mock.patch('sys.stderr', StringIO()) as stderr:
+            status = run_client(
+                ['-f', 'take.chef'], str(tmpdir.join('missing.sock')))
+        assert status == 1
+        assert stderr.getvalue().startswith('chef: no daemon listens on')
+
+
+class TestSocketPath(object):
+    def test_runtime_directory(self, tmpdir):
+        with mock.patch.dict('os.environ', {'XDG_RUNTIME_DIR': str(tmpdir)}):
+            assert default_socket_path() == str(tmpdir.join('chef.sock'))
+
+    def test_private_directory(self, tmpdir):
+        with mock.patch.dict('os.environ', {'XDG_RUNTIME_DIR': ''}):
+            with mock.patch('tempfile.tempdir', str(tmpdir)):
+                path = default_socket_path()
+                daemon = serve()
+                daemon.server_close()
+        directory = os.path.dirname(path)
+        assert directory == str(tmpdir.join('chef-%d' % os.getuid()))
+        assert stat.S_IMODE(os.stat(directory).st_mode) == 0700
+        os.chmod(directory, 0755)
+        with mock.patch.dict('os.environ', {'XDG_RUNTIME_DIR': ''}):
+            with mock.patch('tempfile.tempdir', str(tmpdir)):
+                with pytest.raises(DaemonError):
+                    serve()
+                stderr = StringIO()
+                assert run_client(
+                    [], None, StringIO(), StringIO(), stderr) == 1
+        assert 'not a private directory' in stderr.getvalue()
+
+    def test_socket_of_another_user(self, daemon):
+        stderr = StringIO()
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            status = run_client(
+                [], daemon.server_address, StringIO(), StringIO(), stderr)
+        assert status == 1
+        assert 'belongs to another user' in stderr.getvalue()
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            with pytest.raises(DaemonError):
+                serve(daemon.server_address)
@@ -1,8 +1,15 @@
 from __future__ import with_statement
 
+import sys
+import pickle
+import random
+import threading
+
 import pytest
 
-from chef.datastructures import Ingredient, IngredientProperties, Ingredients
+import chef.datastructures as chef_datastructures
+from chef.datastructures import Ingredient, IngredientProperties, Ingredients,\
+        CompactIngredients, unknown, Instruction, OPCODES, instruction_from_dict, instruction_to_dict
 
 
 def test_ingredient_properties():
@@ -100,3 +107,382 @@ class TestIngredientsStir(object):
             Ingredient('second', IngredientProperties(2, True, False)),
             Ingredient('third', IngredientProperties(3, True, False)),
             Ingredient('fourth', IngredientProperties(4, True, False))])
+
+
+def assert_consistent_index(ingredients):
+    names = set([ingredient.name for ingredient in ingredients])
+    for name in names:
+        first = [i for i in ingredients if i.name == name][0]
+        assert ingredients[name] == first
+    assert 'missing' not in ingredients
+
+
+def make_ingredient(name, value=1):
+    return Ingredient(name, IngredientProperties(value, False, False))
+
+
+class TestIngredientsIndex(object):
+    container = Ingredients
+
+    def setup_method(self, method):
+        self.ingredients = self.container([
+            make_ingredient('a', 1),
+            make_ingredient('b', 2),
+            make_ingredient('a', 3),
+            make_ingredient('c', 4)])
+
+    def test_pop(self):
+        assert self.ingredients.pop().name == 'c'
+        assert 'c' not in self.ingredients
+        assert self.ingredients.pop(0).name == 'a'
+        assert self.ingredients['a'].properties.value == 3
+        assert_consistent_index(self.ingredients)
+        with pytest.raises(IndexError):
+            self.container().pop()
+
+    def test_append_and_extend(self):
+        self.ingredients.append(make_ingredient('d'))
+        self.ingredients.extend([make_ingredient('b'), make_ingredient('e')])
+        self.ingredients += [make_ingredient('f')]
+        assert self.ingredients['b'].properties.value == 2
+        assert_consistent_index(self.ingredients)
+
+    def test_insert(self):
+        self.ingredients.insert(1, make_ingredient('a', 5))
+        assert self.ingredients['a'].properties.value == 1
+        self.ingredients.insert(0, make_ingredient('c', 6))
+        assert self.ingredients['c'].properties.value == 6
+        self.ingredients.insert(-100, make_ingredient('d'))
+        assert_consistent_index(self.ingredients)
+
+    def test_delete(self):
+        del self.ingredients[0]
+        assert self.ingredients['a'].properties.value == 3
+        del self.ingredients[-1]
+        assert_consistent_index(self.ingredients)
+        del self.ingredients[:]
+        assert 'a' not in self.ingredients
+        assert_consistent_index(self.ingredients)
+
+    def test_setitem_by_index(self):
+        self.ingredients[0] = make_ingredient('c', 7)
+        assert self.ingredients['a'].properties.value == 3
+        assert self.ingredients['c'].properties.value == 7
+        self.ingredients[1:3] = [make_ingredient('e')]
+        assert 'b' not in self.ingredients
+        assert_consistent_index(self.ingredients)
+
+    def test_setitem_by_name_keeps_position(self):
+        self.ingredients['a'] = IngredientProperties(8, False, False)
+        assert self.ingredients[0].properties.value == 8
+        assert self.ingredients[2].properties.value == 3
+        assert_consistent_index(self.ingredients)
+
+    def test_replace_top(self):
+        self.ingredients.replace_top(make_ingredient('a', 5))
+        assert self.ingredients['a'].properties.value == 1
+        assert 'c' not in self.ingredients
+        self.ingredients.replace_top(make_ingredient('d', 6))
+        assert self.ingredients.top == make_ingredient('d', 6)
+        assert len(self.ingredients) == 4
+        assert_consistent_index(self.ingredients)
+        with pytest.raises(IndexError):
+            self.container().replace_top(make_ingredient('a'))
+
+    def test_shuffle(self):
+        ingredients = self.container([
+            make_ingredient(name, value)
+            for value, name in enumerate('abcabcabc')])
+        expected = sorted(ingredients)
+        for i in xrange(10):
+            ingredients.shuffle()
+            assert_consistent_index(ingredients)
+        assert sorted(ingredients) == expected
+        random.shuffle(ingredients)
+        assert_consistent_index(ingredients)
+
+    def test_stir(self):
+        for n in xrange(6):
+            self.ingredients.stir(n)
+            assert_consistent_index(self.ingredients)
+
+    def test_pickle(self):
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(self.ingredients, protocol))
+            assert copy == self.ingredients
+            assert_consistent_index(copy)
+
+    def test_liquefy(self):
+        self.ingredients.liquefy()
+        assert [i.properties for i in self.ingredients] == [
+            IngredientProperties(value, False, True)
+            for value in [1, 2, 3, 4]]
+        assert_consistent_index(self.ingredients)
+
+
+def test_ingredients_reorder():
+    ingredients = Ingredients([
+        make_ingredient('a', 1),
+        make_ingredient('b', 2),
+        make_ingredient('a', 3)])
+    ingredients.reverse()
+    assert ingredients['a'].properties.value == 3
+    ingredients.sort(key=lambda i: i.properties.value)
+    ingredients.remove(make_ingredient('a', 1))
+    assert_consistent_index(ingredients)
+
+
+class TestCompactIngredientsIndex(TestIngredientsIndex):
+    container = CompactIngredients
+
+
+class TestBlockedCompactIngredientsIndex(TestCompactIngredientsIndex):
+    # split the ingredients into many small blocks
+    def setup_method(self, method):
+        self.block_size = chef_datastructures.BLOCK_SIZE
+        chef_datastructures.BLOCK_SIZE = 2
+        TestCompactIngredientsIndex.setup_method(self, method)
+
+    def teardown_method(self, method):
+        chef_datastructures.BLOCK_SIZE = self.block_size
+
+
+class TestCompactIngredients(object):
+    def test_equal_to_ingredients(self):
+        ingredients = [
+            Ingredient('a', IngredientProperties(1, True, False)),
+            Ingredient('b', IngredientProperties(2, unknown, unknown))]
+        compact = CompactIngredients(ingredients)
+        assert compact == Ingredients(ingredients)
+        assert Ingredients(ingredients) == compact
+        assert compact != CompactIngredients(ingredients[:1])
+        assert list(compact) == ingredients
+        assert compact[-1] == compact.top == ingredients[-1]
+        assert compact[:1] == ingredients[:1]
+
+    def test_values_which_do_not_fit(self):
+        compact = CompactIngredients([make_ingredient('a', 1)])
+        compact.append(make_ingredient('b', 2 ** 70))
+        compact.append(make_ingredient('c', None))
+        assert [i.properties.value for i in compact] == [1, 2 ** 70, None]
+        assert compact.pop().properties.value is None
+        del compact[:]
+        compact.append(make_ingredient('a', 3))
+        assert compact.top.properties.value == 3
+
+    def test_extend_with_compact_ingredients(self):
+        compact = CompactIngredients([make_ingredient('a', 1)])
+        other = CompactIngredients([
+            make_ingredient('b', 2), make_ingredient('a', 2 ** 70)])
+        compact.extend(other)
+        compact.extend(compact)
+        assert [i.properties.value for i in compact] == [
+            1, 2, 2 ** 70, 1, 2, 2 ** 70]
+        assert compact['b'].properties.value == 2
+        assert_consistent_index(compact)
+
+    def test_families(self):
+        # the names are only interned in the table of their family
+        mixing_bowl = CompactIngredients([
+            make_ingredient('a'), make_ingredient('b')])
+        assert CompactIngredients()._interned == []
+        second_mixing_bowl = CompactIngredients(
+            [make_ingredient('c')], family=mixing_bowl)
+        assert second_mixing_bowl._interned is mixing_bowl._interned
+        baking_dish = CompactIngredients()
+        baking_dish.extend(second_mixing_bowl)
+        assert baking_dish._interned is mixing_bowl._interned
+        other = CompactIngredients([make_ingredient('d'), make_ingredient('b')])
+        other.extend(baking_dish)
+        assert other._interned is not mixing_bowl._interned
+        assert [i.name for i in other] == ['d', 'b', 'c']
+        assert mixing_bowl._interned == ['a', 'b', 'c']
+        assert_consistent_index(other)
+
+    def test_blocks_behave_like_a_list(self):
+        block_size = chef_datastructures.BLOCK_SIZE
+        chef_datastructures.BLOCK_SIZE = 3
+        try:
+            ingredients = [
+                make_ingredient(name, value)
+                for value, name in enumerate('abcdefabcdefabcdef')]
+            compact = CompactIngredients(ingredients)
+            rng = random.Random(0)
+            for i in xrange(500):
+                n = rng.randrange(-1, len(ingredients) + 2)
+                compact.stir(n)
+                ingredient = ingredients.pop()
+                if n > 0:
+                    ingredients.insert(max(len(ingredients) - n, 0), ingredient)
+                else:
+                    ingredients.append(ingredient)
+                if i % 50 == 0:
+                    del compact[i % 7]
+                    del ingredients[i % 7]
+                    compact.append(make_ingredient('g', i))
+                    ingredients.append(make_ingredient('g', i))
+                assert compact == ingredients
+                assert len(compact) == len(ingredients)
+                assert_consistent_index(compact)
+            compact.extend(compact)
+            assert compact == ingredients + ingredients
+            assert compact[-20:3:-5] == (ingredients * 2)[-20:3:-5]
+        finally:
+            chef_datastructures.BLOCK_SIZE = block_size
+
+    def test_extend_shares_blocks(self):
+        block_size = chef_datastructures.BLOCK_SIZE
+        chef_datastructures.BLOCK_SIZE = 4
+        try:
+            mixing_bowl = CompactIngredients([
+                make_ingredient('a', i) for i in xrange(10)])
+            baking_dish = CompactIngredients()
+            baking_dish.extend(mixing_bowl)
+            assert baking_dish._states[0] is mixing_bowl._states[0]
+            assert baking_dish._states[-1] is not mixing_bowl._states[-1]
+            baking_dish[0] = make_ingredient('b', 20)
+            assert mixing_bowl[0] == make_ingredient('a', 0)
+            assert baking_dish[0] == make_ingredient('b', 20)
+            assert_consistent_index(mixing_bowl)
+            assert_consistent_index(baking_dish)
+        finally:
+            chef_datastructures.BLOCK_SIZE = block_size
+
+    def test_copy_on_write_after_storing_values_in_lists(self):
+        block_size = chef_datastructures.BLOCK_SIZE
+        chef_datastructures.BLOCK_SIZE = 4
+        try:
+            ingredients = [make_ingredient('a', i) for i in xrange(10)]
+            mixing_bowl = CompactIngredients(ingredients)
+            baking_dish = CompactIngredients()
+            baking_dish.extend(mixing_bowl)
+            # a value which does not fit into the arrays
+            big = make_ingredient('big', 2 ** 80)
+            mixing_bowl.append(big)
+            mixing_bowl.stir(10)
+            assert list(mixing_bowl) == [big] + ingredients
+            assert list(baking_dish) == ingredients
+            baking_dish[0] = make_ingredient('b', 20)
+            assert mixing_bowl[1] == ingredients[0]
+            assert_consistent_index(mixing_bowl)
+            assert_consistent_index(baking_dish)
+        finally:
+            chef_datastructures.BLOCK_SIZE = block_size
+
+    def test_copy_on_write(self):
+        block_size = chef_datastructures.BLOCK_SIZE
+        chef_datastructures.BLOCK_SIZE = 4
+        try:
+            rng = random.Random(0)
+            containers = [CompactIngredients(), CompactIngredients()]
+            expected = [[], []]
+            for i in xrange(1000):
+                k = rng.randrange(2)
+                container = containers[k]
+                ingredients = expected[k]
+                operation = rng.randrange(8)
+                # some values need the lists instead of the arrays
+                value = i if rng.randrange(100) else 2 ** 70 + i
+                ingredient = make_ingredient(rng.choice('abc'), value)
+                if operation == 0 or not ingredients:
+                    for j in xrange(rng.randrange(1, 10)):
+                        container.append(ingredient)
+                        ingredients.append(ingredient)
+                elif operation == 1:
+                    if len(expected[1 - k]) > 200:
+                        del containers[1 - k][:]
+                        del expected[1 - k][:]
+                    containers[1 - k].extend(container)
+                    expected[1 - k].extend(ingredients)
+                elif operation == 2:
+                    container.pop()
+                    ingredients.pop()
+                elif operation == 3:
+                    index = rng.randrange(len(ingredients))
+                    container[index] = ingredient
+                    ingredients[index] = ingredient
+                elif operation == 4:
+                    index = rng.randrange(len(ingredients))
+                    del container[index]
+                    del ingredients[index]
+                elif operation == 5:
+                    n = rng.randrange(1, len(ingredients) + 1)
+                    container.stir(n)
+                    ingredients.insert(
+                        max(len(ingredients) - n - 1, 0), ingredients.pop())
+                elif operation == 6:
+                    container.replace_top(ingredient)
+                    ingredients[-1] = ingredient
+                elif rng.randrange(10) == 0:
+                    del container[:]
+                    del ingredients[:]
+                assert container == ingredients
+                assert containers[1 - k] == expected[1 - k]
+            for container in containers:
+                assert_consistent_index(container)
+        finally:
+            chef_datastructures.BLOCK_SIZE = block_size
+
+    def test_memory(self):
+        # ingredients with distinct values, e.g. the results of arithmetic
+        ingredients = [make_ingredient('a', i) for i in xrange(1000, 11000)]
+        compact = CompactIngredients(ingredients)
+        size = sys.getsizeof(compact)
+        list_size = sys.getsizeof(ingredients) + sum([
+            sys.getsizeof(i) + sys.getsizeof(i.properties) +
+            sys.getsizeof(i.properties.value) for i in ingredients])
+        assert size * 5 <= list_size
+
+
+    def test_concurrent_interning(self):
+        # the daemon executes requests in several threads, which intern the
+        # names of their ingredients at the same time
+        def build(prefix, results):
+            results.append(CompactIngredients([
+                make_ingredient('%s %d' % (prefix, i), i)
+                for i in xrange(2000)]))
+        results = []
+        threads = [
+            threading.Thread(target=build, args=('thread %d' % k, results))
+            for k in xrange(4)]
+        check_interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setcheckinterval(check_interval)
+        assert len(results) == 4
+        for compact in results:
+            prefix = compact[0].name.rsplit(' ', 1)[0]
+            assert [i.name for i in compact] == [
+                '%s %d' % (prefix, i) for i in xrange(2000)]
+
+class TestInstruction(object):
+    def test_operands(self):
+        instruction = instruction_from_dict({
+            'command': 'stir_minutes',
+            'mixing_bowl_id': 2,
+            'minutes': 3,
+            'lineno': 7})
+        assert instruction == Instruction(OPCODES['stir_minutes'], (3, 2, 7))
+        assert instruction.command == 'stir_minutes'
+        assert instruction.lineno == 7
+
+    def test_no_instance_dict(self):
+        instruction = Instruction(OPCODES['mix'], (None, 4))
+        with pytest.raises(AttributeError):
+            instruction.ingredient = 'sugar'
+
+    def test_dict_round_trip(self):
+        d = {
+            'command': 'loop_end',
+            'verb': 'counted',
+            'ingredient': 'number',
+            'loop_start_offset': 3,
+            'lineno': 9}
+        instruction = instruction_from_dict(d)
+        assert instruction.jump == 3
+        assert instruction_to_dict(instruction) == d
@@ -1,19 +1,26 @@
 # coding: utf-8
 from __future__ import with_statement
 
+import random
 from operator import add
 try:
     from cStringIO import StringIO
 except ImportError:
     from StringIO import StringIO
 
+import mock
 import pytest
 
-from chef.interpreter import Interpreter
-from chef.datastructures import Ingredients, Ingredient, IngredientProperties
+from chef.interpreter import Interpreter, read_loop_body, interpret_stream,\
+        interpret_recipe, prepare_recipe, execute_recipe, main, ENGINES
+from chef.parser import parse_recipe_stream, parse_recipe_string
+from chef.refrigerator import NumberReader, write_numbers
+from chef.utils import BackgroundWriter
+from chef.datastructures import Ingredients, CompactIngredients, Ingredient,\
+        IngredientProperties, unknown, instruction_from_dict
 from chef.errors.runtime import InvalidInputError, UndefinedIngredientError,\
         InvalidContainerIDError, NonExistingContainerError,\
-        EmptyContainerError, MissingLoopEndError
+        EmptyContainerError, MissingLoopEndError, Refrigerated
 
 
 def test_interpreter_init():
@@ -99,6 +106,21 @@ class TestInterpreterTake(object):
         assert e.value.value == 'not a number!'
         assert e.value.lineno == 7
 
+    def test_refrigerator(self):
+        interpreter = Interpreter(
+            Ingredients([Ingredient('egg', IngredientProperties(
+                0, True, False))]),
+            refrigerator=NumberReader(StringIO('1\n2\nspam\n')))
+        interpreter.take('egg')
+        interpreter.take('egg')
+        assert interpreter.global_ingredients['egg'] == Ingredient(
+            'egg', IngredientProperties(2, True, False))
+        assert interpreter.dry_sum == 2
+        with pytest.raises(InvalidInputError) as e:
+            interpreter.take('egg', 3)
+        assert e.value.value == 'spam'
+        assert e.value.lineno == 3
+
 
 class TestInterpreterPut(object):
     def setup_method(self, method):
@@ -166,12 +188,19 @@ class TestInterpreterFold(object):
         assert e.value.id == 1
 
     def test_working(self):
-        interpreter = Interpreter({'yeast': 47}, [Ingredients([23, 42, 1337])])
-        assert interpreter.mixing_bowls == [Ingredients([23, 42, 1337])]
-        assert interpreter.global_ingredients == {'yeast': 47}
+        a, b, c = [
+            Ingredient(name, IngredientProperties(value, True, False))
+            for name, value in [('a', 23), ('b', 42), ('c', 1337)]]
+        yeast = Ingredient('yeast', IngredientProperties(47, False, False))
+        interpreter = Interpreter(
+            Ingredients([yeast]), [Ingredients([a, b, c])])
+        assert interpreter.mixing_bowls == [Ingredients([a, b, c])]
+        assert interpreter.global_ingredients == Ingredients([yeast])
         interpreter.fold('yeast')
-        assert interpreter.mixing_bowls == [Ingredients([23, 42])]
-        assert interpreter.global_ingredients == {'yeast': 1337}
+        assert interpreter.mixing_bowls == [Ingredients([a, b])]
+        assert interpreter.global_ingredients == Ingredients([
+            Ingredient('yeast', c.properties)])
+        assert interpreter.dry_sum == 1337
 
 
 def test_interpreter_calculate_with_empty_mixing_bowl():
@@ -213,6 +242,59 @@ def test_interpreter_divide(interpreter):
         'meat', IngredientProperties(6, True, False))
 
 
+def test_interpreter_calculate_replaces_top(interpreter):
+    interpreter.put('meat')
+    interpreter.put('meat')
+    interpreter.add('meat')
+    assert interpreter.first_mixing_bowl[-2:] == [
+        Ingredient('meat', IngredientProperties(50, True, False)),
+        Ingredient('meat', IngredientProperties(100, True, False))]
+    assert len(interpreter.first_mixing_bowl) == 5
+
+
+def test_interpreter_add_dry(interpreter):
+    interpreter.add_dry()
+    assert interpreter.first_mixing_bowl.top == Ingredient(
+        'dry ingredients', IngredientProperties(50, True, False))
+    with pytest.raises(NonExistingContainerError):
+        interpreter.add_dry(2)
+
+
+def test_interpreter_dry_sum():
+    # the running sum equals the sum of the dry ingredients after any
+    # sequence of instructions which change the global ingredients
+    states = [(True, False), (False, True), (False, False), (unknown, unknown)]
+    for seed in xrange(20):
+        rng = random.Random(seed)
+        names = ['i%d' % i for i in xrange(rng.randrange(1, 6))]
+        interpreter = Interpreter(Ingredients([
+            Ingredient(rng.choice(names), IngredientProperties(
+                rng.randrange(-5, 50), *rng.choice(states)))
+            for i in xrange(rng.randrange(1, 8))]))
+        names = [ingredient.name for ingredient in
+            interpreter.global_ingredients]
+        for i in xrange(100):
+            name = rng.choice(names)
+            operation = rng.randrange(5)
+            if operation == 0:
+                value = rng.randrange(-100, 100)
+                interpreter.take(name, stdin=StringIO('%d\n' % value))
+            elif operation == 1:
+                interpreter.put(name)
+                interpreter.fold(rng.choice(names))
+            elif operation == 2:
+                interpreter.loop_end(name)
+            elif operation == 3:
+                interpreter.liquefy_ingredient(name)
+            else:
+                interpreter.add_dry()
+                interpreter.fold(name)
+            assert interpreter.dry_sum == sum([
+                ingredient.properties.value
+                for ingredient in interpreter.global_ingredients
+                if ingredient.properties.is_dry is True])
+
+
 def test_interpreter_liquefy_ingredient(interpreter):
     assert interpreter.global_ingredients == Ingredients([
         Ingredient('meat', IngredientProperties(50, True, False))])
@@ -294,7 +376,9 @@ class TestInterpreterLoopStart(object):
                 'ingredient': 'number',
                 'verb': 'counted',
                 'lineno': 9}]
-        interpreter.loop_start('Count', 'number', following_instructions, 7)
+        interpreter.loop_start(
+            'Count', 'number',
+            map(instruction_from_dict, following_instructions), 7)
         assert interpreter.first_mixing_bowl == Ingredients([
             Ingredient('number', IngredientProperties(1, True, False))])
 
@@ -311,15 +395,56 @@ class TestInterpreterLoopStart(object):
                 'verb': 'counted',
                 'lineno': 9}]
         self.interpreter.loop_start(
-            'Count', 'number', following_instructions, 7)
+            'Count', 'number',
+            map(instruction_from_dict, following_instructions), 7)
         assert self.interpreter.first_mixing_bowl == Ingredients([
             Ingredient('number', IngredientProperties(3, True, False)),
             Ingredient('number', IngredientProperties(2, True, False)),
             Ingredient('number', IngredientProperties(1, True, False))])
 
-    @pytest.mark.xfail
     def test_nested_loops(self):
-        assert False
+        interpreter = Interpreter(Ingredients([
+            Ingredient('number', IngredientProperties(2, True, False)),
+            Ingredient('counter', IngredientProperties(2, True, False)),
+            Ingredient('two', IngredientProperties(2, True, False))]))
+        body = [
+            {
+                'command': 'loop_start',
+                'ingredient': 'counter',
+                'verb': 'Knead',
+                'loop_end_offset': 2,
+                'lineno': 8},
+            {
+                'command': 'put',
+                'ingredient': 'number',
+                'mixing_bowl_id': None,
+                'lineno': 9},
+            {
+                'command': 'loop_end',
+                'ingredient': 'counter',
+                'verb': 'kneaded',
+                'loop_start_offset': 2,
+                'lineno': 10},
+            {
+                'command': 'put',
+                'ingredient': 'two',
+                'mixing_bowl_id': None,
+                'lineno': 11},
+            {
+                'command': 'loop_end',
+                'ingredient': 'number',
+                'verb': 'counted',
+                'loop_start_offset': 5,
+                'lineno': 12}]
+        interpreter.loop_start(
+            'Count', 'number', map(instruction_from_dict, body), 7)
+        # the counter is zero in the second iteration of the outer loop, so
+        # the inner loop is skipped
+        assert interpreter.first_mixing_bowl == Ingredients([
+            Ingredient('number', IngredientProperties(2, True, False)),
+            Ingredient('number', IngredientProperties(2, True, False)),
+            Ingredient('two', IngredientProperties(2, True, False)),
+            Ingredient('two', IngredientProperties(2, True, False))])
 
     def test_missing_loop_end(self):
         following_instructions = [
@@ -335,7 +460,8 @@ class TestInterpreterLoopStart(object):
                 'lineno': 9}]
         with pytest.raises(MissingLoopEndError):
             self.interpreter.loop_start(
-                'Count', 'number', following_instructions, 7)
+                'Count', 'number',
+                map(instruction_from_dict, following_instructions), 7)
 
 
 def test_interpreter_loop_end(interpreter):
@@ -344,6 +470,15 @@ def test_interpreter_loop_end(interpreter):
         Ingredient('meat', IngredientProperties(49, True, False))])
 
 
+def test_interpreter_refrigerate(interpreter):
+    with pytest.raises(Refrigerated) as e:
+        interpreter.refrigerate()
+    assert e.value.hours is None
+    with pytest.raises(Refrigerated) as e:
+        interpreter.refrigerate(2, 5)
+    assert e.value.hours == 2
+
+
 def test_interpreter_serves():
     interpreter = Interpreter()
     interpreter.baking_dishes = [Ingredients([
@@ -355,3 +490,196 @@ def test_interpreter_serves():
     stdout.seek(0)
     output = stdout.read()
     assert output == '훘23a'
+    assert interpreter.first_baking_dish == Ingredients()
+
+
+def test_interpreter_serves_in_chunks():
+    interpreter = Interpreter()
+    interpreter.baking_dishes = [
+        CompactIngredients([
+            Ingredient('letter', IngredientProperties(value, False, True))
+            for value in xrange(97, 102)]),
+        CompactIngredients([
+            Ingredient('number', IngredientProperties(7, False, False))])]
+    stdout = mock.Mock()
+    with mock.patch('chef.interpreter.SERVES_CHUNK_SIZE', 2):
+        interpreter.serves(2, stdout)
+    assert [call[0][0] for call in stdout.write.call_args_list] == [
+        'ed', 'cb', 'a', '7']
+    assert interpreter.baking_dishes == [CompactIngredients()] * 2
+
+
+def test_interpreter_serves_in_background():
+    interpreter = Interpreter()
+    interpreter.baking_dishes = [
+        CompactIngredients([
+            Ingredient('letter', IngredientProperties(value, False, True))
+            for value in xrange(97, 102)])]
+    stdout = StringIO()
+    writer = BackgroundWriter(stdout, 1)
+    with mock.patch('chef.interpreter.SERVES_CHUNK_SIZE', 2):
+        interpreter.serves(1, writer)
+    # all chunks have been written when serves returns
+    assert stdout.getvalue() == 'edcba'
+    writer.close()
+
+
+class TestReadLoopBody(object):
+    def test_nested(self):
+        instructions = iter(map(instruction_from_dict, [
+            {'command': 'loop_start', 'verb': 'Scan', 'ingredient': 'j',
+                'loop_end_offset': 2},
+            {'command': 'put', 'ingredient': 'j', 'mixing_bowl_id': None},
+            {'command': 'loop_end', 'verb': 'scanned', 'ingredient': 'j',
+                'loop_start_offset': 2},
+            {'command': 'loop_end', 'verb': 'counted', 'ingredient': 'i',
+                'loop_start_offset': 4},
+            {'command': 'pour', 'mixing_bowl_id': None}]))
+        body = read_loop_body(
+            instruction_from_dict({
+                'command': 'loop_start', 'verb': 'Count', 'ingredient': 'i',
+                'loop_end_offset': 4}),
+            instructions)
+        assert [instr.command for instr in body] == [
+            'loop_start', 'put', 'loop_end', 'loop_end']
+        # the instructions after the loop have not been read
+        assert instructions.next().command == 'pour'
+
+
+def test_interpret_stream(loop_recipe):
+    with mock.patch.object(Interpreter, 'serves', autospec=True) as serves:
+        interpret_stream(parse_recipe_stream(loop_recipe))
+    interpreter, num_of_diners = serves.call_args[0]
+    assert num_of_diners == 1
+    assert interpreter.first_baking_dish == Ingredients([
+        Ingredient('number', IngredientProperties(3, False, False)),
+        Ingredient('number', IngredientProperties(2, False, False)),
+        Ingredient('number', IngredientProperties(1, False, False))])
+
+
+REFRIGERATED_RECIPE = '''Refrigerated.
+
+Ingredients.
+3 number
+
+Method.
+Count the number.
+Put number into mixing bowl.
+Pour contents of the mixing bowl into the baking dish.
+Clean mixing bowl.
+%s
+Decrement the number until counted.
+
+Serves 1.'''
+
+
+class TestRefrigerate(object):
+    params = {
+        'test_interpret_recipe': [
+            {'refrigerate': 'Put number into 2nd mixing bowl.',
+                'output': '123'},
+            {'refrigerate': 'Refrigerate.', 'output': ''},
+            {'refrigerate': 'Refrigerate for 1 hour.', 'output': '3'}],
+        'test_interpret_stream': [
+            {'refrigerate': 'Refrigerate.', 'output': ''},
+            {'refrigerate': 'Refrigerate for 1 hour.', 'output': '3'}]}
+
+    def test_interpret_recipe(self, refrigerate, output):
+        recipe = parse_recipe_string(REFRIGERATED_RECIPE % refrigerate)
+        for engine in ['bytecode', 'python']:
+            stdout = StringIO()
+            interpret_recipe(recipe, engine, stdout)
+            assert stdout.getvalue() == output
+
+    def test_interpret_stream(self, refrigerate, output):
+        stdout = StringIO()
+        interpret_stream(
+            parse_recipe_stream(StringIO(REFRIGERATED_RECIPE % refrigerate)),
+            stdout)
+        assert stdout.getvalue() == output
+
+
+def test_execute_prepared_recipe_twice():
+    # the ingredients of the recipe are not changed by executing it
+    recipe = parse_recipe_string(
+        REFRIGERATED_RECIPE % 'Put number into 2nd mixing bowl.')
+    for engine in ENGINES:
+        execute = prepare_recipe(recipe, engine)
+        for i in xrange(2):
+            stdout = StringIO()
+            execute_recipe(recipe, execute, stdout)
+            assert stdout.getvalue() == '123'
+
+
+UNINITIALIZED_DRY_RECIPE = '''Flour dust.
+
+Ingredients.
+g flour
+5 g sugar
+
+Method.
+Put sugar into mixing bowl.
+Add dry ingredients.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.'''
+
+
+def test_uninitialized_dry_ingredient():
+    # a dry ingredient without a value does not count towards the dry sum
+    recipe = parse_recipe_string(UNINITIALIZED_DRY_RECIPE)
+    for engine in ['bytecode', 'python']:
+        stdout = StringIO()
+        interpret_recipe(recipe, engine, stdout)
+        assert stdout.getvalue() == '55'
+    stdout = StringIO()
+    interpret_stream(
+        parse_recipe_stream(StringIO(UNINITIALIZED_DRY_RECIPE)), stdout)
+    assert stdout.getvalue() == '55'
+
+
+def test_main_output_file(loop_recipe, tmpdir):
+    recipe_file = tmpdir.join('loop.chef')
+    recipe_file.write(loop_recipe.getvalue())
+    output_file = tmpdir.join('output')
+    # main installs its own excepthook
+    with mock.patch('sys.excepthook'):
+        main(['-f', str(recipe_file), '--no-cache', '-o', str(output_file)])
+    assert output_file.read() == '123'
+
+
+def test_main_input_file(tmpdir):
+    recipe_file = tmpdir.join('take.chef')
+    recipe_file.write('''Cold leftovers.
+
+Ingredients.
+number
+
+Method.
+Take number from refrigerator.
+Put number into mixing bowl.
+Take number from refrigerator.
+Put number into mixing bowl.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.''')
+    input_file = tmpdir.join('input')
+    with input_file.open('wb') as f:
+        write_numbers(f, [1 << 70, 23])
+    output_file = tmpdir.join('output')
+    with mock.patch('sys.excepthook'):
+        main([
+            '-f', str(recipe_file), '--no-cache', '-i', str(input_file),
+            '-o', str(output_file)])
+    assert output_file.read() == '23%d' % (1 << 70)
+
+
+def test_main_write_behind(loop_recipe, tmpdir):
+    recipe_file = tmpdir.join('loop.chef')
+    recipe_file.write(loop_recipe.getvalue())
+    output_file = tmpdir.join('output')
+    with mock.patch('sys.excepthook'):
+        main([
+            '-f', str(recipe_file), '--no-cache', '--write-behind',
+            '-o', str(output_file)])
+    assert output_file.read() == '123'
@@ -0,0 +1,119 @@
+from __future__ import with_statement
+
+import json
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import mock
+
+import chef.jobs as chef_jobs
+from chef.refrigerator import write_numbers
+
+ADD_RECIPE = '''Sum.
+
+Ingredients.
+number
+
+Method.
+Take number from refrigerator.
+Put number into mixing bowl.
+Take number from refrigerator.
+Add number to mixing bowl.
+Pour contents of the mixing bowl into the baking dish.
+
+Serves 1.
+'''
+
+INVALID_RECIPE = '''Invalid.
+
+Method.
+Count the number.
+'''
+
+MANIFEST = '''{"recipe": "add.chef", "input": "numbers.txt"}
+{"recipe": "add.chef", "input": "numbers.bin", "binary": true}
+{"recipe": "add.chef", "input": "numbers.txt", "engine": "python"}
+{"recipe": "add.chef"}
+{"recipe": "invalid.chef"}
+{"recipe": "missing.chef"}
+
+not json
+{"input": "numbers.txt"}
+{"recipe": "add.chef", "engine": "turbo"}
+'''
+
+
+def pytest_funcarg__manifest(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    tmpdir.join('add.chef').write(ADD_RECIPE)
+    tmpdir.join('invalid.chef').write(INVALID_RECIPE)
+    tmpdir.join('numbers.txt').write('20\n3\n')
+    with tmpdir.join('numbers.bin').open('wb') as f:
+        write_numbers(f, [1 << 64, 1])
+    manifest = tmpdir.join('manifest.jsonl')
+    manifest.write(MANIFEST)
+    return manifest
+
+
+def read_results(results_file):
+    results = [json.loads(line) for line in results_file.readlines()]
+    return dict((result['index'], result) for result in results)
+
+
+class TestMain(object):
+    params = {
+        'test_results': [{'processes': '1'}, {'processes': '2'}]}
+
+    def test_results(self, manifest, processes):
+        results_file = manifest.dirpath('results.jsonl')
+        status = chef_jobs.main([
+            '-j', processes, '-o', str(results_file), str(manifest)])
+        assert status == 1
+        results = read_results(results_file)
+        assert sorted(results) == [0, 1, 2, 3, 4, 5, 7, 8, 9]
+        for index in [0, 2]:
+            assert results[index]['output'] == '23'
+            assert results[index]['error'] is None
+        assert results[1]['output'] == str((1 << 64) + 1)
+        assert results[3]['error'] == "invalid input: '' (line 7)"
+        assert results[3]['lineno'] == 7
+        assert results[4]['lineno'] == 4
+        assert results[4]['recipe'] == str(manifest.dirpath('invalid.chef'))
+        assert 'No such file' in results[5]['error']
+        for index in [7, 8]:
+            assert results[index]['error'].startswith('invalid job: ')
+        assert results[9]['error'] == "unknown engine u'turbo'"
+
+    def test_recipes_are_parsed_once(self, manifest):
+        manifest.write('{"recipe": "add.chef", "input": "numbers.txt"}\n' * 3)
+        results_file = manifest.dirpath('results.jsonl')
+        with mock.patch(
+                'chef.jobs._recipe_cache',
+                chef_jobs.RecipeCache(
+                    mock.Mock(side_effect=chef_jobs.prepare_recipe_source))
+                ) as cache:
+            status = chef_jobs.main([
+                '-j', '1', '-o', str(results_file), str(manifest)])
+        assert status == 0
+        assert cache.prepare.call_count == 1
+        assert [result['output'] for result in read_results(
+            results_file).values()] == ['23'] * 3
+
+    def test_default_stdout(self, manifest):
+        manifest.write('{"recipe": "add.chef", "input": "numbers.txt"}\n')
+        with mock.patch('sys.stdout', StringIO()) as stdout:
+            status = chef_jobs.main(['-j', '1', str(manifest)])
+        assert status == 0
+        assert json.loads(stdout.getvalue())['output'] == '23'
+
+
+def test_run_job_other_errors(manifest):
+    job = chef_jobs.Job(0, str(manifest.dirpath('add.chef')), None, False,
+        'bytecode')
+    with mock.patch(
+            'chef.jobs._recipe_cache',
+            chef_jobs.RecipeCache(mock.Mock(side_effect=ValueError('spam')))):
+        assert chef_jobs.run_job(job) == chef_jobs.JobResult(
+            0, job.recipe, None, 'ValueError: spam', None)
@@ -0,0 +1,47 @@
+import chef.morphology as morphology
+
+
+class TestVerbsMatch(object):
+    def test_cached(self):
+        morphology._matches.clear()
+        assert morphology.verbs_match('Stop', 'stopped')
+        assert not morphology.verbs_match('Stop', 'started')
+        assert morphology._matches == {
+            ('Stop', 'stopped'): True, ('Stop', 'started'): False}
+
+    def test_bounded_cache(self, monkeypatch):
+        monkeypatch.setattr(morphology, 'CACHE_SIZE', 2)
+        morphology._matches.clear()
+        for verb in ['Join', 'Scan', 'Stop']:
+            assert morphology.verbs_match(verb, verb.lower() + 'ed')
+            assert len(morphology._matches) <= 2
+
+
+class TestPastForm(object):
+    params = {
+        'test_regular': [
+            {'present_form': 'Examine', 'past_form': 'examined'},
+            {'present_form': 'Join', 'past_form': 'joined'},
+            {'present_form': 'Stop', 'past_form': 'stopped'},
+            {'present_form': 'Scan', 'past_form': 'scanned'},
+            {'present_form': 'Add', 'past_form': 'added'},
+            {'present_form': 'Knead', 'past_form': 'kneaded'},
+            {'present_form': 'Mix', 'past_form': 'mixed'}]}
+
+    def test_regular(self, present_form, past_form):
+        assert morphology.past_form(present_form) == past_form
+
+    def test_accepted_by_match_verbs(self):
+        # 'strapped' would be the regular past form of 'Strap', but the
+        # matching rules only accept 'straped'
+        assert morphology.past_form('Strap') == 'straped'
+        for verb in ['Examine', 'Join', 'Stop', 'Add', 'Strap', 'Visit']:
+            assert morphology.match_verbs(verb, morphology.past_form(verb))
+
+
+def test_is_past_form():
+    precomputed = morphology.past_form('Join')
+    assert morphology.is_past_form('joined', 'Join', precomputed)
+    # an irregular spelling which match_verbs accepts as well
+    assert morphology.is_past_form('joinned', 'Join', precomputed)
+    assert not morphology.is_past_form('kneaded', 'Join', precomputed)
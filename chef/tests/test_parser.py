@@ -1,6 +1,7 @@
 from __future__ import with_statement
 
 import re
+import mmap
 try:
     from cStringIO import StringIO
 except ImportError:
@@ -9,14 +10,21 @@ except ImportError:
 import pytest
 
 from chef.datastructures import Ingredient, IngredientProperties, Ingredients,\
-        unknown, undefined
+        unknown, undefined, instruction_from_dict, instruction_to_dict
 from chef.errors.syntax import ChefSyntaxError, MissingEmptyLineError,\
         InvalidOvenTemperature, OrdinalIdentifierError,\
         InvalidCookingTimeError, InvalidCommandError,\
-        InvalidTimeDeclarationError
+        InvalidTimeDeclarationError, MissingLoopEndError
 import chef.parser as chef_parser
 
 
+def command_dict(instruction):
+    # the dict form of an instruction which was parsed without a line number
+    d = instruction_to_dict(instruction)
+    assert d.pop('lineno') is None
+    return d
+
+
 class TestMeasurePattern(object):
     params = {
         'test_dry_measure': [
@@ -330,6 +338,15 @@ class TestParseOrdinalIdentifier(object):
         assert chef_parser.parse_ordinal_identifier('13th') == 13
         assert chef_parser.parse_ordinal_identifier('58th') == 58
 
+    def test_bounded_cache(self, monkeypatch):
+        monkeypatch.setattr(chef_parser, 'ORDINAL_CACHE_SIZE', 2)
+        chef_parser._ordinal_identifiers.clear()
+        for number in xrange(4, 10):
+            ordinal_identifier = '%dth' % number
+            assert chef_parser.parse_ordinal_identifier(
+                ordinal_identifier) == number
+            assert len(chef_parser._ordinal_identifiers) <= 2
+
 
 class TestDetectIngredientState(object):
     params = {
@@ -454,6 +471,15 @@ class TestParseIngredientList(object):
             Ingredient('oil', IngredientProperties(75, unknown, unknown))]
         assert lineno == 6
 
+    def test_redefinition_keeps_position(self):
+        ingredients, lineno = chef_parser.parse_ingredient_list(
+            '1 g salt\n2 eggs\n3 ml milk\n4 g salt\n', 4)
+        assert ingredients == [
+            Ingredient('salt', IngredientProperties(4, True, False)),
+            Ingredient('eggs', IngredientProperties(2, False, False)),
+            Ingredient('milk', IngredientProperties(3, False, True))]
+        assert lineno == 8
+
     def test_nonmatching_measure(self, line):
         ingredients, lineno = chef_parser.parse_ingredient_list(line, 4)
 
@@ -528,7 +554,7 @@ class TestParseIngredientPrepositionNthMixingBowl(object):
     def test_with_ordinal_id(self):
         d = chef_parser.parse_ingredient_preposition_nth_mixing_bowl(
             'Fold', 'into', 'tomatoes into 2nd mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'fold',
             'ingredient': 'tomatoes',
             'mixing_bowl_id': 2}
@@ -536,7 +562,7 @@ class TestParseIngredientPrepositionNthMixingBowl(object):
     def test_without_ordinal_id(self):
         d = chef_parser.parse_ingredient_preposition_nth_mixing_bowl(
             'Put', 'into', 'eggs into mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'put',
             'ingredient': 'eggs',
             'mixing_bowl_id': None}
@@ -546,12 +572,17 @@ class TestParseIngredientPrepositionNthMixingBowl(object):
             chef_parser.parse_ingredient_preposition_nth_mixing_bowl(
                 'Blub', 'into', 'gnagnagna!')
 
+    def test_unknown_preposition(self):
+        with pytest.raises(InvalidCommandError):
+            chef_parser.parse_ingredient_preposition_nth_mixing_bowl(
+                'Put', 'onto', 'eggs onto mixing bowl.')
+
 
 class TestParseIngredientOptionalPrepositionNthMixingBowl(object):
     def test_with_ordinal_id(self):
         d = chef_parser.parse_ingredient_optional_preposition_nth_mixing_bowl(
             'Add', 'to', 'meat balls to 4th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add',
             'ingredient': 'meat balls',
             'mixing_bowl_id': 4}
@@ -559,7 +590,7 @@ class TestParseIngredientOptionalPrepositionNthMixingBowl(object):
     def test_without_ordinal_id(self):
         d = chef_parser.parse_ingredient_optional_preposition_nth_mixing_bowl(
             'Add', 'to', 'potatoes to mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add',
             'ingredient': 'potatoes',
             'mixing_bowl_id': None}
@@ -567,7 +598,7 @@ class TestParseIngredientOptionalPrepositionNthMixingBowl(object):
     def test_short(self):
         d = chef_parser.parse_ingredient_optional_preposition_nth_mixing_bowl(
             'Add', 'to', 'eggs.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add',
             'ingredient': 'eggs',
             'mixing_bowl_id': None}
@@ -577,11 +608,16 @@ class TestParseIngredientOptionalPrepositionNthMixingBowl(object):
             chef_parser.parse_ingredient_optional_preposition_nth_mixing_bowl(
                 'Flush', 'to', 'hibble-dibble!')
 
+    def test_unknown_preposition(self):
+        with pytest.raises(InvalidCommandError):
+            chef_parser.parse_ingredient_optional_preposition_nth_mixing_bowl(
+                'Add', 'onto', 'eggs onto mixing bowl.')
+
 
 class TestParseTake(object):
     def test_valid(self):
         d = chef_parser.parse_take('eggs from refrigerator.')
-        assert d == {'command': 'take', 'ingredient': 'eggs'}
+        assert command_dict(d) == {'command': 'take', 'ingredient': 'eggs'}
 
     def test_invalid(self):
         with pytest.raises(InvalidCommandError):
@@ -596,12 +632,12 @@ class TestParsePut(object):
 
     def test_general(self):
         d = chef_parser.parse_put('salt into mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'put', 'ingredient': 'salt', 'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_put('sugar into 5th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'put', 'ingredient': 'sugar', 'mixing_bowl_id': 5}
 
     def test_invalid(self, invalid_code):
@@ -618,12 +654,12 @@ class TestParseFold(object):
 
     def test_general(self):
         d = chef_parser.parse_fold('sausage into mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'fold', 'ingredient': 'sausage', 'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_fold('mustard into 6th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'fold', 'ingredient': 'mustard', 'mixing_bowl_id': 6}
 
     def test_invalid(self, invalid_code):
@@ -635,26 +671,26 @@ class TestParseFold(object):
 class TestParseAdd(object):
     def test_general(self):
         d = chef_parser.parse_add('flour.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add',
             'ingredient': 'flour',
             'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_add('ketchup to 3rd mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add', 'ingredient': 'ketchup', 'mixing_bowl_id': 3}
 
     def test_unusual(self):
         # be aware of the word "the" in all the test_unusual methods in this
         # module!
         d = chef_parser.parse_add('cream to the 5th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add',
             'ingredient': 'cream to the 5th mixing bowl',
             'mixing_bowl_id': None}
         d = chef_parser.parse_add('salad to the mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'add',
             'ingredient': 'salad to the mixing bowl',
             'mixing_bowl_id': None}
@@ -663,24 +699,24 @@ class TestParseAdd(object):
 class TestParseRemove(object):
     def test_general(self):
         d = chef_parser.parse_remove('red wine.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'remove',
             'ingredient': 'red wine',
             'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_remove('fish from 6th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'remove', 'ingredient': 'fish', 'mixing_bowl_id': 6}
 
     def test_unusual(self):
         d = chef_parser.parse_remove('baking powder from the 5th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'remove',
             'ingredient': 'baking powder from the 5th mixing bowl',
             'mixing_bowl_id': None}
         d = chef_parser.parse_remove('vanilla sugar from the mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'remove',
             'ingredient': 'vanilla sugar from the mixing bowl',
             'mixing_bowl_id': None}
@@ -689,24 +725,24 @@ class TestParseRemove(object):
 class TestParseCombine(object):
     def test_general(self):
         d = chef_parser.parse_combine('tomatoes.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'combine',
             'ingredient': 'tomatoes',
             'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_combine('pickles into 3rd mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'combine', 'ingredient': 'pickles', 'mixing_bowl_id': 3}
 
     def test_unusual(self):
         d = chef_parser.parse_combine('marzipan into the 2nd mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'combine',
             'ingredient': 'marzipan into the 2nd mixing bowl',
             'mixing_bowl_id': None}
         d = chef_parser.parse_combine('onions into the mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'combine',
             'ingredient': 'onions into the mixing bowl',
             'mixing_bowl_id': None}
@@ -715,24 +751,24 @@ class TestParseCombine(object):
 class TestParseDivide(object):
     def test_general(self):
         d = chef_parser.parse_divide('chocolate.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'divide',
             'ingredient': 'chocolate',
             'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_divide('cheese into 7th mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'divide', 'ingredient': 'cheese', 'mixing_bowl_id': 7}
 
     def test_unusual(self):
         d = chef_parser.parse_divide('peppercorns into the 1st mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'divide',
             'ingredient': 'peppercorns into the 1st mixing bowl',
             'mixing_bowl_id': None}
         d = chef_parser.parse_divide('parsley into the mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'divide',
             'ingredient': 'parsley into the mixing bowl',
             'mixing_bowl_id': None}
@@ -741,12 +777,12 @@ class TestParseDivide(object):
 class TestParseAddDry(object):
     def test_general(self):
         d = chef_parser.parse_add_dry('dry ingredients.')
-        assert d == {'command': 'add_dry', 'mixing_bowl_id': None}
+        assert command_dict(d) == {'command': 'add_dry', 'mixing_bowl_id': None}
 
     def test_with_specific_mixing_bowl(self):
         d = chef_parser.parse_add_dry(
             'dry ingredients to 2nd mixing bowl.')
-        assert d == {'command': 'add_dry', 'mixing_bowl_id': 2}
+        assert command_dict(d) == {'command': 'add_dry', 'mixing_bowl_id': 2}
 
     def test_invalid(self):
         with pytest.raises(InvalidCommandError):
@@ -755,44 +791,48 @@ class TestParseAddDry(object):
 
 def test_parse_liquefy():
     d = chef_parser.parse_liquefy_ingredient('melted butter.')
-    assert d == {
+    assert command_dict(d) == {
         'command': 'liquefy_ingredient', 'ingredient': 'melted butter'}
 
 
 class TestParseLiquefyContents(object):
     def test_general(self):
         d = chef_parser.parse_liquefy_contents('contents of the mixing bowl.')
-        assert d == {'command': 'liquefy_contents', 'mixing_bowl_id': None}
+        assert command_dict(d) == {'command': 'liquefy_contents', 'mixing_bowl_id': None}
 
     def test_specific_mixing_bowl(self):
         d = chef_parser.parse_liquefy_contents(
             'contents of the 4th mixing bowl.')
-        assert d == {'command': 'liquefy_contents', 'mixing_bowl_id': 4}
+        assert command_dict(d) == {'command': 'liquefy_contents', 'mixing_bowl_id': 4}
 
     def test_unusual(self):
         # looks like a "liquefy contents" command, but it isn't!
         d = chef_parser.parse_liquefy_contents('contents of 3rd mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'liquefy_ingredient',
             'ingredient': 'contents of 3rd mixing bowl'}
+        d = chef_parser.parse_liquefy_contents('contents of the soup.')
+        assert command_dict(d) == {
+            'command': 'liquefy_ingredient',
+            'ingredient': 'contents of the soup'}
 
 
 class TestParseStirMinutes(object):
     def test_general(self):
         d = chef_parser.parse_stir('for 5 minutes.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'stir_minutes',
             'mixing_bowl_id': None,
             'minutes': 5}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_stir('the mixing bowl for 3 minutes.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'stir_minutes', 'minutes': 3, 'mixing_bowl_id': None}
 
     def test_with_specific_mixing_bowl(self):
         d = chef_parser.parse_stir('the 4th mixing bowl for 10 minutes.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'stir_minutes', 'minutes': 10, 'mixing_bowl_id': 4}
 
     def test_invalid(self):
@@ -803,14 +843,14 @@ class TestParseStirMinutes(object):
 class TestParseStirIngredient(object):
     def test_general(self):
         d = chef_parser.parse_stir('apples into the mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'stir_ingredient',
             'ingredient': 'apples',
             'mixing_bowl_id': None}
 
     def test_with_specific_mixing_bowl(self):
         d = chef_parser.parse_stir('milk into the 2nd mixing bowl.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'stir_ingredient',
             'ingredient': 'milk',
             'mixing_bowl_id': 2}
@@ -827,15 +867,15 @@ class TestParseMix(object):
 
     def test_general(self):
         d = chef_parser.parse_mix('well.')
-        assert d == {'command': 'mix', 'mixing_bowl_id': None}
+        assert command_dict(d) == {'command': 'mix', 'mixing_bowl_id': None}
 
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_mix('the mixing bowl well.')
-        assert d == {'command': 'mix', 'mixing_bowl_id': None}
+        assert command_dict(d) == {'command': 'mix', 'mixing_bowl_id': None}
 
     def test_with_specific_mixing_bowl(self):
         d = chef_parser.parse_mix('the 3rd mixing bowl well.')
-        assert d == {'command': 'mix', 'mixing_bowl_id': 3}
+        assert command_dict(d) == {'command': 'mix', 'mixing_bowl_id': 3}
 
     def test_invalid(self, invalid_code):
         with pytest.raises(InvalidCommandError):
@@ -845,11 +885,11 @@ class TestParseMix(object):
 class TestParseClean(object):
     def test_general(self):
         d = chef_parser.parse_clean('mixing bowl.')
-        assert d == {'command': 'clean', 'mixing_bowl_id': None}
+        assert command_dict(d) == {'command': 'clean', 'mixing_bowl_id': None}
 
     def test_with_specific_mixing_bowl(self):
         d = chef_parser.parse_clean('3rd mixing bowl.')
-        assert d == {'command': 'clean', 'mixing_bowl_id': 3}
+        assert command_dict(d) == {'command': 'clean', 'mixing_bowl_id': 3}
 
     def test_invalid(self):
         with pytest.raises(InvalidCommandError):
@@ -860,7 +900,7 @@ class TestParsePour(object):
     def test_general(self):
         d = chef_parser.parse_pour(
             'contents of the mixing bowl into the baking dish.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'pour',
             'mixing_bowl_id': None,
             'baking_dish_id': None}
@@ -868,7 +908,7 @@ class TestParsePour(object):
     def test_with_mixing_bowl(self):
         d = chef_parser.parse_pour(
             'contents of the 2nd mixing bowl into the baking dish.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'pour',
             'mixing_bowl_id': 2,
             'baking_dish_id': None}
@@ -876,7 +916,7 @@ class TestParsePour(object):
     def test_with_baking_dish(self):
         d = chef_parser.parse_pour(
             'contents of the mixing bowl into the 3rd baking dish.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'pour',
             'mixing_bowl_id': None,
             'baking_dish_id': 3}
@@ -884,7 +924,7 @@ class TestParsePour(object):
     def test_with_both(self):
         d = chef_parser.parse_pour(
             'contents of the 4th mixing bowl into the 6th baking dish.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'pour',
             'mixing_bowl_id': 4,
             'baking_dish_id': 6}
@@ -898,15 +938,15 @@ class TestParsePour(object):
 class TestParseRefrigerate(object):
     def test_general(self):
         d = chef_parser.parse_refrigerate('.')
-        assert d == {'command': 'refrigerate', 'hours': None}
+        assert command_dict(d) == {'command': 'refrigerate', 'hours': None}
 
     def test_with_hour(self):
         d = chef_parser.parse_refrigerate('for 1 hour.')
-        assert d == {'command': 'refrigerate', 'hours': 1}
+        assert command_dict(d) == {'command': 'refrigerate', 'hours': 1}
 
     def test_with_hours(self):
         d = chef_parser.parse_refrigerate('for 3 hours.')
-        assert d == {'command': 'refrigerate', 'hours': 3}
+        assert command_dict(d) == {'command': 'refrigerate', 'hours': 3}
 
     def test_invalid(self):
         with pytest.raises(InvalidCommandError):
@@ -922,7 +962,7 @@ class TestParseRefrigerate(object):
 class TestParseLoopStart(object):
     def test_valid(self):
         d = chef_parser.parse_loop_start('Eat', 'the burger.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'loop_start', 'verb': 'Eat', 'ingredient': 'burger'}
 
     def test_invalid(self):
@@ -933,14 +973,14 @@ class TestParseLoopStart(object):
 class TestParseLoopEnd(object):
     def test_without_ingredient(self):
         d = chef_parser.parse_loop_end('Bake', 'until heated.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'loop_end', 'verb': 'heated', 'ingredient': None}
 
     def test_with_ingredient(self):
         # I apologize in advance to all vegetarians who are insulted by the
         # following lines
         d = chef_parser.parse_loop_end('Punch', 'the broccoli until killed.')
-        assert d == {
+        assert command_dict(d) == {
             'command': 'loop_end', 'verb': 'killed', 'ingredient': 'broccoli'}
 
     def test_invalid(self):
@@ -954,7 +994,7 @@ class TestParseMethod(object):
             'Method.\nAdd flour to 3rd mixing bowl.', 1)
         assert lineno == 2
         assert len(parsed_instructions) == 1
-        assert parsed_instructions == [{
+        assert map(instruction_to_dict, parsed_instructions) == [{
             'command': 'add',
             'ingredient': 'flour',
             'mixing_bowl_id': 3,
@@ -967,7 +1007,7 @@ class TestParseMethod(object):
             'Take sugar from refrigerator.', 1)
         assert lineno == 3
         assert len(parsed_instructions) == 2
-        assert parsed_instructions == [
+        assert map(instruction_to_dict, parsed_instructions) == [
             {
                 'command': 'add',
                 'ingredient': 'flour',
@@ -978,6 +1018,125 @@ class TestParseMethod(object):
                 'ingredient': 'sugar',
                 'lineno': 3}]
 
+    def test_header_and_verb_with_same_letters(self):
+        # the 'M' of 'Mix' must not be stripped together with the header
+        parsed_instructions, lineno = chef_parser.parse_method(
+            'Method.\nMix well.', 1)
+        assert map(instruction_to_dict, parsed_instructions) == [
+            {'command': 'mix', 'mixing_bowl_id': None, 'lineno': 2}]
+
+    def test_multiple_instructions_per_line(self):
+        parsed_instructions, lineno = chef_parser.parse_method(
+            'Method.\nRefrigerate. Add dry ingredients.\nMix well.\n', 3)
+        assert lineno == 5
+        assert map(instruction_to_dict, parsed_instructions) == [
+            {'command': 'refrigerate', 'hours': None, 'lineno': 4},
+            {'command': 'add_dry', 'mixing_bowl_id': None, 'lineno': 4},
+            {'command': 'mix', 'mixing_bowl_id': None, 'lineno': 5}]
+
+
+
+def slow_parse_statements(text, lineno):
+    return [
+        chef_parser.parse_statement(statement)
+        for statement in chef_parser.scan_statements(text, lineno)]
+
+
+class TestParseStatements(object):
+    # parse_statements must agree with parsing each statement which
+    # scan_statements finds
+    params = {
+        'test_same_as_parse_statement': [
+            dict(text='Take sugar from refrigerator.'),
+            dict(text='Put flour into 2nd mixing bowl. Fold eggs into the '
+                'mixing bowl.\nAdd sugar. Remove salt from mixing bowl.'),
+            dict(text='Combine oil. Divide milk into 11th mixing bowl.'),
+            dict(text='Add dry ingredients to 3rd mixing bowl.\n'
+                'Liquefy contents of the mixing bowl. Liquefy butter.'),
+            dict(text='Stir for 5 minutes. Stir the 2nd mixing bowl for 1 '
+                'minute.\nStir cream into the mixing bowl.'),
+            dict(text='Mix well. Mix the 2nd mixing bowl well.\n'
+                'Clean 3rd mixing bowl. Clean mixing bowl.'),
+            dict(text='Pour contents of the mixing bowl into the baking '
+                'dish.\nPour contents of the 2nd mixing bowl into the 3rd '
+                'baking dish.'),
+            dict(text='Refrigerate. Refrigerate for 1 hour.\n'
+                'Refrigerate for 3 hours.'),
+            dict(text='Sift the flour. Shake the sugar until sifted.\n'
+                'Heat until shaked. Set aside. Serve with chocolate sauce.'),
+            dict(text='Add  flour to\nmixing bowl. Mix\twell.\n'),
+            dict(text='Stir the sugar\ninto the mixing bowl. Mix well\n'),
+            dict(text='Put flour into 0th mixing bowl.'),
+            dict(text='Put flour onto the mixing bowl.'),
+            dict(text='Liquefy contents of the soup.'),
+            dict(text='Refrigerate for 1 hours.'),
+            dict(text='Fly away.')]}
+
+    def test_same_as_parse_statement(self, text):
+        try:
+            expected = map(instruction_to_dict, slow_parse_statements(text, 3))
+        except ChefSyntaxError, e:
+            with pytest.raises(type(e)) as error:
+                chef_parser.parse_statements(text, 3)
+            assert getattr(error.value, 'lineno', None) == getattr(
+                e, 'lineno', None)
+        else:
+            assert map(instruction_to_dict, chef_parser.parse_statements(
+                text, 3)) == expected
+
+    def test_empty(self):
+        assert chef_parser.parse_statements('') == []
+        assert chef_parser.parse_statements('\n') == []
+
+
+class TestResolveLoops(object):
+    def test_nested(self):
+        parsed_instructions, lineno = chef_parser.parse_method(
+            'Method.\n'
+            'Count the number.\n'
+            'Knead the counter.\n'
+            'Put number into mixing bowl.\n'
+            'Knead the counter until kneaded.\n'
+            'Count the number until counted.\n'
+            'Mix well.', 1)
+        offsets = [(instr.command, instr.jump) for instr in parsed_instructions]
+        assert offsets == [
+            ('loop_start', 4), ('loop_start', 2), ('put', None),
+            ('loop_end', 2), ('loop_end', 4), ('mix', None)]
+
+    def test_missing_loop_end(self):
+        with pytest.raises(MissingLoopEndError) as e:
+            chef_parser.parse_method(
+                'Method.\nCount the number.\nMix well.', 1)
+        assert e.value.verb == 'Count'
+        assert e.value.lineno == 2
+
+    def test_loop_end_of_outer_loop(self):
+        # the until-statement of the outer loop cannot close the inner loop
+        with pytest.raises(MissingLoopEndError) as e:
+            chef_parser.parse_method(
+                'Method.\nCount the number.\nKnead the counter.\n'
+                'Count the number until counted.', 1)
+        assert e.value.verb == 'Knead'
+        assert e.value.lineno == 3
+
+    def test_loop_end_without_loop(self):
+        with pytest.raises(ChefSyntaxError) as e:
+            chef_parser.parse_method(
+                'Method.\nMix well.\nCount the number until counted.', 1)
+        assert e.value.lineno == 3
+
+    def test_stream_reads_whole_loop(self):
+        instructions = chef_parser.iter_resolved_loops(iter(map(
+            instruction_from_dict, [
+                {'command': 'loop_start', 'verb': 'Count', 'lineno': 2},
+                {'command': 'loop_end', 'verb': 'counted', 'lineno': 3},
+                {'command': 'mix', 'lineno': 4}])))
+        loop_start = instructions.next()
+        # the until-statement has been read before the loop start is yielded
+        assert loop_start.jump == 1
+        assert instructions.next().jump == 1
+
 
 def test_parse_serves():
     num_of_diners = chef_parser.parse_serves('Serves 7.', 12)
@@ -1002,7 +1161,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {
                 'command': 'put',
                 'ingredient': 'sugar',
@@ -1024,7 +1183,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 4}]
         assert recipe.serves is undefined
 
@@ -1033,7 +1192,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 10}]
         assert recipe.serves is undefined
 
@@ -1044,7 +1203,7 @@ class TestParseRecipe(object):
             Ingredient('oil', IngredientProperties(111, unknown, unknown))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 8}]
         assert recipe.serves is undefined
 
@@ -1053,7 +1212,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (20, 'minutes')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 6}]
         assert recipe.serves is undefined
 
@@ -1062,7 +1221,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (200, 5)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 6}]
         assert recipe.serves is undefined
 
@@ -1071,7 +1230,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 4}]
         assert recipe.serves == 4
 
@@ -1085,7 +1244,7 @@ class TestParseRecipe(object):
             Ingredient('cheese', IngredientProperties(4, unknown, unknown))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
                 {'command': 'take', 'ingredient': 'apple', 'lineno': 14}]
         assert recipe.serves is undefined
 
@@ -1094,7 +1253,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (2, 'hours')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 9}]
         assert recipe.serves is undefined
 
@@ -1103,7 +1262,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (250, 7)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 9}]
         assert recipe.serves is undefined
 
@@ -1112,7 +1271,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 7}]
         assert recipe.serves == 5
 
@@ -1126,7 +1285,7 @@ class TestParseRecipe(object):
             Ingredient('peppers', IngredientProperties(18, False, False))]
         assert recipe.cooking_time == (10, 'minutes')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 12}]
         assert recipe.serves is undefined
 
@@ -1139,7 +1298,7 @@ class TestParseRecipe(object):
             Ingredient('chocolate', IngredientProperties(500, True, False))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (220, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 12}]
         assert recipe.serves is undefined
 
@@ -1151,7 +1310,7 @@ class TestParseRecipe(object):
             Ingredient('rum', IngredientProperties(6, False, True))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 9}]
         assert recipe.serves == 23
 
@@ -1160,7 +1319,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (45, 'minutes')
         assert recipe.oven_temperature == (250, 5)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 8}]
         assert recipe.serves is undefined
 
@@ -1169,7 +1328,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (15, 'minutes')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 6}]
         assert recipe.serves == 1
 
@@ -1178,7 +1337,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (175, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 6}]
         assert recipe.serves == 8
 
@@ -1191,7 +1350,7 @@ class TestParseRecipe(object):
                 'brown sugar', IngredientProperties(1, unknown, unknown))]
         assert recipe.cooking_time == (20, 'minutes')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 13}]
         assert recipe.serves is undefined
 
@@ -1205,7 +1364,7 @@ class TestParseRecipe(object):
                 'vanilla ice cream', IngredientProperties(250, False, True))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (250, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 16}]
         assert recipe.serves is undefined
 
@@ -1220,7 +1379,7 @@ class TestParseRecipe(object):
                 'werewolf blood', IngredientProperties(200, False, True))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 12}]
         assert recipe.serves == 12
 
@@ -1229,7 +1388,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (15, 'minutes')
         assert recipe.oven_temperature == (200, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 10}]
         assert recipe.serves is undefined
 
@@ -1238,7 +1397,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (7, 'hours')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 8}]
         assert recipe.serves == 5
 
@@ -1247,7 +1406,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (80, 2)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 9}]
         assert recipe.serves == 1
 
@@ -1258,7 +1417,7 @@ class TestParseRecipe(object):
             Ingredient('wheat', IngredientProperties(200, True, False))]
         assert recipe.cooking_time == (25, 'minutes')
         assert recipe.oven_temperature == (220, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 12}]
         assert recipe.serves is undefined
 
@@ -1269,7 +1428,7 @@ class TestParseRecipe(object):
             Ingredient('chocolate', IngredientProperties(1, unknown, unknown))]
         assert recipe.cooking_time == (1, 'minute')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 10}]
         assert recipe.serves == 2
 
@@ -1279,7 +1438,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (2, 'hours')
         assert recipe.oven_temperature == (130, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 8}]
         assert recipe.serves == 7
 
@@ -1291,7 +1450,7 @@ class TestParseRecipe(object):
             Ingredient('mustard', IngredientProperties(5, True, False))]
         assert recipe.cooking_time == (34, 'minutes')
         assert recipe.oven_temperature == (85, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 14}]
         assert recipe.serves is undefined
 
@@ -1303,7 +1462,7 @@ class TestParseRecipe(object):
             Ingredient('potatoes', IngredientProperties(4, True, False))]
         assert recipe.cooking_time == (3, 'hours')
         assert recipe.oven_temperature is undefined
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 13}]
         assert recipe.serves == 4
 
@@ -1314,7 +1473,7 @@ class TestParseRecipe(object):
             Ingredient('buns', IngredientProperties(6, False, False))]
         assert recipe.cooking_time is undefined
         assert recipe.oven_temperature == (120, None)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 12}]
         assert recipe.serves == 6
 
@@ -1324,7 +1483,7 @@ class TestParseRecipe(object):
         assert recipe.ingredients == []
         assert recipe.cooking_time == (17, 'minutes')
         assert recipe.oven_temperature == (220, 7)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 10}]
         assert recipe.serves == 2
 
@@ -1336,7 +1495,7 @@ class TestParseRecipe(object):
             Ingredient('bacon', IngredientProperties(50, True, False))]
         assert recipe.cooking_time == (25, 'minutes')
         assert recipe.oven_temperature == (175, 5)
-        assert recipe.instructions == [
+        assert map(instruction_to_dict, recipe.instructions) == [
             {'command': 'take', 'ingredient': 'apple', 'lineno': 12}]
         assert recipe.serves == 10
 
@@ -1344,3 +1503,61 @@ class TestParseRecipe(object):
         with pytest.raises(ChefSyntaxError) as e:
             chef_parser.parse_recipe(invalid_code)
         assert e.value.msg == 'missing syntax element: method'
+
+
+class TestParseRecipeString(object):
+    def test_same_as_parse_recipe(
+            self, multiple_instr, loop_recipe, description_and_serves,
+            descr_ingr_cooking_time_oven_temp):
+        for f in [multiple_instr, loop_recipe, description_and_serves,
+                descr_ingr_cooking_time_oven_temp]:
+            source = f.getvalue()
+            recipe = chef_parser.parse_recipe(StringIO(source))
+            assert chef_parser.parse_recipe_string(source) == recipe
+            assert chef_parser.parse_recipe_bytes(source) == recipe
+
+    def test_mmap(self, ingr_cooking_time_oven_temp_serves, tmpdir):
+        source = ingr_cooking_time_oven_temp_serves.getvalue()
+        recipe_file = tmpdir.join('recipe.chef')
+        recipe_file.write(source)
+        with recipe_file.open() as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                recipe = chef_parser.parse_recipe_bytes(buffer)
+            finally:
+                buffer.close()
+        assert recipe == chef_parser.parse_recipe(StringIO(source))
+
+    def test_invalid(self, invalid_code):
+        with pytest.raises(ChefSyntaxError):
+            chef_parser.parse_recipe_string(invalid_code.getvalue())
+
+
+class TestParseRecipeStream(object):
+    def test_same_as_parse_recipe(self, ingr_cooking_time_oven_temp_serves):
+        source = ingr_cooking_time_oven_temp_serves.getvalue()
+        recipe = chef_parser.parse_recipe(StringIO(source))
+        stream = chef_parser.parse_recipe_stream(StringIO(source))
+        assert stream.ingredients == recipe.ingredients
+        assert stream.cooking_time == recipe.cooking_time
+        assert stream.oven_temperature == recipe.oven_temperature
+        assert stream.serves is undefined
+        assert list(stream) == recipe.instructions
+        assert stream.serves == recipe.serves
+
+    def test_lazy(self):
+        stream = chef_parser.parse_recipe_stream(StringIO('''Lazy.
+
+Method.
+Put sugar into mixing bowl.
+Stir sugar into mixing bowl.'''))
+        instructions = iter(stream)
+        assert instruction_to_dict(instructions.next()) == {
+            'command': 'put',
+            'ingredient': 'sugar',
+            'mixing_bowl_id': None,
+            'lineno': 4}
+        # the invalid statement is only parsed when it is needed
+        with pytest.raises(InvalidCommandError) as e:
+            instructions.next()
+        assert e.value.lineno == 5
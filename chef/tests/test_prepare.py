@@ -0,0 +1,19 @@
+import mock
+
+from chef.prepare import RecipeCache
+
+
+def test_recipe_cache():
+    prepare = mock.Mock(side_effect=lambda source, engine: source + engine)
+    cache = RecipeCache(prepare, 2)
+    assert cache.get('a', 'x') == 'ax'
+    assert cache.get('b', 'x') == 'bx'
+    assert cache.get('a', 'x') == 'ax'
+    assert prepare.call_count == 2
+    # b is the least recently used recipe
+    assert cache.get('a', 'y') == 'ay'
+    assert len(cache) == 2
+    cache.get('a', 'x')
+    assert prepare.call_count == 3
+    cache.get('b', 'x')
+    assert prepare.call_count == 4
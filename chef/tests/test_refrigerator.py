@@ -0,0 +1,153 @@
+from __future__ import with_statement
+
+import os
+import random
+import threading
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import pytest
+
+from chef.refrigerator import NumberReader, BinaryNumberReader,\
+        write_numbers, ESCAPE
+from chef.errors.runtime import InvalidInputError
+
+both_readers = [dict(background=False), dict(background=True)]
+
+
+def read_numbers(reader, count):
+    return [reader.read_number() for i in xrange(count)]
+
+
+class TestNumberReader(object):
+    params = {
+        'test_read_number': both_readers,
+        'test_whitespace': both_readers,
+        'test_invalid_line': both_readers,
+        'test_empty': both_readers}
+
+    def test_read_number(self, background, tmpdir):
+        numbers = range(-50, 50) + [10 ** 30]
+        input_file = tmpdir.join('input')
+        input_file.write(''.join(['%d\n' % number for number in numbers]))
+        # blocks of three bytes end in the middle of most lines
+        stdin = input_file.open()
+        reader = NumberReader(stdin, 3, background)
+        assert read_numbers(reader, len(numbers)) == numbers
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number(4)
+        assert e.value.value == ''
+        assert e.value.lineno == 4
+        stdin.close()
+
+    def test_open_pipe(self):
+        # the numbers which have arrived are read without waiting for the
+        # end of the input, e.g. if it is typed into a terminal
+        read_fd, write_fd = os.pipe()
+        stdin = os.fdopen(read_fd)
+        os.write(write_fd, '5\n6\n')
+        numbers = []
+        thread = threading.Thread(
+            target=lambda: numbers.extend(read_numbers(
+                NumberReader(stdin), 2)))
+        thread.setDaemon(True)
+        thread.start()
+        thread.join(5)
+        try:
+            assert numbers == [5, 6]
+        finally:
+            os.close(write_fd)
+            thread.join()
+            stdin.close()
+
+    def test_whitespace(self, background):
+        reader = NumberReader(StringIO(' 1\r\n2 \r\n\t3'), 4, background)
+        assert read_numbers(reader, 3) == [1, 2, 3]
+
+    def test_invalid_line(self, background):
+        reader = NumberReader(
+            StringIO('1\n2\n spam \n3\n\n4\n'), 64, background)
+        assert read_numbers(reader, 2) == [1, 2]
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number(7)
+        assert e.value.value == 'spam'
+        assert e.value.lineno == 7
+        # the lines after an invalid line are still read
+        assert reader.read_number() == 3
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number()
+        assert e.value.value == ''
+        assert reader.read_number() == 4
+
+    def test_empty(self, background):
+        reader = NumberReader(StringIO(''), background=background)
+        for i in xrange(2):
+            with pytest.raises(InvalidInputError) as e:
+                reader.read_number()
+            assert e.value.value == ''
+
+    def test_read_error(self):
+        class BrokenFile(object):
+            def read(self, size):
+                raise IOError('broken')
+
+        reader = NumberReader(BrokenFile(), background=True)
+        with pytest.raises(IOError):
+            reader.read_number()
+
+
+def pytest_funcarg__binary_file(request):
+    return request.getfuncargvalue('tmpdir').join('numbers')
+
+
+def open_binary_reader(binary_file, numbers, block_size=3):
+    with binary_file.open('wb') as f:
+        write_numbers(f, numbers)
+    with binary_file.open('rb') as f:
+        return BinaryNumberReader(f, block_size)
+
+
+class TestBinaryNumberReader(object):
+    def test_read_number(self, binary_file):
+        numbers = [
+            0, 1, -1, ESCAPE, ESCAPE + 1, -ESCAPE, -ESCAPE - 1, ESCAPE - 1,
+            1 << 64, -1 << 64, (1 << 64) - 1, 3 ** 200, -3 ** 200, 42]
+        random.seed(5)
+        numbers += [random.choice(numbers) for i in xrange(500)]
+        reader = open_binary_reader(binary_file, numbers)
+        assert read_numbers(reader, len(numbers)) == numbers
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number(9)
+        assert e.value.value == ''
+        assert e.value.lineno == 9
+
+    def test_format(self, binary_file):
+        open_binary_reader(binary_file, [1, -2, 1 << 64])
+        assert binary_file.read('rb') == (
+            '01000000' '00000000' 'feffffff' 'ffffffff'
+            '00000000' '00000080' '02000000' '00000000'
+            '00000000' '00000000' '01000000' '00000000').decode('hex')
+
+    def test_empty(self, binary_file):
+        reader = open_binary_reader(binary_file, [])
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number()
+        assert e.value.value == ''
+
+    def test_truncated(self, binary_file):
+        with binary_file.open('wb') as f:
+            write_numbers(f, [7, 1 << 64])
+        binary_file.write(binary_file.read('rb')[:-1], 'wb')
+        with binary_file.open('rb') as f:
+            reader = BinaryNumberReader(f)
+        assert reader.read_number() == 7
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number(3)
+        assert e.value.value == '00000000000000800200000000000000'
+        assert e.value.lineno == 3
+        # the rest of the file is skipped
+        with pytest.raises(InvalidInputError) as e:
+            reader.read_number()
+        assert e.value.value == ''
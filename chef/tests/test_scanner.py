@@ -0,0 +1,111 @@
+from chef.scanner import Statement, command_form, split_statement,\
+        make_statement, scan_statements, scan_lines
+
+
+class TestCommandForm(object):
+    params = {
+        'test_verb_only': [
+            {'verb': 'Take', 'form': 'take'},
+            {'verb': 'Put', 'form': 'put'},
+            {'verb': 'Fold', 'form': 'fold'},
+            {'verb': 'Remove', 'form': 'remove'},
+            {'verb': 'Combine', 'form': 'combine'},
+            {'verb': 'Divide', 'form': 'divide'},
+            {'verb': 'Mix', 'form': 'mix'},
+            {'verb': 'Clean', 'form': 'clean'},
+            {'verb': 'Pour', 'form': 'pour'},
+            {'verb': 'Refrigerate', 'form': 'refrigerate'}]}
+
+    def test_verb_only(self, verb, form):
+        assert command_form(verb, 'whatever.') == form
+
+    def test_add(self):
+        assert command_form('Add', 'flour to mixing bowl.') == 'add'
+        assert command_form('Add', 'dry ingredients.') == 'add_dry'
+
+    def test_liquefy(self):
+        assert command_form('Liquefy', 'sugar.') == 'liquefy_ingredient'
+        assert command_form(
+            'Liquefy', 'contents of the mixing bowl.') == 'liquefy_contents'
+
+    def test_stir(self):
+        assert command_form('Stir', 'for 3 minutes.') == 'stir_minutes'
+        assert command_form(
+            'Stir', 'the mixing bowl for 3 minutes.') == 'stir_minutes'
+        assert command_form(
+            'Stir', 'eggs into the mixing bowl.') == 'stir_ingredient'
+
+    def test_loop(self):
+        assert command_form('Sift', 'the flour.') == 'loop_start'
+        assert command_form('Sift', 'the flour until sifted.') == 'loop_end'
+        assert command_form('Sift', 'until sifted.') == 'loop_end'
+
+
+class TestSplitStatement(object):
+    def test_general(self):
+        assert split_statement('Put sugar into mixing bowl.') == (
+            'Put', 'sugar into mixing bowl.')
+
+    def test_without_arguments(self):
+        assert split_statement('Refrigerate.') == ('Refrigerate', '.')
+
+
+def test_make_statement():
+    statement = make_statement('Add dry ingredients.', 7)
+    assert statement == Statement(
+        'add_dry', 'Add', 'dry ingredients.', 7, None)
+
+
+class TestScanStatements(object):
+    def test_empty(self):
+        assert list(scan_statements('')) == []
+        assert list(scan_statements(' \n\n ')) == []
+
+    def test_one_statement_per_line(self):
+        statements = list(scan_statements(
+            'Take sugar from refrigerator.\nPut sugar into mixing bowl.\n',
+            4))
+        assert statements == [
+            Statement(
+                'take', 'Take', 'sugar from refrigerator.', 4, 1),
+            Statement('put', 'Put', 'sugar into mixing bowl.', 5, 1)]
+
+    def test_multiple_statements_per_line(self):
+        statements = list(scan_statements(
+            'Refrigerate. Mix well.\n  Clean mixing bowl.'))
+        assert statements == [
+            Statement('refrigerate', 'Refrigerate', '.', 1, 1),
+            Statement('mix', 'Mix', 'well.', 1, 14),
+            Statement('clean', 'Clean', 'mixing bowl.', 2, 3)]
+
+    def test_statement_spanning_multiple_lines(self):
+        statements = list(scan_statements(
+            'Put sugar\ninto  mixing bowl. Stir for\n2 minutes.', 10, 5))
+        assert statements == [
+            Statement('put', 'Put', 'sugar into mixing bowl.', 10, 5),
+            Statement('stir_minutes', 'Stir', 'for 2 minutes.', 11, 20)]
+
+    def test_missing_full_stop(self):
+        statements = list(scan_statements('Mix well.\nMix well\n'))
+        assert statements == [
+            Statement('mix', 'Mix', 'well.', 1, 1),
+            Statement('mix', 'Mix', 'well.', 2, 1)]
+
+
+class TestScanLines(object):
+    def test_same_as_scan_statements(self):
+        text = (
+            'Put sugar\ninto  mixing bowl. Stir for\n2 minutes.\n'
+            'Mix well.\nRefrigerate')
+        statements = list(scan_lines(text.splitlines(True), 4))
+        assert statements == list(scan_statements(text, 4))
+
+    def test_lazy(self):
+        def lines():
+            yield 'Mix well. Clean\n'
+            yield 'mixing bowl.\n'
+            raise AssertionError('read too much')
+        statements = scan_lines(lines(), 2)
+        assert statements.next() == Statement('mix', 'Mix', 'well.', 2, 1)
+        assert statements.next() == Statement(
+            'clean', 'Clean', 'mixing bowl.', 2, 11)
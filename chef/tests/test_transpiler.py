@@ -0,0 +1,207 @@
+from __future__ import with_statement
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import pytest
+
+from chef.datastructures import Ingredient, IngredientProperties, Ingredients
+from chef.parser import parse_recipe_string
+from chef.interpreter import Interpreter, eval_instructions
+from chef.errors.runtime import InvalidInputError, UndefinedIngredientError,\
+        NonExistingContainerError, EmptyContainerError,\
+        InvalidContainerIDError, Refrigerated
+import chef.transpiler as chef_transpiler
+
+RECIPE = '''Transpiled.
+
+Ingredients.
+3 number
+2 counter
+1 one
+65 g letter
+
+Method.
+%s
+'''
+
+
+def parse(method):
+    return parse_recipe_string(RECIPE % method)
+
+
+def run_recipe(recipe, stdin=None):
+    interpreter = Interpreter(Ingredients(recipe.ingredients))
+    chef_transpiler.run(
+        chef_transpiler.transpile_recipe(recipe), interpreter, stdin)
+    return interpreter
+
+
+def pytest_funcarg__method(request):
+    return request.param
+
+
+def test_max_loop_depth():
+    recipe = parse(
+        'Count the number.\n'
+        'Knead the counter.\n'
+        'Knead the counter until kneaded.\n'
+        'Count the number until counted.\n'
+        'Knead the counter.\n'
+        'Knead the counter until kneaded.')
+    assert chef_transpiler.max_loop_depth(recipe.instructions) == 2
+    assert chef_transpiler.max_loop_depth(parse('').instructions) == 0
+
+
+def test_generate_source():
+    source = chef_transpiler.generate_source(parse(
+        'Count the number.\n'
+        'Put number into mixing bowl.\n'
+        'Count the number until counted.'))
+    assert source.startswith('def recipe(')
+    assert 'while True:' in source
+    compile(source, '<recipe>', 'exec')
+
+
+class TestRun(object):
+    params = {
+        'test_same_as_eval_instructions': [
+            {'method': ''},
+            {'method':
+                'Count the number.\n'
+                'Put number into mixing bowl.\n'
+                'Count the number until counted.'},
+            {'method':
+                'Count the number.\n'
+                'Knead the counter.\n'
+                'Put number into mixing bowl.\n'
+                'Add one to mixing bowl.\n'
+                'Knead the counter until kneaded.\n'
+                'Put one into 2nd mixing bowl.\n'
+                'Combine number into 2nd mixing bowl.\n'
+                'Count the number until counted.'},
+            {'method':
+                'Put counter into mixing bowl.\n'
+                'Put number into mixing bowl.\n'
+                'Remove one from mixing bowl.\n'
+                'Divide counter into mixing bowl.\n'
+                'Stir for 2 minutes.\n'
+                'Stir the mixing bowl for 3 minutes.\n'
+                'Stir counter into the mixing bowl.\n'
+                'Pour contents of the mixing bowl into the baking dish.\n'
+                'Clean mixing bowl.'},
+            {'method':
+                'Put letter into mixing bowl.\n'
+                'Put number into mixing bowl.\n'
+                'Fold counter into mixing bowl.\n'
+                'Fold one into mixing bowl.\n'
+                'Liquefy number.\n'
+                'Put number into 2nd mixing bowl.\n'
+                'Liquefy contents of the 2nd mixing bowl.\n'
+                'Pour contents of the 2nd mixing bowl into the baking dish.'},
+            {'method':
+                'Put number into 2nd mixing bowl.\n'
+                'Count the number.\n'
+                'Put number into 2nd mixing bowl.\n'
+                'Count the number until counted.'},
+            {'method':
+                'Add dry ingredients.\n'
+                'Count the counter.\n'
+                'Fold letter into mixing bowl.\n'
+                'Add dry ingredients.\n'
+                'Count the counter until counted.\n'
+                'Liquefy letter.\n'
+                'Add dry ingredients.'}]}
+
+    def test_same_as_eval_instructions(self, method):
+        recipe = parse(method)
+        expected = Interpreter(Ingredients(recipe.ingredients))
+        eval_instructions(recipe.instructions, expected)
+        interpreter = run_recipe(recipe)
+        assert interpreter.global_ingredients == expected.global_ingredients
+        assert interpreter.mixing_bowls == expected.mixing_bowls
+        assert interpreter.baking_dishes == expected.baking_dishes
+
+    def test_take(self):
+        interpreter = run_recipe(
+            parse('Take number from refrigerator.'), StringIO('42\n'))
+        assert interpreter.global_ingredients['number'] == Ingredient(
+            'number', IngredientProperties(42, False, False))
+        with pytest.raises(InvalidInputError) as e:
+            run_recipe(
+                parse('Take number from refrigerator.'), StringIO('x\n'))
+        assert e.value.lineno == 10
+
+    def test_refrigerate(self):
+        recipe = parse(
+            'Count the number.\n'
+            'Liquefy number.\n'
+            'Refrigerate for 1 hour.\n'
+            'Count the number until counted.')
+        interpreter = Interpreter(Ingredients(recipe.ingredients))
+        with pytest.raises(Refrigerated) as e:
+            chef_transpiler.run(
+                chef_transpiler.transpile_recipe(recipe), interpreter)
+        assert e.value.hours == 1
+        # the ingredients have been written back
+        assert interpreter.global_ingredients['number'] == Ingredient(
+            'number', IngredientProperties(3, False, True))
+
+    def test_undefined_ingredient(self):
+        with pytest.raises(UndefinedIngredientError) as e:
+            chef_transpiler.transpile_recipe(parse(
+                'Put one into mixing bowl.\n'
+                'Put sugar into mixing bowl.'))
+        assert e.value.lineno == 11
+        with pytest.raises(UndefinedIngredientError) as e:
+            run_recipe(parse('Count the sugar.\nCount until counted.'))
+        assert e.value.lineno == 10
+
+    def test_empty_mixing_bowl(self):
+        with pytest.raises(EmptyContainerError) as e:
+            run_recipe(parse('Add one to mixing bowl.'))
+        assert e.value.lineno == 10
+        with pytest.raises(EmptyContainerError):
+            run_recipe(parse('Fold one into mixing bowl.'))
+
+    def test_invalid_mixing_bowl(self):
+        with pytest.raises(NonExistingContainerError) as e:
+            run_recipe(parse('Add one to 3rd mixing bowl.'))
+        assert e.value.lineno == 10
+        with pytest.raises(InvalidContainerIDError):
+            run_recipe(parse('Put one into 3rd mixing bowl.'))
+        with pytest.raises(NonExistingContainerError):
+            run_recipe(parse(
+                'Pour contents of the mixing bowl into the 2nd baking dish.'))
+
+    def test_state_after_error(self):
+        recipe = parse(
+            'Count the number.\n'
+            'Count the number until counted.\n'
+            'Add one to mixing bowl.')
+        interpreter = Interpreter(Ingredients(recipe.ingredients))
+        with pytest.raises(EmptyContainerError):
+            chef_transpiler.run(
+                chef_transpiler.transpile_recipe(recipe), interpreter)
+        assert interpreter.global_ingredients['number'].properties.value == 0
+
+    def test_too_deeply_nested(self):
+        depth = chef_transpiler.MAX_LOOP_DEPTH + 1
+        recipe = parse(
+            'Count the number.\n' * depth +
+            'Count until counted.\n' * depth)
+        with pytest.raises(ValueError):
+            chef_transpiler.transpile_recipe(recipe)
+
+    def test_max_loop_depth_compiles(self):
+        depth = chef_transpiler.MAX_LOOP_DEPTH
+        method = (
+            'Count the number.\n' * depth +
+            'Put one into mixing bowl.\n' +
+            'Count the number until counted.\n' +
+            'Count until counted.\n' * (depth - 1))
+        interpreter = run_recipe(parse(method))
+        assert len(interpreter.first_mixing_bowl) == 3
+
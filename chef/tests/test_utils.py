@@ -1,4 +1,16 @@
-from chef.utils import read_until_blank_line, verbs_match
+from __future__ import with_statement
+
+import threading
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import mock
+import pytest
+
+from chef.utils import read_until_blank_line, verbs_match, BufferReader,\
+        BackgroundWriter
 
 
 class TestReadUntilBlankLine(object):
@@ -23,6 +35,33 @@ class TestReadUntilBlankLine(object):
         assert rest == ''
 
 
+class TestBufferReader(object):
+    def test_readline(self):
+        reader = BufferReader('1st\n2nd')
+        assert reader.readline() == '1st\n'
+        assert reader.readline() == '2nd'
+        assert reader.readline() == ''
+
+    def test_iter(self):
+        assert list(BufferReader('1st\n\n2nd\n')) == ['1st\n', '\n', '2nd\n']
+
+    def test_read_until_blank_line(self):
+        reader = BufferReader('1st\n2nd\n\n\n3rd\n4th\n\n5th\n')
+        assert read_until_blank_line(reader) == '1st\n2nd\n'
+        assert read_until_blank_line(reader) == ''
+        assert read_until_blank_line(reader) == '3rd\n4th\n'
+        assert reader.read() == '5th\n'
+        assert read_until_blank_line(reader) == ''
+
+    def test_no_blank_line(self, fp_without_any_blank_line):
+        content = fp_without_any_blank_line.read()
+        fp_without_any_blank_line.seek(0)
+        reader = BufferReader(content)
+        assert read_until_blank_line(reader) == read_until_blank_line(
+            fp_without_any_blank_line)
+        assert reader.read() == fp_without_any_blank_line.read()
+
+
 class TestVerbsMatch(object):
     def test_with_trailing_e(self):
         assert verbs_match('Examine', 'examined')
@@ -39,3 +78,55 @@ class TestVerbsMatch(object):
         # 'added' has a double consonant, but its present form ends with a
         # double consonant as well.
         assert verbs_match('Add', 'added')
+
+
+class TestBackgroundWriter(object):
+    def test_order(self):
+        output = StringIO()
+        with BackgroundWriter(output, 2) as writer:
+            for i in xrange(100):
+                writer.write('%d,' % i)
+        assert output.getvalue() == ''.join(['%d,' % i for i in xrange(100)])
+        # the file itself stays open
+        assert not output.closed
+
+    def test_flush(self):
+        output = mock.Mock()
+        writer = BackgroundWriter(output)
+        writer.write('spam')
+        writer.flush()
+        output.write.assert_called_once_with('spam')
+        output.flush.assert_called_once_with()
+        writer.close()
+        with pytest.raises(ValueError):
+            writer.write('eggs')
+
+    def test_backpressure(self):
+        output = mock.Mock()
+        release = threading.Event()
+        output.write.side_effect = lambda data: release.wait()
+        writer = BackgroundWriter(output, 1)
+        # the thread blocks on the first write, the second one is pending
+        writer.write('a')
+        writer.write('b')
+        third = threading.Thread(target=writer.write, args=('c',))
+        third.start()
+        third.join(0.05)
+        assert third.isAlive()
+        release.set()
+        third.join()
+        writer.close()
+        assert output.write.call_count == 3
+
+    def test_error(self):
+        output = mock.Mock()
+        output.write.side_effect = IOError('broken pipe')
+        writer = BackgroundWriter(output)
+        writer.write('spam')
+        with pytest.raises(IOError):
+            writer.flush()
+        with pytest.raises(IOError):
+            writer.write('eggs')
+        with pytest.raises(IOError):
+            writer.close()
+        assert output.write.call_count == 1
@@ -0,0 +1,316 @@
+'''Transpile recipes into Python functions.
+
+The instructions of a recipe are translated into the source of a single
+Python function which is compiled once. Loops become ``while`` loops, the
+ingredients become local variables and the mixing bowls and baking dishes are
+bound to local variables, so executing the recipe needs neither a dispatch
+loop nor method calls for the frequent instructions.
+
+The generated function behaves exactly like the methods of
+chef.interpreter.Interpreter: it raises the same errors with the same line
+numbers and leaves the ingredients, mixing bowls and baking dishes of the
+interpreter in the same state. Like chef.compiler, ingredients which are used
+but not declared are reported before the recipe is executed.
+
+'''
+from chef.datastructures import Ingredient, IngredientProperties,\
+        CompactIngredients, COMMANDS, OPCODES, LOOP_START, LOOP_END,\
+        DRY_INGREDIENTS
+from chef.errors.runtime import InvalidContainerIDError,\
+        NonExistingContainerError, EmptyContainerError, Refrigerated
+from chef.compiler import ingredient_slots
+from chef.refrigerator import NumberReader
+
+# Python allows at most 20 nested blocks in a function. Every loop is a block
+# and an instruction may need another one for catching an error, so recipes
+# with deeper loops cannot be transpiled.
+MAX_LOOP_DEPTH = 18
+
+FUNCTION_NAME = 'recipe'
+
+_operators = {
+    OPCODES['add']: '+',
+    OPCODES['remove']: '-',
+    OPCODES['combine']: '*',
+    OPCODES['divide']: '//'}
+
+
+def max_loop_depth(instructions):
+    'Return how deeply the loops in the list `instructions` are nested.'
+    depth = max_depth = 0
+    for instruction in instructions:
+        if instruction.opcode == LOOP_START:
+            depth += 1
+            max_depth = max(depth, max_depth)
+        elif instruction.opcode == LOOP_END:
+            depth -= 1
+    return max_depth
+
+
+def _get_container(containers, container_id, lineno, container_type):
+    # like Interpreter.get_nth_container for IDs larger than 1
+    try:
+        return containers[container_id - 1]
+    except IndexError:
+        raise NonExistingContainerError(container_type, container_id, lineno)
+
+
+def _get_or_create_mixing_bowl(mixing_bowls, mixing_bowl_id, lineno):
+    # like Interpreter.put for mixing bowl IDs larger than 1
+    try:
+        return mixing_bowls[mixing_bowl_id - 1]
+    except IndexError:
+        if mixing_bowl_id - 1 == len(mixing_bowls):
+            mixing_bowl = CompactIngredients(family=mixing_bowls[0])
+            mixing_bowls.append(mixing_bowl)
+            return mixing_bowl
+        raise InvalidContainerIDError('mixing bowl', mixing_bowl_id, lineno)
+
+
+# the globals of the generated functions
+_namespace = {
+    'tuple_new': tuple.__new__,
+    'Ingredient': Ingredient,
+    'IngredientProperties': IngredientProperties,
+    'InvalidContainerIDError': InvalidContainerIDError,
+    'EmptyContainerError': EmptyContainerError,
+    'Refrigerated': Refrigerated,
+    'get_container': _get_container,
+    'get_or_create_mixing_bowl': _get_or_create_mixing_bowl}
+
+
+class _FunctionWriter(object):
+    'Write the source of the function which executes a recipe.'
+
+    def __init__(self, slots):
+        self.lines = []
+        self.indentation = 1
+        # the names of the local variables of the ingredients
+        self.variables = dict(
+            (name, 'ingredient_%d' % slot) for name, slot in slots.iteritems())
+        # whether the local variable `dry_sum` is kept up to date, which is
+        # only needed by "add dry ingredients"
+        self.track_dry_sum = False
+
+    def emit(self, line):
+        self.lines.append('    ' * self.indentation + line)
+
+    def set_ingredient(self, ingredient_name, properties):
+        variable = self.variables[ingredient_name]
+        # like chef.interpreter.dry_value
+        dry_value = '(%(v)s.properties.value or 0) if '\
+            '%(v)s.properties.is_dry is True else 0' % {'v': variable}
+        if self.track_dry_sum:
+            self.emit('dry_sum -= %s' % dry_value)
+        self.emit('%s = tuple_new(Ingredient, (%r, %s))' % (
+            variable, ingredient_name, properties))
+        if self.track_dry_sum:
+            self.emit('dry_sum += %s' % dry_value)
+
+    def container(self, container_id, lineno, is_mixing_bowl=True):
+        'Return an expression for the container, like get_nth_container.'
+        if is_mixing_bowl:
+            container_type = 'mixing bowl'
+            first, containers = 'mixing_bowl_1', 'mixing_bowls'
+        else:
+            container_type = 'baking dish'
+            first, containers = 'baking_dish_1', 'baking_dishes'
+        if container_id is None or container_id == 1:
+            return first
+        if container_id < 1:
+            self.emit('raise InvalidContainerIDError(%r, %r, %r)' % (
+                container_type, container_id, lineno))
+            return first
+        return 'get_container(%s, %r, %r, %r)' % (
+            containers, container_id, lineno, container_type)
+
+    def top(self, mixing_bowl, mixing_bowl_id, lineno, method):
+        'Emit code which stores the top ingredient in the variable `top`.'
+        self.emit('try:')
+        self.emit('    top = %s.%s' % (mixing_bowl, method))
+        self.emit('except IndexError:')
+        self.emit('    raise EmptyContainerError(%r, %r, %r)' % (
+            'mixing bowl', mixing_bowl_id, lineno))
+
+    def instruction(self, instruction):
+        opcode = instruction.opcode
+        operands = instruction.operands
+        if opcode == LOOP_START:
+            verb, ingredient_name, lineno = operands
+            self.emit('while True:')
+            self.indentation += 1
+            self.emit('if %s.properties.value == 0:' % (
+                self.variables[ingredient_name]))
+            self.emit('    break')
+        elif opcode == LOOP_END:
+            verb, ingredient_name, lineno = operands
+            if ingredient_name is not None:
+                variable = self.variables[ingredient_name]
+                self.set_ingredient(ingredient_name,
+                    'tuple_new(IngredientProperties, ('
+                    '%(v)s.properties.value - 1, %(v)s.properties.is_dry, '
+                    '%(v)s.properties.is_liquid))' % {'v': variable})
+            self.indentation -= 1
+        elif opcode in _operators:
+            ingredient_name, mixing_bowl_id, lineno = operands
+            variable = self.variables[ingredient_name]
+            self.emit('value = %s.properties.value' % variable)
+            self.emit('mixing_bowl = %s' % self.container(
+                mixing_bowl_id, lineno))
+            self.top('mixing_bowl', mixing_bowl_id, lineno, 'top')
+            self.emit(
+                'mixing_bowl.replace_top(tuple_new(Ingredient, (%r, '
+                'tuple_new(IngredientProperties, ('
+                'top.properties.value %s value, %s.properties.is_dry, '
+                '%s.properties.is_liquid)))))' % (
+                    ingredient_name, _operators[opcode], variable, variable))
+        else:
+            getattr(self, COMMANDS[opcode])(*operands)
+
+    def take(self, ingredient_name, lineno):
+        self.emit('input_as_int = read_number(%r)' % lineno)
+        variable = self.variables[ingredient_name]
+        self.set_ingredient(ingredient_name,
+            'tuple_new(IngredientProperties, (input_as_int, '
+            '%(v)s.properties.is_dry, %(v)s.properties.is_liquid))' % {
+                'v': variable})
+
+    def put(self, ingredient_name, mixing_bowl_id, lineno):
+        if mixing_bowl_id is None or mixing_bowl_id < 2:
+            mixing_bowl = self.container(mixing_bowl_id, lineno)
+        else:
+            mixing_bowl = 'get_or_create_mixing_bowl(mixing_bowls, %r, %r)' % (
+                mixing_bowl_id, lineno)
+        self.emit('mixing_bowl = %s' % mixing_bowl)
+        self.emit('mixing_bowl.append(%s)' % self.variables[ingredient_name])
+
+    def fold(self, ingredient_name, mixing_bowl_id, lineno):
+        self.top(self.container(mixing_bowl_id, lineno), mixing_bowl_id,
+            lineno, 'pop()')
+        self.set_ingredient(ingredient_name, 'top.properties')
+
+    def add_dry(self, mixing_bowl_id, lineno):
+        self.emit('%s.append(tuple_new(Ingredient, (%r, tuple_new('
+            'IngredientProperties, (dry_sum, True, False)))))' % (
+                self.container(mixing_bowl_id, lineno), DRY_INGREDIENTS))
+
+    def liquefy_ingredient(self, ingredient_name, lineno):
+        variable = self.variables[ingredient_name]
+        self.set_ingredient(ingredient_name,
+            'tuple_new(IngredientProperties, '
+            '(%s.properties.value, False, True))' % variable)
+
+    def liquefy_contents(self, mixing_bowl_id, lineno):
+        self.emit('%s.liquefy()' % self.container(mixing_bowl_id, lineno))
+
+    def stir_minutes(self, minutes, mixing_bowl_id, lineno):
+        self.emit('%s.stir(%r)' % (
+            self.container(mixing_bowl_id, lineno), minutes))
+
+    def stir_ingredient(self, ingredient_name, mixing_bowl_id, lineno):
+        variable = self.variables[ingredient_name]
+        self.emit('value = %s.properties.value' % variable)
+        self.emit('%s.stir(value)' % self.container(mixing_bowl_id, lineno))
+
+    def mix(self, mixing_bowl_id, lineno):
+        self.emit('%s.shuffle()' % self.container(mixing_bowl_id, lineno))
+
+    def clean(self, mixing_bowl_id, lineno):
+        self.emit('del %s[:]' % self.container(mixing_bowl_id, lineno))
+
+    def pour(self, mixing_bowl_id, baking_dish_id, lineno):
+        self.emit('mixing_bowl = %s' % self.container(mixing_bowl_id, lineno))
+        self.emit('%s.extend(mixing_bowl)' % self.container(
+            baking_dish_id, lineno, False))
+
+    def refrigerate(self, hours, lineno):
+        # the finally clause writes the ingredients back
+        self.emit('raise Refrigerated(%r)' % hours)
+
+    def function(self, instructions):
+        'Return the source of the function which executes `instructions`.'
+        self.track_dry_sum = OPCODES['add_dry'] in [
+            instruction.opcode for instruction in instructions]
+        for instruction in instructions:
+            self.instruction(instruction)
+        body = self.lines
+        self.lines = []
+        self.emit('mixing_bowl_1 = mixing_bowls[0]')
+        self.emit('baking_dish_1 = baking_dishes[0]')
+        # sort the ingredients in the order of their variables
+        names = sorted(self.variables, key=self.variables.get)
+        for name in names:
+            self.emit('%s = global_ingredients[%r]' % (
+                self.variables[name], name))
+        # the ingredients are written back to the interpreter at the end
+        self.emit('try:')
+        self.indentation += 1
+        if body:
+            self.lines.extend(['    ' + line for line in body])
+        else:
+            self.emit('pass')
+        self.indentation -= 1
+        self.emit('finally:')
+        self.indentation += 1
+        for name in names:
+            self.emit('global_ingredients[%r] = %s.properties' % (
+                name, self.variables[name]))
+        if not names:
+            self.emit('pass')
+        self.indentation -= 1
+        header = 'def %s(global_ingredients, mixing_bowls, baking_dishes, '\
+            'read_number, dry_sum):' % FUNCTION_NAME
+        return '\n'.join([header] + self.lines) + '\n'
+
+
+def generate_source(recipe):
+    '''Return the Python source of the function which executes the
+    instructions of the Recipe `recipe`. The function is called with the
+    global ingredients, the mixing bowls and the baking dishes of an
+    interpreter, the function which "take" uses to read a number (see
+    chef.refrigerator.NumberReader.read_number) and the sum of the dry
+    ingredients of the interpreter. Raise an
+    UndefinedIngredientError if the recipe uses an ingredient which it does
+    not declare.
+
+    '''
+    slots = ingredient_slots(recipe.ingredients, recipe.instructions)
+    return _FunctionWriter(slots).function(recipe.instructions)
+
+
+def transpile_recipe(recipe):
+    '''Compile the Recipe `recipe` into a Python function (see
+    generate_source). Raise a ValueError if its loops are nested deeper than
+    MAX_LOOP_DEPTH.
+
+    '''
+    if max_loop_depth(recipe.instructions) > MAX_LOOP_DEPTH:
+        raise ValueError(
+            'loops are nested deeper than %d levels' % MAX_LOOP_DEPTH)
+    code = compile(generate_source(recipe), '<recipe>', 'exec')
+    namespace = dict(_namespace)
+    exec code in namespace
+    return namespace[FUNCTION_NAME]
+
+
+def run(function, interpreter, stdin=None):
+    '''Execute the transpiled recipe `function` with the
+    chef.interpreter.Interpreter `interpreter`. "take" reads from the file
+    `stdin` if it is given, and from the refrigerator of the interpreter
+    otherwise.
+
+    '''
+    if stdin is None:
+        refrigerator = interpreter.refrigerator
+    else:
+        refrigerator = NumberReader(stdin)
+    try:
+        function(
+            interpreter.global_ingredients,
+            interpreter.mixing_bowls,
+            interpreter.baking_dishes,
+            refrigerator.read_number,
+            interpreter.dry_sum)
+    finally:
+        # the function has written the ingredients back
+        interpreter.reset_dry_sum()
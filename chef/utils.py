@@ -1,25 +1,144 @@
-import re
-from string import ascii_lowercase
+import sys
+import Queue
+try:
+    import threading
+except ImportError:
+    threading = None
 
-VOWELS = frozenset('aeiou')
-CONSONANTS = frozenset(ascii_lowercase) - VOWELS
-_double_consonant_pattern = '[a-z]+?[%s]{2}' % ''.join(CONSONANTS)
-_double_consonant_present_pattern = re.compile(_double_consonant_pattern)
-_double_consonant_past_pattern = re.compile(_double_consonant_pattern + 'ed')
+# verbs_match lives in chef.morphology; it is still importable from here
+from chef.morphology import verbs_match
+
+# the number of writes which BackgroundWriter holds before write blocks
+MAX_PENDING_WRITES = 16
 
 
 def read_until_blank_line(f):
+    read_paragraph = getattr(f, 'read_until_blank_line', None)
+    if read_paragraph is not None:
+        return read_paragraph()
     return ''.join(iter(f.next, '\n'))
 
 
-def verbs_match(present_form, past_form):
-    fst, snd = map(str.lower, [present_form, past_form])
-    if fst.endswith('e'):
-        return snd.endswith('d') and fst == snd[:-1]
-    elif re.match(_double_consonant_past_pattern, snd):
-        if re.match(_double_consonant_present_pattern, fst):
-            return fst == snd[:-2]
+class BufferReader(object):
+    '''A file-like object which reads from a buffer that holds the whole
+    content, e.g. a string or an mmap. Paragraphs are found by searching the
+    buffer for blank lines instead of reading it line by line, and only the
+    requested pieces are sliced out of the buffer.
+
+    '''
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.pos = 0
+        self.end = len(buffer)
+
+    def __iter__(self):
+        return self
+
+    def readline(self):
+        pos = self.pos
+        newline = self.buffer.find('\n', pos)
+        if newline == -1:
+            self.pos = self.end
         else:
-            return fst == snd[:-3]
-    else:
-        return snd.endswith('ed') and fst == snd[:-2]
+            self.pos = newline + 1
+        return self.buffer[pos:self.pos]
+
+    def next(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def read(self):
+        pos = self.pos
+        self.pos = self.end
+        return self.buffer[pos:self.end]
+
+    def read_until_blank_line(self):
+        'See read_until_blank_line.'
+        buffer = self.buffer
+        pos = self.pos
+        if buffer[pos:pos + 1] == '\n':
+            self.pos = pos + 1
+            return ''
+        blank_line = buffer.find('\n\n', pos)
+        if blank_line == -1:
+            return self.read()
+        self.pos = blank_line + 2
+        return buffer[pos:blank_line + 1]
+
+
+class BackgroundWriter(object):
+    '''A file-like object which writes to the file `f` in a background
+    thread, so that the caller can go on while slow writes are pending. At
+    most `max_pending` writes are held in a queue; when it is full, write
+    blocks until the thread has caught up. The data is written in the order
+    of the calls of write.
+
+    flush and close wait until all pending writes have been done. An error
+    of the thread is raised by the next call of write, flush or close.
+    Closing the writer does not close `f`.
+
+    '''
+    def __init__(self, f, max_pending=MAX_PENDING_WRITES):
+        if threading is None:
+            raise ValueError('threads are not supported')
+        self.file = f
+        self.closed = False
+        self._queue = Queue.Queue(max_pending)
+        # the exc_info of the error of the thread
+        self._error = None
+        self._thread = threading.Thread(target=self._write_pending)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _write_pending(self):
+        # the target of the thread; None stops it
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    return
+                if self._error is None:
+                    self.file.write(data)
+            except Exception:
+                # the remaining writes are dropped
+                self._error = sys.exc_info()
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            exctype, value, traceback = self._error
+            raise exctype, value, traceback
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        self._raise_error()
+        self._queue.put(data)
+
+    def flush(self):
+        self._queue.join()
+        self._raise_error()
+        self.file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+        self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        try:
+            self.close()
+        except Exception:
+            # do not hide the error which left the with-block
+            if exctype is None:
+                raise